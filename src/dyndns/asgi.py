@@ -0,0 +1,9 @@
+"""
+The ASGI counterpart of :mod:`dyndns.wsgi`. Point an ASGI server at the
+app, for example ``uvicorn dyndns.asgi:app``.
+"""
+
+from dyndns.environment import AsyncConfiguredEnvironment
+from dyndns.webapp import AsgiApp, create_asgi_app
+
+app: AsgiApp = create_asgi_app(AsyncConfiguredEnvironment())
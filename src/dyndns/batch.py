@@ -0,0 +1,89 @@
+"""Parse the entries of a batch update and format the results.
+
+A batch update sets the address records of many names with a single
+request. The entries are grouped by zone and the names of a zone are
+updated in one update message, see :meth:`dyndns.dns.DnsZone.update_many`."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from dyndns.exceptions import DyndnsError, ParameterError
+
+
+class BatchEntry(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    fqdn: str
+    ipv4: Optional[str] = None
+    ipv6: Optional[str] = None
+    ttl: int = 300
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one entry of a batch update."""
+
+    fqdn: str | None
+    """``None`` if the entry has no valid ``fqdn``."""
+
+    status_code: int
+    """``200`` or the HTTP status code the entry would have caused as a
+    single request."""
+
+    message: str
+    """The log message, the same text a single request answers."""
+
+    @classmethod
+    def from_error(cls, fqdn: str | None, error: DyndnsError) -> BatchResult:
+        return cls(fqdn, error.status_code, f"{error.log_level.name}: {error}\n")
+
+
+def _validate_entry(data: Any) -> BatchEntry:
+    try:
+        return BatchEntry.model_validate(data)
+    except ValidationError as e:
+        error = e.errors(include_url=False)[0]
+        raise ParameterError(
+            "{}: {} ({}).".format(error["type"], error["msg"], error["input"])
+        )
+
+
+def parse_batch(body: bytes | str) -> list[BatchEntry | ParameterError]:
+    """
+    :param body: A JSON array of entries or one JSON object per line
+        (newline delimited JSON). An entry is an object with the keys
+        ``fqdn``, ``ipv4``, ``ipv6`` and ``ttl``.
+
+    :return: The entries in their order. An invalid entry is replaced by the
+        error, so the other entries can still be applied.
+
+    :raises ParameterError: If the body is neither a JSON array nor newline
+        delimited JSON.
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    try:
+        if body.lstrip().startswith("["):
+            items = json.loads(body)
+        else:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+    except ValueError as e:
+        raise ParameterError(f"The batch is not valid JSON: {e}.")
+    if not items:
+        raise ParameterError("The batch contains no entries.")
+    entries: list[BatchEntry | ParameterError] = []
+    for item in items:
+        try:
+            entries.append(_validate_entry(item))
+        except ParameterError as e:
+            entries.append(e)
+    return entries
+
+
+def format_batch_results(results: list[BatchResult]) -> str:
+    """:return: A JSON array with one object per entry."""
+    return json.dumps([asdict(result) for result in results], indent=2) + "\n"
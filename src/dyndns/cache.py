@@ -0,0 +1,243 @@
+"""Cache the records read from the nameserver in memory."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import get_args
+
+from dyndns.config import RecordType
+
+
+@dataclass
+class CacheStats:
+    """Counters of a :class:`RecordCache`."""
+
+    hits: int = 0
+    """The number of lookups answered from the cache."""
+
+    misses: int = 0
+    """The number of lookups that were not in the cache or had expired."""
+
+    size: int = 0
+    """The number of records currently in the cache."""
+
+
+class RecordCache:
+    """A bounded least recently used cache whose entries expire after their
+    time to live.
+
+    The cache stores the content of a record (the string returned by
+    :meth:`dyndns.dns.DnsZone.read_record`) by fully qualified domain name and
+    record type. ``None`` is cached too: It means that there is no such
+    record.
+
+    :param size: The maximum number of records in the cache. The least
+        recently used record is evicted first.
+    :param max_ttl: Records are cached for their time to live, but not longer
+        than this number of seconds.
+    """
+
+    size: int
+
+    max_ttl: float
+
+    _entries: OrderedDict[tuple[str, RecordType], tuple[str | None, float]]
+    """The content and the expiration time (monotonic clock) by fully
+    qualified domain name and record type."""
+
+    _stats: CacheStats
+
+    _lock: threading.Lock
+
+    def __init__(self, size: int = 1024, max_ttl: float = 60.0) -> None:
+        self.size = size
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        """A snapshot of the cache counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                size=len(self._entries),
+            )
+
+    def get(self, fqdn: str, record_type: RecordType) -> tuple[bool, str | None]:
+        """
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param record_type: The type of the resource record.
+
+        :return: ``True`` and the cached content or ``False`` and ``None`` if
+            the record is not cached.
+        """
+        key = (fqdn, record_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                content, expires = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats.hits += 1
+                    return True, content
+                del self._entries[key]
+            self._stats.misses += 1
+            return False, None
+
+    def set(
+        self,
+        fqdn: str,
+        record_type: RecordType,
+        content: str | None,
+        ttl: float | None = None,
+    ) -> None:
+        """
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param record_type: The type of the resource record.
+        :param content: The content of the record or ``None`` if there is no
+            such record.
+        :param ttl: The time to live of the record. ``max_ttl`` is used if the
+            time to live is unknown or greater.
+        """
+        if self.size <= 0:
+            return
+        if ttl is None or ttl > self.max_ttl:
+            ttl = self.max_ttl
+        key = (fqdn, record_type)
+        with self._lock:
+            self._entries[key] = (content, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, fqdn: str, record_type: RecordType | None = None) -> None:
+        """Remove the records of a name from the cache.
+
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param record_type: Remove only the record of this type.
+        """
+        record_types: tuple[RecordType, ...] = get_args(RecordType)
+        if record_type is not None:
+            record_types = (record_type,)
+        with self._lock:
+            for key in record_types:
+                self._entries.pop((fqdn, key), None)
+
+    def clear(self) -> None:
+        """Remove all records from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+
+Addresses = tuple[str | None, str | None, int]
+"""The IPv4 address, the IPv6 address and the time to live of a name."""
+
+
+class AddressCache:
+    """The addresses each name was last updated with.
+
+    Most updates repeat the addresses of the previous update. If the
+    addresses of an update match the cached addresses, the update is
+    answered as unchanged without asking the nameserver. Every write and
+    deletion of a name through the environment drops the cached addresses.
+    A NOTIFY of the zone drops the names that changed (see :meth:`retain`).
+    Changes made by other tools without a NOTIFY are noticed after
+    ``max_age`` seconds at the latest.
+
+    :param size: The maximum number of names in the cache. The least
+        recently used name is evicted first.
+    :param max_age: Seconds after which the addresses are asked for again.
+    """
+
+    size: int
+
+    max_age: float
+
+    _entries: OrderedDict[str, tuple[Addresses, float]]
+    """The addresses and the expiration time (monotonic clock) by lower
+    case fully qualified domain name."""
+
+    _stats: CacheStats
+
+    _lock: threading.Lock
+
+    def __init__(self, size: int = 4096, max_age: float = 300.0) -> None:
+        self.size = size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        """A snapshot of the cache counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                size=len(self._entries),
+            )
+
+    def get(self, fqdn: str) -> Addresses | None:
+        """
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+
+        :return: The addresses of the last update or ``None`` if the name
+            is not cached.
+        """
+        key = fqdn.lower()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                addresses, expires = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats.hits += 1
+                    return addresses
+                del self._entries[key]
+            self._stats.misses += 1
+            return None
+
+    def set(self, fqdn: str, addresses: Addresses) -> None:
+        if self.size <= 0:
+            return
+        key = fqdn.lower()
+        with self._lock:
+            self._entries[key] = (addresses, time.monotonic() + self.max_age)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, fqdn: str) -> None:
+        with self._lock:
+            self._entries.pop(fqdn.lower(), None)
+
+    def retain(self, keep: Callable[[str, Addresses], bool]) -> None:
+        """Drop the names whose addresses are no longer valid.
+
+        :param keep: Called with the fully qualified domain name and the
+            cached addresses of each name. ``False`` drops the name."""
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, (addresses, _) in entries:
+            if not keep(key, addresses):
+                with self._lock:
+                    entry = self._entries.get(key)
+                    # The name may have been updated in the meantime.
+                    if entry is not None and entry[0] == addresses:
+                        del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,177 @@
+"""Check the zones in the background.
+
+A full check writes a ``TXT`` record into every zone. If a load balancer
+probes ``/check`` every few seconds, each probe would write the zones and
+wait for the nameservers. The background checker checks the zones every
+``check.interval`` seconds instead and ``/check`` answers the last result
+together with its age."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from dyndns.log import LogLevel, logger
+
+
+@dataclass
+class CheckResult:
+    """The outcome of one run of the checks of all zones."""
+
+    output: str
+    """The log messages of the checks. Empty if the check failed."""
+
+    error: Exception | None = None
+    """The exception of a failed check."""
+
+    duration: float = 0.0
+    """The seconds the check took."""
+
+    finished: float = field(default_factory=time.monotonic)
+    """The :func:`time.monotonic` time the check finished."""
+
+    @property
+    def age(self) -> float:
+        """The seconds since the check finished."""
+        return time.monotonic() - self.finished
+
+
+def _failed(error: Exception, start: float) -> CheckResult:
+    logger.log(LogLevel.WARNING, f"The background check failed: {error}")
+    return CheckResult("", error, time.monotonic() - start)
+
+
+class BackgroundChecker:
+    """Run the checks in a thread.
+
+    :param check: Checks all zones, e. g.
+        :meth:`dyndns.environment.ConfiguredEnvironment.check`.
+    :param interval: Seconds between the start of two checks.
+    """
+
+    interval: float
+
+    result: CheckResult | None
+    """The last result or ``None`` if the first check hasn’t finished."""
+
+    _check: Callable[[], str]
+
+    _thread: threading.Thread | None
+
+    _thread_pid: int | None
+
+    _stop: threading.Event
+
+    _lock: threading.Lock
+
+    def __init__(self, check: Callable[[], str], interval: float) -> None:
+        self.interval = interval
+        self.result = None
+        self._check = check
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self) -> CheckResult:
+        """Check once and keep the result."""
+        start = time.monotonic()
+        try:
+            result = CheckResult(self._check(), duration=time.monotonic() - start)
+        except Exception as e:
+            result = _failed(e, start)
+        self.result = result
+        return result
+
+    def _run(self, stop: threading.Event) -> None:
+        while True:
+            start = time.monotonic()
+            self.run()
+            if stop.wait(max(0.0, self.interval - (time.monotonic() - start))):
+                return
+
+    def start(self) -> BackgroundChecker:
+        """Start the thread unless it runs in this process. After a fork (for
+        example by uWSGI) the thread of the parent process doesn’t exist in
+        the child process, so the thread is started again."""
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return self
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return self
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._stop,), name="dyndns-check", daemon=True
+            )
+            self._thread_pid = os.getpid()
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+
+class AsyncBackgroundChecker:
+    """Run the checks in a task of the event loop that serves the requests,
+    so the checks share the connections of the requests.
+
+    :param check: Checks all zones, e. g.
+        :meth:`dyndns.environment.AsyncConfiguredEnvironment.check`.
+    :param interval: Seconds between the start of two checks.
+    """
+
+    interval: float
+
+    result: CheckResult | None
+    """:see: :attr:`BackgroundChecker.result`"""
+
+    _check: Callable[[], Awaitable[str]]
+
+    _task: asyncio.Task[None] | None
+
+    def __init__(self, check: Callable[[], Awaitable[str]], interval: float) -> None:
+        self.interval = interval
+        self.result = None
+        self._check = check
+        self._task = None
+
+    async def run(self) -> CheckResult:
+        """:see: :meth:`BackgroundChecker.run`"""
+        start = time.monotonic()
+        try:
+            result = CheckResult(
+                await self._check(), duration=time.monotonic() - start
+            )
+        except Exception as e:
+            result = _failed(e, start)
+        self.result = result
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await self.run()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def start(self) -> AsyncBackgroundChecker:
+        """Start the task in the running event loop unless it runs there
+        already."""
+        loop = asyncio.get_running_loop()
+        if (
+            self._task is not None
+            and not self._task.done()
+            and self._task.get_loop() is loop
+        ):
+            return self
+        self._task = loop.create_task(self._run(), name="dyndns-check")
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -6,6 +6,8 @@ import argparse
 
 from dyndns import __version__
 from dyndns.environment import ConfiguredEnvironment
+from dyndns.metrics import format_metrics
+from dyndns.tsig import benchmark_signing
 from dyndns.webapp import create_app
 
 
@@ -39,19 +41,56 @@ def get_argparser() -> argparse.ArgumentParser:
         default=54321,
     )
 
-    subcommand.add_parser("check")
+    check_parser: argparse.ArgumentParser = subcommand.add_parser("check")
+    check_parser.add_argument(
+        "-m",
+        "--mode",
+        choices=["light", "full"],
+        help="light: a signed SOA query, full: write a temporary TXT record. "
+        "The default is taken from the configuration.",
+    )
+    check_parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Print the latency of the nameserver operations after the check.",
+    )
 
     delete_parser = subcommand.add_parser("delete")
     delete_parser.add_argument("fqdn", help="lol")
 
     subcommand.add_parser("config")
 
+    benchmark_parser = subcommand.add_parser(
+        "benchmark-tsig",
+        help="Measure the cost of the TSIG signature for each algorithm.",
+    )
+    benchmark_parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=10000,
+        help="The number of messages rendered per algorithm.",
+    )
+
     return parser
 
 
+def print_benchmark(count: int) -> None:
+    print(f"{'algorithm':<12} {'signed':>10} {'unsigned':>10} {'signing':>10}")
+    for result in benchmark_signing(count):
+        print(
+            f"{result.algorithm:<12} {result.signed * 1e6:>8.1f}µs "
+            f"{result.unsigned * 1e6:>8.1f}µs {result.signing * 1e6:>8.1f}µs"
+        )
+
+
 def main() -> None:
     args: argparse.Namespace = get_argparser().parse_args()
 
+    if args.subcommand == "benchmark-tsig":
+        print_benchmark(args.count)
+        return
+
     env = ConfiguredEnvironment(args.config)
 
     if args.subcommand == "serve":
@@ -59,7 +98,9 @@ def main() -> None:
         create_app(env).run(debug=False, port=args.port)
     elif args.subcommand == "check":
         print("check")
-        env.check()
+        env.check(args.mode)
+        if args.metrics:
+            print(format_metrics(env.metrics()), end="")
     elif args.subcommand == "config":
         env.print_config()
     elif args.subcommand == "delete":
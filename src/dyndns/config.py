@@ -25,6 +25,16 @@ RecordType = Literal["A", "AAAA", "TXT"]
 
 IpVersion = Literal[4, 6]
 
+TsigAlgorithm = Literal["hmac-sha256", "hmac-sha384", "hmac-sha512"]
+
+VerificationMode = Literal["trust", "sync", "async"]
+"""How the records written by dyndns are read back, see
+:mod:`dyndns.verify`."""
+
+CheckMode = Literal["light", "full"]
+"""``light`` sends a TSIG signed ``SOA`` query, ``full`` writes, reads and
+deletes a temporary ``TXT`` record."""
+
 
 def validate_ip_address_by_version(
     address: Any, ip_version: IpVersion | None = None
@@ -130,6 +140,21 @@ def validate_tsig_key(tsig_key: str) -> str:
 TsigKey = Annotated[str, AfterValidator(validate_tsig_key)]
 
 
+NameserverAddress = ipaddress.IPv4Address | ipaddress.IPv6Address
+
+Nameservers = (
+    NameserverAddress | Annotated[list[NameserverAddress], Len(min_length=1)]
+)
+"""One IP address or a list of IP addresses of nameservers."""
+
+
+def list_nameservers(nameservers: Nameservers) -> list[str]:
+    """:return: The IP addresses as strings, for example ``["127.0.0.1"]``."""
+    if isinstance(nameservers, list):
+        return [str(address) for address in nameservers]
+    return [str(nameservers)]
+
+
 class ZoneConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -142,10 +167,239 @@ class ZoneConfig(BaseModel):
       generate the key:
       ``tsig-keygen -a hmac-sha512 dyndns.example.com``"""
 
+    tsig_algorithm: TsigAlgorithm = "hmac-sha512"
+    """The algorithm of the tsig-key. It has to match the algorithm of
+    the key in the configuration of the nameserver."""
+
+    nameserver: Nameservers | None = None
+    """The nameservers of this zone. If not specified, the global
+    nameservers are used."""
+
 
 ZonesList = Annotated[list["ZoneConfig"], Len(min_length=1)]
 
 
+class ConnectionPoolConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    size: Annotated[int, Field(ge=0)] = 4
+    """The maximum number of idle TCP connections kept open to the
+    nameserver. ``0`` disables the reuse of connections."""
+
+    idle_timeout: Annotated[float, Field(gt=0)] = 30.0
+    """Idle connections are closed after this number of seconds."""
+
+    keepalive: bool = True
+    """Negotiate the idle timeout with the nameserver by the RFC 7828
+    ``edns-tcp-keepalive`` option. Connections are closed as soon as the
+    timeout advertised by the nameserver expires, even if
+    ``idle_timeout`` allows more."""
+
+
+class ZoneShadowConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = False
+    """Load the ``A`` and ``AAAA`` records of each zone by a full zone
+    transfer (AXFR) at startup and answer all reads from memory. The
+    nameserver has to allow zone transfers signed with the TSIG key of the
+    zone."""
+
+    refresh_interval: Annotated[float, Field(gt=0)] = 60.0
+    """Seconds between two incremental zone transfers (IXFR) that keep the
+    copy up to date."""
+
+
+class RecordCacheConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    size: Annotated[int, Field(ge=0)] = 1024
+    """The maximum number of records cached per zone. ``0`` disables the
+    cache."""
+
+    max_ttl: Annotated[float, Field(ge=0)] = 60.0
+    """Records are cached for their time to live, but not longer than this
+    number of seconds."""
+
+
+class AddressCacheConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    size: Annotated[int, Field(ge=0)] = 0
+    """The maximum number of names whose last addresses are remembered per
+    zone. ``0`` disables the cache. Every process has its own cache, so
+    enable it only if a single process serves the updates."""
+
+    max_age: Annotated[float, Field(gt=0)] = 300.0
+    """Seconds after which an unchanged update asks the nameserver
+    again."""
+
+
+class WriteBehindConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = False
+    """Queue the updates of each zone and merge the updates that arrive
+    within a short window into one update message."""
+
+    window: Annotated[float, Field(gt=0)] = 0.05
+    """Seconds to wait for further updates after the first update of a
+    batch was queued."""
+
+    max_changes: Annotated[int, Field(ge=1)] = 100
+    """A batch is sent as soon as it contains this number of record
+    changes."""
+
+
+class QueryConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    read_timeout: Annotated[float, Field(gt=0)] = 2.0
+    """Seconds to wait for one nameserver to answer a read."""
+
+    update_timeout: Annotated[float, Field(gt=0)] = 5.0
+    """Seconds to wait for one nameserver to answer an update."""
+
+    retries: Annotated[int, Field(ge=0)] = 2
+    """How often a query is sent again after all nameservers failed."""
+
+    backoff: Annotated[float, Field(ge=0)] = 0.1
+    """The upper bound of the first random backoff in seconds. The bound
+    doubles with each retry."""
+
+    max_backoff: Annotated[float, Field(ge=0)] = 2.0
+    """The upper bound of the backoff in seconds."""
+
+    hedge_reads: bool = False
+    """Send a second read if the first read has not been answered within
+    the 95th percentile of the read latency."""
+
+    hedge_min_delay: Annotated[float, Field(ge=0)] = 0.01
+    """Never hedge a read earlier than this number of seconds."""
+
+
+class VerificationConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    mode: VerificationMode = "trust"
+    """``trust`` trusts the ``NOERROR`` answer of the nameserver. ``sync``
+    reads the written records back before the update returns. ``async``
+    reads a sample of the written records back in the background and logs
+    mismatches."""
+
+    sample_rate: Annotated[float, Field(ge=0, le=1)] = 1.0
+    """The share of the written records read back in the ``async`` mode."""
+
+    delay: Annotated[float, Field(ge=0)] = 0.5
+    """Seconds between the update and the read in the ``async`` mode."""
+
+    max_pending: Annotated[int, Field(ge=1)] = 1000
+    """The maximum number of records waiting for verification in the
+    ``async`` mode. Further records are not verified."""
+
+
+class CheckConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    mode: CheckMode = "light"
+    """``light`` checks the TSIG key and the reachability of the nameserver
+    by a signed ``SOA`` query without changing the zone. ``full`` writes a
+    temporary ``TXT`` record and reads it back."""
+
+    concurrency: Annotated[int, Field(ge=1)] = 8
+    """The number of zones checked at the same time."""
+
+    interval: Annotated[float, Field(gt=0)] | None = None
+    """Check the zones every this number of seconds in the background and
+    answer ``/check`` with the last result and its age, see
+    :mod:`dyndns.checker`. By default ``/check`` checks the zones on every
+    request."""
+
+
+class BatchConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    max_entries: Annotated[int, Field(ge=1)] = 100
+    """The maximum number of entries of one batch update. The entries of a
+    zone are sent in one update message, which must not exceed 64 KiB."""
+
+
+class TokenBucketConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    rate: Annotated[float, Field(ge=0)]
+    """The tokens added per second, the sustained number of requests per
+    second. ``0`` disables the bucket."""
+
+    burst: Annotated[int, Field(ge=1)]
+    """The maximum number of tokens, the number of requests allowed at
+    once after an idle period."""
+
+
+class RateLimitConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = False
+    """Reject requests with ``429 Too Many Requests`` before any DNS work is
+    done if one of their token buckets is empty, see
+    :mod:`dyndns.ratelimit`."""
+
+    client: TokenBucketConfig = TokenBucketConfig(rate=1.0, burst=10)
+    """The bucket of each client IP address."""
+
+    fqdn: TokenBucketConfig = TokenBucketConfig(rate=0.2, burst=5)
+    """The bucket of each domain name that is updated or deleted."""
+
+    secret: TokenBucketConfig = TokenBucketConfig(rate=20.0, burst=100)
+    """The bucket of each verified secret. Requests with a wrong secret
+    only take a token of their client address."""
+
+    size: Annotated[int, Field(ge=1)] = 10000
+    """The maximum number of buckets. Idle buckets are dropped once they
+    are full again, the least recently used bucket if there are still too
+    many."""
+
+    store: Path | None = None
+    """A SQLite database file to share the buckets between the worker
+    processes of a server. By default each process keeps its buckets in
+    memory."""
+
+
+class MetricsConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = True
+    """Record the latency of the reads, updates, deletions and checks of
+    each zone in histograms and count the failed queries and the bytes
+    exchanged with the nameservers, see :mod:`dyndns.metrics`. Count the
+    HTTP requests, the errors and the updated and unchanged names."""
+
+    directory: Path | None = None
+    """A directory shared by the worker processes of a server. Each process
+    writes its metrics to a file in the directory and ``/metrics`` adds up
+    the files of all processes, see :class:`dyndns.prometheus.MetricsDirectory`.
+    By default ``/metrics`` answers the metrics of the process that handles
+    the request."""
+
+    flush_interval: Annotated[float, Field(gt=0)] = 5.0
+    """Seconds between two writes of the metrics to the ``directory``."""
+
+
+class NotifyConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = False
+    """Listen for DNS NOTIFY messages of the nameservers. On a NOTIFY the
+    cached records of the zone are dropped and the copy of the zone is
+    refreshed by an incremental zone transfer."""
+
+    address: IpAddress = "127.0.0.1"
+    """The IP address to listen on."""
+
+    port: Port = 5300
+    """The UDP port to listen on."""
+
+
 class Config(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -153,10 +407,12 @@ class Config(BaseModel):
     """A password-like secret string. The secret string must be at least
     8 characters long and only alphanumeric characters are permitted."""
 
-    nameserver: ipaddress.IPv4Address | ipaddress.IPv6Address
+    nameserver: Nameservers
     """The IP address of your nameserver. Version 4 or
     version 6 are allowed. Use ``127.0.0.1`` to communicate with your
-    nameserver on the same machine."""
+    nameserver on the same machine. A list of IP addresses (for example a
+    hidden primary and a standby) lets ``dyndns`` pick the fastest healthy
+    nameserver and fail over if a nameserver times out."""
 
     port: Port = 53
     """The port to which the DNS server listens. If the DNS server listens to
@@ -173,6 +429,57 @@ class Config(BaseModel):
     zones: ZonesList
     """At least one zone specified as a list."""
 
+    connection_pool: ConnectionPoolConfig = ConnectionPoolConfig()
+    """The TCP connections to the nameserver are pooled and reused across
+    requests."""
+
+    record_cache: RecordCacheConfig = RecordCacheConfig()
+    """The records read from the nameserver are cached in memory."""
+
+    address_cache: AddressCacheConfig = AddressCacheConfig()
+    """Answer updates that repeat the addresses of the previous update of a
+    name without asking the nameserver."""
+
+    zone_shadow: ZoneShadowConfig = ZoneShadowConfig()
+    """Keep a copy of the address records of each zone in memory."""
+
+    conditional_updates: bool = False
+    """Send the expected state of the records as RFC 2136 prerequisites
+    along with the update instead of reading the records before the update.
+    Unchanged records cost only one round trip and concurrent updates of
+    the same name can not interleave."""
+
+    lock_stripes: Annotated[int, Field(ge=1)] = 64
+    """The number of locks shared by all names. The updates of the same name
+    never run at the same time, the updates of names on different locks run
+    in parallel."""
+
+    write_behind: WriteBehindConfig = WriteBehindConfig()
+    """Merge the updates of many clients into few update messages."""
+
+    queries: QueryConfig = QueryConfig()
+    """The timeouts, the retries and the hedging of the queries sent to the
+    nameservers."""
+
+    verification: VerificationConfig = VerificationConfig()
+    """Read the written records back from the nameserver."""
+
+    check: CheckConfig = CheckConfig()
+    """How the zones are checked by ``/check`` and ``dyndns check``."""
+
+    batch: BatchConfig = BatchConfig()
+    """Update many names with one request."""
+
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    """Limit the request rate per client address, domain name and secret."""
+
+    metrics: MetricsConfig = MetricsConfig()
+    """Measure the latency of the nameservers."""
+
+    notify: NotifyConfig = NotifyConfig()
+    """Drop the cached records of a zone if the nameserver announces a
+    change."""
+
 
 def load_config(config_file: str | Path | None = None) -> Config:
     """
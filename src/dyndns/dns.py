@@ -1,26 +1,51 @@
 """Query the DSN server using the package “dnspython”."""
 
+import asyncio
+import concurrent.futures
+import contextlib
+import io
 import random
 import string
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, Any
+import threading
+import time
+from collections.abc import Sequence
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Literal
 
+import dns.asyncresolver
 import dns.exception
 import dns.message
 import dns.name
-import dns.query
+import dns.rcode
+import dns.rdata
+import dns.rdataclass
 import dns.rdatatype
+import dns.renderer
 import dns.resolver
 import dns.rrset
 import dns.tsig
-import dns.tsigkeyring
 import dns.update
 
-from dyndns.config import RecordType
-from dyndns.exceptions import CheckError, DNSServerError
+from dyndns.cache import CacheStats, RecordCache
+from dyndns.config import CheckMode, RecordType
+from dyndns.exceptions import CheckError, DNSServerError, ParameterError
 from dyndns.log import LogLevel, logger
+from dyndns.metrics import DnsMetrics, DnsMetricsStats, Operation
+from dyndns.nameservers import Nameserver, NameserverGroup, get_nameserver_group
+from dyndns.policy import QueryPolicy, QueryStats, get_hedge_executor
+from dyndns.pool import (
+    KEEPALIVE_SIZE,
+    AsyncConnectionPool,
+    ConnectionPool,
+    get_async_pool,
+    get_pool,
+)
+from dyndns.shadow import ZoneShadow
+from dyndns.verify import Verifier, VerifierStats
 
 if TYPE_CHECKING:
+    from dyndns.writebehind import UpdateQueue
     from dyndns.zones import Zone
 
 
@@ -36,55 +61,330 @@ class DnsChangeMessage:
         return self.old != self.new
 
 
-class DnsZone:
-    _nameserver: str
-    """The ip address of the nameserver, for example ``127.0.0.1``."""
+ChangeAction = Literal["add", "replace", "delete"]
 
-    _port: int
+
+@dataclass
+class DnsChange:
+    """One operation of :meth:`DnsZone.apply_changes`."""
+
+    action: ChangeAction
+    """``add`` adds a record to the existing records of the same name and
+    type, ``replace`` replaces them and ``delete`` deletes them."""
+
+    name: str
+    """A record name (e. g. ``dyndns``) or a fully qualified domain name
+    (e. g. ``dyndns.example.com``)."""
+
+    record_type: RecordType
+
+    content: str | None = None
+    """Required by ``add`` and ``replace``, ignored by ``delete``."""
+
+    ttl: int = 300
+
+
+@dataclass
+class RecordSetChange:
+    """The net effect of all changes of one name and record type of
+    :meth:`DnsZone.apply_changes`. All changes of a name and record type
+    are sent in the same update message."""
+
+    fqdn: str
+
+    record_type: RecordType
+
+    delete: bool = False
+    """Delete the existing records before the records are added."""
+
+    add: list[str] = field(default_factory=list)
+    """The content of the added records."""
+
+    ttl: int = 300
+
+
+Expectation = dict[RecordType, list[dns.rdata.Rdata]]
+"""The expected records of a conditional update by record type. An empty
+list means that there must be no record of this type."""
+
+VerificationTargets = dict[tuple[str, RecordType], str | None]
+"""The written content by name and record type."""
+
+Batch = dict[str, tuple[dict[RecordType, str | None], int]]
+"""The new content by record type and the time to live by fully qualified
+domain name. All names of a batch are updated in one update message."""
+
+READ_ERRORS = (dns.exception.Timeout, dns.resolver.NoNameservers, OSError, EOFError)
+"""Errors of a read after which the next nameserver is asked."""
+
+UPDATE_ERRORS = (dns.tsig.PeerBadKey, dns.exception.Timeout, OSError, EOFError)
+"""Errors of an update after which the next nameserver is asked. All errors
+but ``PeerBadKey`` are retried."""
+
+AUTHORITATIVE_ERRORS = (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN)
+"""Errors of a read that are valid answers of the nameserver."""
+
+PreparedBatch = dict[
+    str, tuple[dict[RecordType, dns.rdata.Rdata | None], Expectation]
+]
+"""The new records and the expected records of a conditional batch by fully
+qualified domain name."""
+
+
+_NOT_MEASURED = contextlib.nullcontext()
+"""Stands in for a measurement if the metrics are disabled."""
+
+
+def _answered(future: "concurrent.futures.Future[Any] | asyncio.Future[Any]") -> bool:
+    """``True`` if a read finished with an answer of the nameserver, even if
+    the answer is that the record doesn’t exist."""
+    error = future.exception()
+    return error is None or isinstance(error, AUTHORITATIVE_ERRORS)
+
+
+def format_content(record_type: RecordType, content: str) -> str:
+    """Format the record content the way ``read_record`` returns it,
+    for example ``1:0::2`` -> ``1::2``.
+
+    :raises dns.exception.SyntaxError: If the content is malformed."""
+    if record_type == "TXT":
+        return content
+    return dns.rdata.from_text(dns.rdataclass.IN, record_type, content).to_text()
+
+
+class BaseDnsZone:
+    """The state and the message building shared by :class:`DnsZone` and
+    :class:`AsyncDnsZone`. Nothing in here talks to the nameserver."""
+
+    _nameservers: NameserverGroup
+    """The nameservers of the zone. The fastest healthy nameserver is asked
+    first."""
 
     _zone: "Zone"
 
-    _keyring: dict[dns.name.Name, dns.tsig.Key]
+    _conditional_updates: bool
+    """Use RFC 2136 prerequisites instead of reading the records before an
+    update."""
+
+    CONDITIONAL_UPDATE_ATTEMPTS: int = 3
+    """How often a conditional update is sent before giving up if the
+    prerequisites are not met."""
 
-    __resolver: dns.resolver.Resolver
+    MAX_UPDATE_SIZE: int = 65535
+    """The maximum size of an update message in bytes, the limit of a DNS
+    message sent over TCP."""
 
-    def __init__(self, nameserver: str, port: int, zone: "Zone") -> None:
-        self._nameserver = nameserver
-        self._port = port
+    BULK_READ_CONCURRENCY: int = 16
+    """The number of reads :meth:`DnsZone.apply_changes` sends at the same
+    time to learn the current content of the changed names."""
+
+    CHECK_RECORD_NAME: str = "dyndns-check-tmp-a841278b-f089-4164-b8e6-f90514e573ec"
+
+    _cache: RecordCache | None
+    """Records read from the nameserver or written by this zone."""
+
+    _shadow: ZoneShadow | None
+    """An in-memory copy of the address records of the zone."""
+
+    _policy: QueryPolicy
+    """The timeouts, the retries and the hedging of the queries."""
+
+    _verifier: Verifier
+    """Reads the written records back."""
+
+    _metrics: DnsMetrics | None
+    """The latency histograms and the error and byte counters. ``None`` if
+    the metrics are disabled."""
+
+    _query_stats: QueryStats
+
+    _stats_lock: threading.Lock
+
+    def __init__(
+        self,
+        nameserver: str | Sequence[str],
+        port: int,
+        zone: "Zone",
+        conditional_updates: bool = False,
+        cache: RecordCache | None = None,
+        shadow: ZoneShadow | None = None,
+        policy: QueryPolicy | None = None,
+        verifier: Verifier | None = None,
+        metrics: DnsMetrics | None = None,
+    ) -> None:
+        self._nameservers = get_nameserver_group(nameserver, port)
         self._zone = zone
-        self._keyring = dns.tsigkeyring.from_text({zone.name: zone.tsig_key})
+        self._conditional_updates = conditional_updates
+        self._cache = cache
+        self._shadow = shadow
+        if policy is None:
+            policy = QueryPolicy()
+        self._policy = policy
+        if verifier is None:
+            verifier = Verifier()
+        self._verifier = verifier
+        self._metrics = metrics
+        self._query_stats = QueryStats()
+        self._stats_lock = threading.Lock()
 
     @property
-    def _resolver(self) -> dns.resolver.Resolver:
-        if not hasattr(self, "__resolver"):
-            self.__resolver = dns.resolver.Resolver()
-            self.__resolver.nameservers = [self._nameserver]
-            self.__resolver.port = self._port
-        return self.__resolver
+    def query_stats(self) -> QueryStats:
+        """A snapshot of the retry and hedging counters."""
+        with self._stats_lock:
+            return replace(self._query_stats)
 
-    def _create_update_message(self) -> dns.update.UpdateMessage:
-        return dns.update.UpdateMessage(
-            self._zone.name,
-            keyring=self._keyring,
-            keyalgorithm=dns.tsig.HMAC_SHA512,
-        )
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self._query_stats, counter, getattr(self._query_stats, counter) + 1)
 
-    def _query(self, message: dns.message.Message) -> dns.message.Message:
-        """Catch some errors and convert this errors to dyndns specific
-        errors."""
-        try:
-            return dns.query.tcp(
-                message, where=self._nameserver, port=self._port, timeout=5
+    @property
+    def metrics(self) -> DnsMetricsStats | None:
+        """A snapshot of the latency histograms and the error and byte
+        counters. ``None`` if the metrics are disabled."""
+        if self._metrics is None:
+            return None
+        return self._metrics.stats
+
+    def _measure(self, operation: Operation) -> AbstractContextManager[None]:
+        if self._metrics is None:
+            return _NOT_MEASURED
+        return self._metrics.measure(operation)
+
+    def _measure_message(
+        self, message: dns.message.Message
+    ) -> AbstractContextManager[None]:
+        """Update messages that only delete records are measured as
+        ``delete``. Other messages are part of a check, which is measured as
+        a whole."""
+        if self._metrics is None or not isinstance(message, dns.update.UpdateMessage):
+            return _NOT_MEASURED
+        if all(rrset.deleting is not None for rrset in message.update):
+            return self._metrics.measure("delete")
+        return self._metrics.measure("update")
+
+    def _count_error(self, error: Exception) -> None:
+        if self._metrics is not None:
+            self._metrics.count_error(error)
+
+    def _hedge_delay(self) -> float:
+        best = self._nameservers.ordered()[0]
+        return self._policy.hedge_delay(best.read_percentile(0.95))
+
+    def _rotated(self, skip: int) -> list[Nameserver]:
+        """:return: The nameservers in the order of their score, starting with
+        the nameserver at the position ``skip``."""
+        servers = self._nameservers.ordered()
+        skip %= len(servers)
+        return servers[skip:] + servers[:skip]
+
+    @property
+    def verifier_stats(self) -> VerifierStats:
+        """The counters of the verification of the written records."""
+        return self._verifier.stats
+
+    @staticmethod
+    def _targets_from_results(
+        results: dict[str, list[DnsChangeMessage]],
+    ) -> VerificationTargets:
+        return {
+            (result.fqdn, result.record_type): result.new
+            for messages in results.values()
+            for result in messages
+        }
+
+    @staticmethod
+    def _targets_from_changes(changes: list[RecordSetChange]) -> VerificationTargets:
+        """Record sets with more than one record are not verified because
+        only the first record is read back."""
+        targets: VerificationTargets = {}
+        for change in changes:
+            if len(change.add) > 1 or (change.add and not change.delete):
+                continue
+            targets[(change.fqdn, change.record_type)] = (
+                change.add[0] if change.add else None
             )
-        except dns.tsig.PeerBadKey:
-            raise DNSServerError(
-                f'The peer "{self._nameserver}" didn\'t know the tsig key '
+        return targets
+
+    @staticmethod
+    def _apply_verification(
+        results: dict[str, list[DnsChangeMessage]], actual: VerificationTargets
+    ) -> dict[str, list[DnsChangeMessage]]:
+        """Replace the written content by the content read back."""
+        for messages in results.values():
+            for result in messages:
+                key = (result.fqdn, result.record_type)
+                if key in actual:
+                    result.new = actual[key]
+        return results
+
+    def invalidate(self, serial: int | None = None) -> None:
+        """Drop the cached records after the zone was changed, for example
+        by a NOTIFY of the nameserver. The copy of the zone is brought up to
+        date by an incremental zone transfer.
+
+        :param serial: The new SOA serial of the zone. The copy of the zone
+            is not refreshed if it already has this serial.
+        """
+        if self._cache is not None:
+            self._cache.clear()
+        if self._shadow is not None and (
+            serial is None or serial != self._shadow.serial
+        ):
+            self._shadow.refresh()
+
+    def shadowed_addresses(self, fqdn: str) -> tuple[str | None, str | None] | None:
+        """:return: The IPv4 and the IPv6 address of a name in the copy of
+            the zone or ``None`` if the zone has no loaded copy."""
+        if self._shadow is None or not self._shadow.loaded:
+            return None
+        return self._shadow.get(fqdn, "A"), self._shadow.get(fqdn, "AAAA")
+
+    @property
+    def cache_stats(self) -> CacheStats | None:
+        """The counters of the record cache or ``None`` if the records are
+        not cached."""
+        if self._cache is None:
+            return None
+        return self._cache.stats
+
+    def _create_update_message(self) -> dns.update.UpdateMessage:
+        return dns.update.UpdateMessage(self._zone.name, keyring=self._zone.key)
+
+    def _translate_error(self, nameserver: Nameserver, error: Exception) -> Exception:
+        """Convert some errors to dyndns specific errors."""
+        if isinstance(error, dns.tsig.PeerBadKey):
+            return DNSServerError(
+                f'The peer "{nameserver.address}" didn\'t know the tsig key '
                 f'we used for the zone "{self._zone.name}".'
             )
-        except dns.exception.Timeout:
+        if isinstance(error, dns.exception.Timeout):
+            return DNSServerError(
+                f'The DNS operation to the nameserver "{nameserver.address}" timed out.'
+            )
+        if isinstance(error, (OSError, EOFError)):
+            return DNSServerError(
+                f'The connection to the nameserver "{nameserver.address}" '
+                f"failed: {error}"
+            )
+        return error
+
+    def _check_rcode(
+        self, response: dns.message.Message, *accepted: dns.rcode.Rcode
+    ) -> dns.rcode.Rcode:
+        """Make sure the nameserver applied an update.
+
+        :param accepted: Further response codes besides ``NOERROR`` that are
+            returned instead of being raised as an error.
+
+        :return: The response code of the nameserver.
+        """
+        rcode = response.rcode()
+        if rcode != dns.rcode.NOERROR and rcode not in accepted:
             raise DNSServerError(
-                f'The DNS operation to the nameserver "{self._nameserver}" timed out.'
+                f'The nameserver "{self._nameservers.describe()}" rejected the update '
+                f'of the zone "{self._zone.name}": {dns.rcode.to_text(rcode)}.'
             )
+        return rcode
 
     def _normalize_name(self, name: str) -> str:
         """
@@ -95,6 +395,734 @@ class DnsZone:
         """
         return self._zone.get_fqdn(name)
 
+    @staticmethod
+    def _rdata_to_content(record_type: RecordType, rdata: dns.rdata.Rdata) -> str:
+        if record_type == "TXT":
+            return getattr(rdata, "strings")[0].decode()
+        return rdata.to_text()
+
+    def _content_from_rrset(
+        self, record_type: RecordType, rrset: dns.rrset.RRset | None
+    ) -> tuple[str | None, int | None]:
+        """:return: The content of the first record and the time to live."""
+        if rrset and len(rrset) > 0:
+            return self._rdata_to_content(record_type, rrset[0]), rrset.ttl
+        return None, None
+
+    def _remember(self, results: list[DnsChangeMessage], ttl: int) -> None:
+        """Write the committed changes through to the record cache and the
+        copy of the zone."""
+        for result in results:
+            if self._cache is not None:
+                self._cache.set(result.fqdn, result.record_type, result.new, ttl)
+            if self._shadow is not None and self._shadow.covers(result.record_type):
+                self._shadow.set(result.fqdn, result.record_type, result.new)
+
+    def _forget(self, fqdn: str, record_type: RecordType) -> None:
+        """Remove a record from the record cache and the copy of the zone."""
+        if self._cache is not None:
+            self._cache.invalidate(fqdn, record_type)
+        if self._shadow is not None and self._shadow.covers(record_type):
+            self._shadow.set(fqdn, record_type, None)
+
+    def _lookup(self, fqdn: str, record_type: RecordType) -> tuple[bool, str | None]:
+        """Look up a record in the copy of the zone or in the record cache
+        without asking the nameserver.
+
+        :return: ``True`` and the content or ``False`` and ``None`` if the
+            record is not known locally.
+        """
+        if (
+            self._shadow is not None
+            and self._shadow.loaded
+            and self._shadow.covers(record_type)
+        ):
+            return True, self._shadow.get(fqdn, record_type)
+        if self._cache is not None:
+            return self._cache.get(fqdn, record_type)
+        return False, None
+
+    def _build_update(
+        self,
+        message: dns.update.UpdateMessage,
+        fqdn: str,
+        records: dict[RecordType, str | None],
+        old: dict[RecordType, str | None],
+        ttl: int,
+    ) -> list[DnsChangeMessage]:
+        """Add the replacement of the records of several record types of one
+        name to an update message.
+
+        :param old: The current content by record type. It may come from a
+            stale cache, so it only fills the change messages and never
+            decides whether the records are deleted.
+        """
+        results: list[DnsChangeMessage] = []
+        for record_type, content in records.items():
+            new: str | None = None
+            # Deleting a record set that doesn’t exist is a no-op (RFC 2136).
+            message.delete(fqdn, record_type)
+            if content is not None:
+                new = format_content(record_type, content)
+                message.add(fqdn, ttl, record_type, content)
+            results.append(
+                DnsChangeMessage(
+                    fqdn=fqdn, old=old[record_type], new=new, record_type=record_type
+                )
+            )
+        return results
+
+    def _expect(
+        self, fqdn: str, records: dict[RecordType, str | None]
+    ) -> tuple[dict[RecordType, dns.rdata.Rdata | None], Expectation]:
+        """Prepare a conditional update. The first attempt expects the cached
+        records or the records of the copy of the zone. Records that are not
+        known locally are assumed to be already up to date, which is the case
+        for most dynamic DNS updates.
+
+        :return: The new records and the expected records by record type.
+        """
+        rdatas: dict[RecordType, dns.rdata.Rdata | None] = {}
+        expected: Expectation = {}
+        for record_type, content in records.items():
+            rdata: dns.rdata.Rdata | None = None
+            if content is not None:
+                rdata = dns.rdata.from_text(dns.rdataclass.IN, record_type, content)
+            rdatas[record_type] = rdata
+            expected[record_type] = [] if rdata is None else [rdata]
+            hit, cached = self._lookup(fqdn, record_type)
+            if hit:
+                expected[record_type] = []
+                if cached is not None:
+                    expected[record_type] = [
+                        dns.rdata.from_text(dns.rdataclass.IN, record_type, cached)
+                    ]
+        return rdatas, expected
+
+    def _build_conditional_update(
+        self,
+        message: dns.update.UpdateMessage,
+        fqdn: str,
+        rdatas: dict[RecordType, dns.rdata.Rdata | None],
+        expected: Expectation,
+        ttl: int,
+    ) -> None:
+        """Add the expected records as RFC 2136 prerequisites (“RRset exists
+        (value dependent)” or “RRset does not exist”) together with the
+        changes to an update message."""
+        for record_type, rdata in rdatas.items():
+            if expected[record_type]:
+                for expected_rdata in expected[record_type]:
+                    message.present(fqdn, expected_rdata)
+            else:
+                message.absent(fqdn, record_type)
+            if rdata is not None:
+                message.delete(fqdn, record_type)
+                message.add(fqdn, ttl, rdata)
+            elif expected[record_type]:
+                message.delete(fqdn, record_type)
+
+    def _conditional_results(
+        self,
+        fqdn: str,
+        records: dict[RecordType, str | None],
+        expected: Expectation,
+    ) -> list[DnsChangeMessage]:
+        results: list[DnsChangeMessage] = []
+        for record_type, content in records.items():
+            old: str | None = None
+            if expected[record_type]:
+                old = self._rdata_to_content(record_type, expected[record_type][0])
+            new: str | None = None
+            if content is not None:
+                new = format_content(record_type, content)
+            results.append(
+                DnsChangeMessage(fqdn=fqdn, old=old, new=new, record_type=record_type)
+            )
+        return results
+
+    def _build_batch(
+        self, batch: Batch, old: dict[str, dict[RecordType, str | None]]
+    ) -> tuple[dns.update.UpdateMessage, dict[str, list[DnsChangeMessage]]]:
+        """
+        :param old: The current content by record type and by fully
+            qualified domain name.
+        """
+        message: dns.update.UpdateMessage = self._create_update_message()
+        results: dict[str, list[DnsChangeMessage]] = {}
+        for fqdn, (records, ttl) in batch.items():
+            results[fqdn] = self._build_update(message, fqdn, records, old[fqdn], ttl)
+        return message, results
+
+    def _remember_batch(
+        self, batch: Batch, results: dict[str, list[DnsChangeMessage]]
+    ) -> dict[str, list[DnsChangeMessage]]:
+        for fqdn, (_, ttl) in batch.items():
+            self._remember(results[fqdn], ttl)
+        return results
+
+    def _prepare_conditional_batch(self, batch: Batch) -> PreparedBatch:
+        return {
+            fqdn: self._expect(fqdn, records) for fqdn, (records, _) in batch.items()
+        }
+
+    def _build_conditional_batch(
+        self, batch: Batch, prepared: PreparedBatch
+    ) -> dns.update.UpdateMessage:
+        message: dns.update.UpdateMessage = self._create_update_message()
+        for fqdn, (rdatas, expected) in prepared.items():
+            self._build_conditional_update(
+                message, fqdn, rdatas, expected, batch[fqdn][1]
+            )
+        return message
+
+    def _conditional_batch_results(
+        self, batch: Batch, prepared: PreparedBatch
+    ) -> dict[str, list[DnsChangeMessage]]:
+        results = {
+            fqdn: self._conditional_results(fqdn, batch[fqdn][0], expected)
+            for fqdn, (_, expected) in prepared.items()
+        }
+        return self._remember_batch(batch, results)
+
+    def _normalize_changes(self, changes: Sequence[DnsChange]) -> list[DnsChange]:
+        """Validate the changes and convert the names to fully qualified
+        domain names."""
+        normalized: list[DnsChange] = []
+        for change in changes:
+            if change.action not in ("add", "replace", "delete"):
+                raise ParameterError(f"Unknown change action '{change.action}'.")
+            if change.action != "delete" and change.content is None:
+                raise ParameterError(
+                    f"The change action '{change.action}' requires a content."
+                )
+            normalized.append(replace(change, name=self._normalize_name(change.name)))
+        return normalized
+
+    def _prepare_changes(
+        self,
+        changes: list[DnsChange],
+        current: dict[tuple[str, RecordType], str | None],
+    ) -> tuple[list[RecordSetChange], list[DnsChangeMessage]]:
+        """Replay the changes on the current content.
+
+        :param changes: Changes with fully qualified domain names.
+        :param current: The current content by name and record type.
+
+        :return: The net change of each name and record type and a change
+            message for each change. The current content may come from a
+            stale cache, so it only fills the change messages and the
+            deletions are sent even if the records seem not to exist.
+        """
+        current = dict(current)
+        net: dict[tuple[str, RecordType], RecordSetChange] = {}
+        results: list[DnsChangeMessage] = []
+        for change in changes:
+            key = (change.name, change.record_type)
+            old = current[key]
+            new: str | None = None
+            if change.content is not None and change.action != "delete":
+                new = format_content(change.record_type, change.content)
+            record_set = net.setdefault(
+                key, RecordSetChange(change.name, change.record_type)
+            )
+            record_set.ttl = change.ttl
+            if change.action == "add":
+                assert new is not None
+                record_set.add.append(new)
+                if old is None:
+                    current[key] = new
+            else:
+                record_set.delete = True
+                record_set.add = [] if new is None else [new]
+                current[key] = new
+            results.append(
+                DnsChangeMessage(
+                    fqdn=change.name, old=old, new=new, record_type=change.record_type
+                )
+            )
+        return list(net.values()), results
+
+    def _record_set_rrsets(self, change: RecordSetChange) -> list[dns.rrset.RRset]:
+        """:return: The RRsets of the update section of a change, the same
+        RRsets that ``UpdateMessage.delete`` and ``UpdateMessage.add``
+        create."""
+        name = dns.name.from_text(change.fqdn)
+        rdtype = dns.rdatatype.from_text(change.record_type)
+        rrsets: list[dns.rrset.RRset] = []
+        if change.delete:
+            rrsets.append(
+                dns.rrset.RRset(
+                    name, dns.rdataclass.IN, rdtype, deleting=dns.rdataclass.ANY
+                )
+            )
+        if change.add:
+            rrset = dns.rrset.RRset(name, dns.rdataclass.IN, rdtype)
+            for content in change.add:
+                rrset.add(
+                    dns.rdata.from_text(dns.rdataclass.IN, rdtype, content), change.ttl
+                )
+            rrsets.append(rrset)
+        return rrsets
+
+    def _create_renderer(self) -> dns.renderer.Renderer:
+        """A renderer that measures the size of an update message. The space
+        of the TSIG record and of the ``edns-tcp-keepalive`` option added by
+        the connection pool is reserved."""
+        message = self._create_update_message()
+        renderer = dns.renderer.Renderer(max_size=self.MAX_UPDATE_SIZE)
+        renderer.reserve(KEEPALIVE_SIZE)
+        if message.tsig is not None:
+            wire = io.BytesIO()
+            message.tsig.to_wire(wire)
+            renderer.reserve(len(wire.getvalue()))
+        for rrset in message.question:
+            renderer.add_question(rrset.name, rrset.rdtype, rrset.rdclass)
+        return renderer
+
+    @staticmethod
+    def _render(renderer: dns.renderer.Renderer, rrsets: list[dns.rrset.RRset]) -> bool:
+        """:return: ``False`` if the RRsets don’t fit into the message."""
+        try:
+            for rrset in rrsets:
+                renderer.add_rrset(dns.renderer.AUTHORITY, rrset)
+        except dns.exception.TooBig:
+            return False
+        return True
+
+    def _create_update_message_with(
+        self, update: list[dns.rrset.RRset]
+    ) -> dns.update.UpdateMessage:
+        message = self._create_update_message()
+        message.update.extend(update)
+        return message
+
+    def _pack_changes(
+        self, changes: list[RecordSetChange]
+    ) -> list[tuple[dns.update.UpdateMessage, list[RecordSetChange]]]:
+        """Distribute the changes in their order over as few update messages
+        as :attr:`MAX_UPDATE_SIZE` allows. The changes are rendered one after
+        another with name compression, so the size of each message is known
+        exactly before it is built."""
+        packed: list[tuple[dns.update.UpdateMessage, list[RecordSetChange]]] = []
+        chunk: list[RecordSetChange] = []
+        update: list[dns.rrset.RRset] = []
+        renderer = self._create_renderer()
+        for change in changes:
+            rrsets = self._record_set_rrsets(change)
+            if not self._render(renderer, rrsets):
+                renderer = self._create_renderer()
+                if not chunk or not self._render(renderer, rrsets):
+                    raise ParameterError(
+                        f"The change of '{change.fqdn}' exceeds the maximum size "
+                        "of an update message."
+                    )
+                packed.append((self._create_update_message_with(update), chunk))
+                chunk, update = [], []
+            chunk.append(change)
+            update.extend(rrsets)
+        if chunk:
+            packed.append((self._create_update_message_with(update), chunk))
+        return packed
+
+    def _remember_changes(self, changes: list[RecordSetChange]) -> None:
+        """Write committed changes through to the record cache and the copy
+        of the zone."""
+        for change in changes:
+            if change.delete:
+                content = change.add[0] if change.add else None
+                self._remember(
+                    [DnsChangeMessage(change.fqdn, None, content, change.record_type)],
+                    change.ttl,
+                )
+                added = change.add[1:]
+            else:
+                added = change.add
+            if not added:
+                continue
+            # The cache holds only the first record of a name.
+            if self._cache is not None:
+                self._cache.invalidate(change.fqdn, change.record_type)
+            if self._shadow is not None and self._shadow.covers(change.record_type):
+                for content in added:
+                    self._shadow.add(change.fqdn, change.record_type, content)
+
+    def _concurrently_modified(self, *fqdns: str) -> DNSServerError:
+        names = "', '".join(fqdns)
+        return DNSServerError(
+            f"The records of the domain name '{names}' could not be updated "
+            "because they were modified concurrently "
+            f"{self.CONDITIONAL_UPDATE_ATTEMPTS} times."
+        )
+
+    def _build_delete(
+        self, name: str, record_type: RecordType
+    ) -> dns.update.UpdateMessage:
+        fqdn = self._normalize_name(name)
+        message: dns.update.UpdateMessage = self._create_update_message()
+        message.delete(fqdn, record_type)
+        self._forget(fqdn, record_type)
+        return message
+
+    @staticmethod
+    def _random_check_content() -> str:
+        return "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
+
+    def _build_check_query(self) -> dns.message.QueryMessage:
+        """A TSIG signed query of the ``SOA`` record of the zone. It tests the
+        key and the reachability of the nameserver without changing the
+        zone."""
+        message = dns.message.make_query(self._zone.name, dns.rdatatype.SOA)
+        message.use_tsig(self._zone.key)
+        return message
+
+    def _unverified_check(self, error: dns.exception.DNSException) -> CheckError:
+        """A TSIG error, for example if the nameserver doesn’t know the key
+        and answers unsigned."""
+        return CheckError(
+            f"The answer to the signed SOA query of the zone '{self._zone.name}' "
+            f"could not be verified: {error}"
+        )
+
+    def _evaluate_light_check(self, response: dns.message.Message) -> str:
+        rcode = response.rcode()
+        if rcode != dns.rcode.NOERROR:
+            raise CheckError(
+                f"The nameserver answered the signed SOA query of the zone "
+                f"'{self._zone.name}' with {dns.rcode.to_text(rcode)}."
+            )
+        if not response.had_tsig:
+            raise CheckError(
+                f"The answer to the SOA query of the zone '{self._zone.name}' "
+                "was not signed."
+            )
+        rrset = response.get_rrset(
+            response.answer,
+            dns.name.from_text(self._zone.name),
+            dns.rdataclass.IN,
+            dns.rdatatype.SOA,
+        )
+        if not rrset:
+            raise CheckError(
+                f"The nameserver is not authoritative for the zone '{self._zone.name}'."
+            )
+        return logger.log(
+            LogLevel.INFO,
+            "The light check passed: "
+            f"The signed SOA query of the zone '{self._zone.name}' was answered "
+            f"(serial {getattr(rrset[0], 'serial')}).",
+        )
+
+    def _evaluate_check(self, result: str | None, content: str) -> str:
+        if not result:
+            raise CheckError("no response")
+        if result != content:
+            raise CheckError("check failed")
+        else:
+            return logger.log(
+                LogLevel.INFO,
+                "The update check passed: "
+                f"A TXT record '{self.CHECK_RECORD_NAME}' with the content '{content}' "
+                f"could be updated on the zone '{self._zone.name}'.",
+            )
+
+
+class DnsZone(BaseDnsZone):
+    _pools: dict[Nameserver, ConnectionPool]
+    """The TCP connections to each nameserver. A pool is shared by all zones
+    that are hosted on the same nameserver."""
+
+    _resolvers: dict[Nameserver, dns.resolver.Resolver]
+    """The resolvers are created once per zone. They don’t read
+    ``/etc/resolv.conf`` and each resolver asks only one nameserver, so the
+    nameservers can be tried in the order of their score."""
+
+    _queue: "UpdateQueue | None"
+    """Merges the updates of concurrent callers into few update messages.
+    ``None`` sends each update on its own."""
+
+    def __init__(
+        self,
+        nameserver: str | Sequence[str],
+        port: int,
+        zone: "Zone",
+        conditional_updates: bool = False,
+        cache: RecordCache | None = None,
+        shadow: ZoneShadow | None = None,
+        policy: QueryPolicy | None = None,
+        queue: "UpdateQueue | None" = None,
+        verifier: Verifier | None = None,
+        metrics: DnsMetrics | None = None,
+    ) -> None:
+        super().__init__(
+            nameserver,
+            port,
+            zone,
+            conditional_updates=conditional_updates,
+            cache=cache,
+            shadow=shadow,
+            policy=policy,
+            verifier=verifier,
+            metrics=metrics,
+        )
+        self._verifier.attach(
+            lambda fqdn, record_type: self.read_record(
+                fqdn, record_type, use_cache=False
+            )
+        )
+        self._queue = queue
+        if queue is not None:
+            queue.attach(self._update_batch)
+        self._pools = {}
+        self._resolvers = {}
+        for server in self._nameservers.nameservers:
+            self._pools[server] = get_pool(server.address, server.port)
+            resolver = dns.resolver.Resolver(configure=False)
+            resolver.nameservers = [server.address]
+            resolver.port = server.port
+            resolver.timeout = self._policy.read_timeout
+            resolver.lifetime = self._policy.read_timeout
+            self._resolvers[server] = resolver
+
+    def _query(self, message: dns.message.Message) -> dns.message.Message:
+        """Send a message to the best nameserver. If the nameserver fails,
+        the next nameserver is tried. If all nameservers fail, the message is
+        sent again after a backoff.
+
+        Catch some errors and convert this errors to dyndns specific
+        errors."""
+        with self._measure_message(message):
+            return self._send(message)
+
+    def _send(self, message: dns.message.Message) -> dns.message.Message:
+        failure: tuple[Nameserver, Exception] | None = None
+        for attempt, delay in enumerate(self._policy.delays()):
+            if attempt > 0:
+                assert failure is not None
+                if isinstance(failure[1], dns.tsig.PeerBadKey):
+                    break
+                self._count("retries")
+                time.sleep(delay)
+            for server in self._nameservers.ordered():
+                start = time.monotonic()
+                try:
+                    response = self._pools[server].query(
+                        message,
+                        timeout=self._policy.update_timeout,
+                        metrics=self._metrics,
+                    )
+                except UPDATE_ERRORS as e:
+                    server.record_failure()
+                    self._count_error(e)
+                    failure = (server, e)
+                    continue
+                server.record_success(time.monotonic() - start)
+                return response
+        assert failure is not None
+        raise self._translate_error(*failure) from failure[1]
+
+    def _commit(
+        self, message: dns.update.UpdateMessage, *accepted: dns.rcode.Rcode
+    ) -> dns.rcode.Rcode:
+        """Send an update message and make sure the nameserver applied it.
+
+        :param accepted: Further response codes besides ``NOERROR`` that are
+            returned instead of being raised as an error.
+
+        :return: The response code of the nameserver.
+        """
+        return self._check_rcode(self._query(message), *accepted)
+
+    def update_records(
+        self, name: str, records: dict[RecordType, str | None], ttl: int = 300
+    ) -> list[DnsChangeMessage]:
+        """
+        Replace the records of several record types of one name in a single
+        atomic update message. All existing records with the same name and
+        the same record type are deleted and the new records are added in one
+        transaction, so there is no moment in which the name has no record.
+
+        :param name: A record name (e. g. ``dyndns``) or a fully qualified
+            domain name (e. g. ``dyndns.example.com``).
+        :param records: The new content by record type, for example
+            ``{"A": "1.2.3.4", "AAAA": None}``. ``None`` deletes the records
+            of the given type.
+        :param ttl: Time to live.
+
+        If the zone has a write-behind queue, the update is merged with the
+        updates of other callers and the method returns as soon as the
+        merged update message is committed.
+
+        :return: A change message for each record type in the order of
+            ``records``.
+        """
+        if self._queue is not None:
+            return self.queue_records(name, records, ttl).result()
+        fqdn = self._normalize_name(name)
+        return self._update_batch({fqdn: (records, ttl)})[fqdn]
+
+    @property
+    def write_behind(self) -> bool:
+        """Whether the zone merges the updates of concurrent callers by a
+        write-behind queue."""
+        return self._queue is not None
+
+    def queue_records(
+        self, name: str, records: dict[RecordType, str | None], ttl: int = 300
+    ) -> "concurrent.futures.Future[list[DnsChangeMessage]]":
+        """
+        Queue an update like :meth:`update_records` without waiting for it.
+        The zone must have a write-behind queue.
+
+        :return: A future that resolves to the change messages once the
+            merged update message is committed.
+        """
+        assert self._queue is not None
+        return self._queue.submit(self._normalize_name(name), records, ttl)
+
+    def update_many(self, batch: Batch) -> dict[str, list[DnsChangeMessage]]:
+        """
+        Replace the records of several names in a single atomic update
+        message, bypassing the write-behind queue.
+
+        :param batch: The new content by record type and the time to live
+            by record name or fully qualified domain name, for example
+            ``{"dyndns": ({"A": "1.2.3.4", "AAAA": None}, 300)}``.
+
+        :return: The change messages by the names of ``batch``.
+        """
+        fqdns = {name: self._normalize_name(name) for name in batch}
+        results = self._update_batch(
+            {fqdns[name]: records for name, records in batch.items()}
+        )
+        return {name: results[fqdn] for name, fqdn in fqdns.items()}
+
+    def _update_batch(self, batch: Batch) -> dict[str, list[DnsChangeMessage]]:
+        """Replace the records of several names in a single update message.
+
+        :return: The change messages by fully qualified domain name.
+        """
+        if self._conditional_updates:
+            return self._update_batch_conditionally(batch)
+        old = {
+            fqdn: {
+                record_type: self.read_record(fqdn, record_type)
+                for record_type in records
+            }
+            for fqdn, (records, _) in batch.items()
+        }
+        message, results = self._build_batch(batch, old)
+        if message.update:
+            self._commit(message)
+        return self._verified(self._remember_batch(batch, results))
+
+    def _verify(self, targets: VerificationTargets) -> VerificationTargets:
+        """Read the written records back according to the verification
+        mode.
+
+        :return: The content read back in the ``sync`` mode."""
+        if self._verifier.mode == "async":
+            for key, expected in targets.items():
+                self._verifier.submit(*key, expected)
+        if self._verifier.mode != "sync":
+            return {}
+        actual: VerificationTargets = {}
+        for key, expected in targets.items():
+            actual[key] = self.read_record(*key, use_cache=False)
+            self._verifier.compare(*key, expected, actual[key])
+        return actual
+
+    def _verified(
+        self, results: dict[str, list[DnsChangeMessage]]
+    ) -> dict[str, list[DnsChangeMessage]]:
+        return self._apply_verification(
+            results, self._verify(self._targets_from_results(results))
+        )
+
+    def apply_changes(self, changes: Sequence[DnsChange]) -> list[DnsChangeMessage]:
+        """
+        Apply many changes of many names of the zone, for example for a bulk
+        import. The changes are packed in their order into as few update
+        messages as the maximum message size allows. Each update message is
+        applied atomically by the nameserver. If an update message is
+        rejected, the changes of the update messages sent before it stay
+        applied.
+
+        The current content of each name and record type is read once before
+        the update, :attr:`BULK_READ_CONCURRENCY` reads at the same time. With
+        ``zone_shadow`` enabled it is taken from memory, so no reads are sent
+        at all.
+
+        :param changes: The changes in the order they are applied.
+
+        :return: A change message for each change in the order of
+            ``changes``. The old content is the first record before the
+            change.
+        """
+        normalized = self._normalize_changes(changes)
+        keys = list(
+            dict.fromkeys((change.name, change.record_type) for change in normalized)
+        )
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(self.BULK_READ_CONCURRENCY, len(keys))),
+            thread_name_prefix="dyndns-bulk-read",
+        ) as executor:
+            contents = list(executor.map(lambda key: self.read_record(*key), keys))
+        outgoing, results = self._prepare_changes(
+            normalized, dict(zip(keys, contents))
+        )
+        for message, packed in self._pack_changes(outgoing):
+            self._commit(message)
+            self._remember_changes(packed)
+        self._verify(self._targets_from_changes(outgoing))
+        return results
+
+    def _read_rdatas(
+        self, fqdn: str, record_type: RecordType
+    ) -> list[dns.rdata.Rdata]:
+        try:
+            rrset = self.read_resource_record_set(fqdn, record_type)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            return []
+        if rrset is None:
+            return []
+        return list(rrset)
+
+    def _update_batch_conditionally(
+        self, batch: Batch
+    ) -> dict[str, list[DnsChangeMessage]]:
+        """
+        Replace the records without reading them first. The expected state is
+        sent as RFC 2136 prerequisites together with the changes. The
+        nameserver applies the changes only if the prerequisites are met, so
+        the old state in the change messages is exactly the state that was
+        replaced, even if other clients update the same name at the same
+        time.
+
+        If the nameserver answers ``NXRRSET`` or ``YXRRSET``, the current
+        records are read and the update is sent again with the new
+        expectation.
+        """
+        prepared = self._prepare_conditional_batch(batch)
+        for _ in range(self.CONDITIONAL_UPDATE_ATTEMPTS):
+            message = self._build_conditional_batch(batch, prepared)
+            rcode = self._commit(message, dns.rcode.NXRRSET, dns.rcode.YXRRSET)
+            if rcode == dns.rcode.NOERROR:
+                return self._verified(
+                    self._conditional_batch_results(batch, prepared)
+                )
+            prepared = {
+                fqdn: (
+                    rdatas,
+                    {
+                        record_type: self._read_rdatas(fqdn, record_type)
+                        for record_type in rdatas
+                    },
+                )
+                for fqdn, (rdatas, _) in prepared.items()
+            }
+        raise self._concurrently_modified(*batch)
+
     def add_record(
         self, name: str, record_type: RecordType, content: str, ttl: int = 300
     ) -> DnsChangeMessage:
@@ -107,14 +1135,7 @@ class DnsZone:
         :param record_type: The type of the resource record. ``dyndns``
             supports only ``A``, ``AAAA`` and ``TXT`` record types.
         """
-        fqdn = self._normalize_name(name)
-        old = self.read_record(fqdn, record_type)
-        self._delete_record(fqdn, record_type)
-        message: dns.update.UpdateMessage = self._create_update_message()
-        message.add(fqdn, ttl, record_type, content)
-        self._query(message)
-        new = self.read_record(fqdn, record_type)
-        return DnsChangeMessage(fqdn=fqdn, old=old, new=new, record_type=record_type)
+        return self.update_records(name, {record_type: content}, ttl=ttl)[0]
 
     def read_resource_record_set(
         self, name: str, record_type: RecordType
@@ -125,34 +1146,96 @@ class DnsZone:
         :param record_type: The type of the resource record. ``dyndns``
             supports only ``A``, ``AAAA`` and ``TXT`` record types.
         """
-        result: dns.resolver.Answer = self._resolver.resolve(
-            self._normalize_name(name), record_type
-        )
-        return result.rrset
+        fqdn = self._normalize_name(name)
+        with self._measure("read"):
+            if self._policy.hedge_reads:
+                return self._resolve_hedged(fqdn, record_type).rrset
+            return self._resolve(fqdn, record_type).rrset
+
+    def _resolve(
+        self, fqdn: str, record_type: RecordType, skip: int = 0
+    ) -> dns.resolver.Answer:
+        """Ask the nameservers in the order of their score until one answers.
+        If all nameservers fail, the read is retried after a backoff.
 
-    def read_record(self, name: str, record_type: RecordType) -> str | None:
+        :param skip: Start with the nameserver at this position.
         """
-        Read one record.
+        error: Exception | None = None
+        for attempt, delay in enumerate(self._policy.delays()):
+            if attempt > 0:
+                self._count("retries")
+                time.sleep(delay)
+            for server in self._rotated(skip):
+                start = time.monotonic()
+                try:
+                    answer = self._resolvers[server].resolve(fqdn, record_type)
+                except AUTHORITATIVE_ERRORS:
+                    server.record_success(time.monotonic() - start, read=True)
+                    raise
+                except READ_ERRORS as e:
+                    server.record_failure()
+                    self._count_error(e)
+                    error = e
+                    continue
+                server.record_success(time.monotonic() - start, read=True)
+                return answer
+        assert error is not None
+        raise error
+
+    def _resolve_hedged(
+        self, fqdn: str, record_type: RecordType
+    ) -> dns.resolver.Answer:
+        """Send a second read starting with the next nameserver if the first
+        read has not been answered in time. The first answer wins."""
+        executor = get_hedge_executor()
+        first = executor.submit(self._resolve, fqdn, record_type)
+        done, _ = concurrent.futures.wait([first], timeout=self._hedge_delay())
+        if done:
+            return first.result()
+        self._count("hedged")
+        second = executor.submit(self._resolve, fqdn, record_type, 1)
+        pending = {first, second}
+        while True:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            winner = next((future for future in done if _answered(future)), None)
+            if winner is not None:
+                if winner is second:
+                    self._count("hedge_wins")
+                return winner.result()
+            if not pending:
+                return done.pop().result()
+
+    def read_record(
+        self, name: str, record_type: RecordType, use_cache: bool = True
+    ) -> str | None:
+        """
+        Read one record. The record is taken from the copy of the zone or
+        from the record cache if possible.
 
         :param name: A record name (e. g. ``dyndns``) or a fully qualified
             domain name (e. g. ``dyndns.example.com``).
         :param record_type: The type of the resource record. ``dyndns``
             supports only ``A``, ``AAAA`` and ``TXT`` record types.
+        :param use_cache: ``False`` asks the nameserver in any case.
         """
+        fqdn = self._normalize_name(name)
+        if use_cache:
+            hit, content = self._lookup(fqdn, record_type)
+            if hit:
+                return content
+        content = None
+        ttl: int | None = None
         try:
-            result: Any = self.read_resource_record_set(name, record_type)
-            if result and len(result) > 0:
-                if record_type == "TXT":
-                    element = result.pop()
-                    result = element.strings[0].decode()
-                    if isinstance(result, str):
-                        return result
-                    raise ValueError("The record could not be read.")
-                else:
-                    return str(result[0])
+            content, ttl = self._content_from_rrset(
+                record_type, self.read_resource_record_set(fqdn, record_type)
+            )
         except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
             pass
-        return None
+        if self._cache is not None:
+            self._cache.set(fqdn, record_type, content, ttl)
+        return content
 
     def read_a_record(self, name: str) -> str | None:
         """
@@ -209,9 +1292,7 @@ class DnsZone:
         :param record_type: The type of the resource record. ``dyndns``
             supports only ``A``, ``AAAA`` and ``TXT`` record types.
         """
-        message: dns.update.UpdateMessage = self._create_update_message()
-        message.delete(self._normalize_name(name), record_type)
-        return self._query(message)
+        return self._query(self._build_delete(name, record_type))
 
     def delete_record(
         self, name: str, record_type: RecordType = "A"
@@ -224,38 +1305,389 @@ class DnsZone:
         :param record_type: The type of the resource record. ``dyndns``
             supports only ``A``, ``AAAA`` and ``TXT`` record types.
         """
-        fqdn: str = self._normalize_name(name)
-        old = self.read_record(fqdn, record_type)
-        self._delete_record(fqdn, record_type)
-        return DnsChangeMessage(fqdn=fqdn, old=old, new=None, record_type=record_type)
+        return self.update_records(name, {record_type: None})[0]
 
-    def delete_records(self, name: str) -> None:
-        """Delete all A and the AAAA records.
+    def delete_records(self, name: str) -> list[DnsChangeMessage]:
+        """Delete all A and the AAAA records in a single update message.
 
         :param name: A record name (e. g. ``dyndns``) or a fully qualified
             domain name (e. g. ``dyndns.example.com``).
         """
-        self._delete_record(name, "A")
-        self._delete_record(name, "AAAA")
+        return self.update_records(name, {"A": None, "AAAA": None})
+
+    def check(self, mode: CheckMode = "full") -> str:
+        """Check the functionality of the DNS server.
 
-    def check(self) -> str:
-        """Check the functionality of the DNS server by creating a temporary text record."""
-        check_record_name = "dyndns-check-tmp-a841278b-f089-4164-b8e6-f90514e573ec"
-        random_content: str = "".join(
-            random.choices(string.ascii_uppercase + string.digits, k=8)
+        :param mode: ``full`` creates, reads and deletes a temporary text
+            record. ``light`` sends a TSIG signed ``SOA`` query, which costs one
+            round trip and doesn’t change the zone.
+        """
+        with self._measure("check"):
+            return self._check(mode)
+
+    def _check(self, mode: CheckMode) -> str:
+        if mode == "light":
+            try:
+                response = self._query(self._build_check_query())
+            except dns.exception.DNSException as e:
+                raise self._unverified_check(e) from e
+            return self._evaluate_light_check(response)
+        random_content: str = self._random_check_content()
+        self._delete_record(self.CHECK_RECORD_NAME, "TXT")
+        self.add_record(self.CHECK_RECORD_NAME, "TXT", random_content)
+        result: str | None = self.read_record(
+            self.CHECK_RECORD_NAME, "TXT", use_cache=False
         )
-        self._delete_record(check_record_name, "TXT")
-        self.add_record(check_record_name, "TXT", random_content)
-        result: str | None = self.read_record(check_record_name, "TXT")
-        self._delete_record(check_record_name, "TXT")
-        if not result:
-            raise CheckError("no response")
-        if result != random_content:
-            raise CheckError("check failed")
-        else:
-            return logger.log(
-                LogLevel.INFO,
-                "The update check passed: "
-                f"A TXT record '{check_record_name}' with the content '{random_content}' "
-                f"could be updated on the zone '{self._zone.name}'.",
+        self._delete_record(self.CHECK_RECORD_NAME, "TXT")
+        return self._evaluate_check(result, random_content)
+
+
+class AsyncDnsZone(BaseDnsZone):
+    """The asyncio counterpart of :class:`DnsZone`. It offers the same methods
+    as coroutines and is built on ``dns.asyncquery`` and
+    ``dns.asyncresolver``, so one event loop can keep many nameserver
+    operations in flight."""
+
+    _pools: dict[Nameserver, AsyncConnectionPool]
+
+    _resolvers: dict[Nameserver, dns.asyncresolver.Resolver]
+
+    _verifications: "set[asyncio.Future[None]]"
+    """The running background verifications. The references keep the tasks
+    from being garbage collected."""
+
+    def __init__(
+        self,
+        nameserver: str | Sequence[str],
+        port: int,
+        zone: "Zone",
+        conditional_updates: bool = False,
+        cache: RecordCache | None = None,
+        shadow: ZoneShadow | None = None,
+        policy: QueryPolicy | None = None,
+        verifier: Verifier | None = None,
+        metrics: DnsMetrics | None = None,
+    ) -> None:
+        super().__init__(
+            nameserver,
+            port,
+            zone,
+            conditional_updates=conditional_updates,
+            cache=cache,
+            shadow=shadow,
+            policy=policy,
+            verifier=verifier,
+            metrics=metrics,
+        )
+        self._verifications = set()
+        self._pools = {}
+        self._resolvers = {}
+        for server in self._nameservers.nameservers:
+            self._pools[server] = get_async_pool(server.address, server.port)
+            resolver = dns.asyncresolver.Resolver(configure=False)
+            resolver.nameservers = [server.address]
+            resolver.port = server.port
+            resolver.timeout = self._policy.read_timeout
+            resolver.lifetime = self._policy.read_timeout
+            self._resolvers[server] = resolver
+
+    async def _query(self, message: dns.message.Message) -> dns.message.Message:
+        """:see: :meth:`DnsZone._query`"""
+        with self._measure_message(message):
+            return await self._send(message)
+
+    async def _send(self, message: dns.message.Message) -> dns.message.Message:
+        failure: tuple[Nameserver, Exception] | None = None
+        for attempt, delay in enumerate(self._policy.delays()):
+            if attempt > 0:
+                assert failure is not None
+                if isinstance(failure[1], dns.tsig.PeerBadKey):
+                    break
+                self._count("retries")
+                await asyncio.sleep(delay)
+            for server in self._nameservers.ordered():
+                start = time.monotonic()
+                try:
+                    response = await self._pools[server].query(
+                        message,
+                        timeout=self._policy.update_timeout,
+                        metrics=self._metrics,
+                    )
+                except UPDATE_ERRORS as e:
+                    server.record_failure()
+                    self._count_error(e)
+                    failure = (server, e)
+                    continue
+                server.record_success(time.monotonic() - start)
+                return response
+        assert failure is not None
+        raise self._translate_error(*failure) from failure[1]
+
+    async def _commit(
+        self, message: dns.update.UpdateMessage, *accepted: dns.rcode.Rcode
+    ) -> dns.rcode.Rcode:
+        return self._check_rcode(await self._query(message), *accepted)
+
+    async def update_records(
+        self, name: str, records: dict[RecordType, str | None], ttl: int = 300
+    ) -> list[DnsChangeMessage]:
+        """:see: :meth:`DnsZone.update_records`"""
+        fqdn = self._normalize_name(name)
+        return (await self._update_batch({fqdn: (records, ttl)}))[fqdn]
+
+    async def update_many(self, batch: Batch) -> dict[str, list[DnsChangeMessage]]:
+        """:see: :meth:`DnsZone.update_many`"""
+        fqdns = {name: self._normalize_name(name) for name in batch}
+        results = await self._update_batch(
+            {fqdns[name]: records for name, records in batch.items()}
+        )
+        return {name: results[fqdn] for name, fqdn in fqdns.items()}
+
+    async def _update_batch(self, batch: Batch) -> dict[str, list[DnsChangeMessage]]:
+        if self._conditional_updates:
+            return await self._update_batch_conditionally(batch)
+        old: dict[str, dict[RecordType, str | None]] = {}
+        for fqdn, (records, _) in batch.items():
+            old[fqdn] = {}
+            for record_type in records:
+                old[fqdn][record_type] = await self.read_record(fqdn, record_type)
+        message, results = self._build_batch(batch, old)
+        if message.update:
+            await self._commit(message)
+        return await self._verified(self._remember_batch(batch, results))
+
+    async def _verify(self, targets: VerificationTargets) -> VerificationTargets:
+        """:see: :meth:`DnsZone._verify`
+
+        In the ``async`` mode the records are read back by tasks of the
+        running event loop."""
+        if self._verifier.mode == "async":
+            for key, expected in targets.items():
+                if not self._verifier.sample():
+                    continue
+                if len(self._verifications) >= self._verifier.max_pending:
+                    self._verifier.count_dropped()
+                    continue
+                task = asyncio.ensure_future(self._verify_later(*key, expected))
+                self._verifications.add(task)
+                task.add_done_callback(self._verifications.discard)
+        if self._verifier.mode != "sync":
+            return {}
+        actual: VerificationTargets = {}
+        for key, expected in targets.items():
+            actual[key] = await self.read_record(*key, use_cache=False)
+            self._verifier.compare(*key, expected, actual[key])
+        return actual
+
+    async def _verify_later(
+        self, fqdn: str, record_type: RecordType, expected: str | None
+    ) -> None:
+        await asyncio.sleep(self._verifier.delay)
+        try:
+            actual = await self.read_record(fqdn, record_type, use_cache=False)
+        except Exception as e:
+            self._verifier.count_error()
+            logger.log(
+                LogLevel.WARNING,
+                f"The verification of '{fqdn}' {record_type} failed: {e}",
+            )
+            return
+        self._verifier.compare(fqdn, record_type, expected, actual)
+
+    async def _verified(
+        self, results: dict[str, list[DnsChangeMessage]]
+    ) -> dict[str, list[DnsChangeMessage]]:
+        return self._apply_verification(
+            results, await self._verify(self._targets_from_results(results))
+        )
+
+    async def apply_changes(
+        self, changes: Sequence[DnsChange]
+    ) -> list[DnsChangeMessage]:
+        """:see: :meth:`DnsZone.apply_changes`"""
+        normalized = self._normalize_changes(changes)
+        keys = list(
+            dict.fromkeys((change.name, change.record_type) for change in normalized)
+        )
+        semaphore = asyncio.Semaphore(self.BULK_READ_CONCURRENCY)
+
+        async def read(key: tuple[str, RecordType]) -> str | None:
+            async with semaphore:
+                return await self.read_record(*key)
+
+        contents = await asyncio.gather(*(read(key) for key in keys))
+        outgoing, results = self._prepare_changes(
+            normalized, dict(zip(keys, contents))
+        )
+        for message, packed in self._pack_changes(outgoing):
+            await self._commit(message)
+            self._remember_changes(packed)
+        await self._verify(self._targets_from_changes(outgoing))
+        return results
+
+    async def _read_rdatas(
+        self, fqdn: str, record_type: RecordType
+    ) -> list[dns.rdata.Rdata]:
+        try:
+            rrset = await self.read_resource_record_set(fqdn, record_type)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            return []
+        if rrset is None:
+            return []
+        return list(rrset)
+
+    async def _update_batch_conditionally(
+        self, batch: Batch
+    ) -> dict[str, list[DnsChangeMessage]]:
+        prepared = self._prepare_conditional_batch(batch)
+        for _ in range(self.CONDITIONAL_UPDATE_ATTEMPTS):
+            message = self._build_conditional_batch(batch, prepared)
+            rcode = await self._commit(message, dns.rcode.NXRRSET, dns.rcode.YXRRSET)
+            if rcode == dns.rcode.NOERROR:
+                return await self._verified(
+                    self._conditional_batch_results(batch, prepared)
+                )
+            for fqdn, (rdatas, expected) in prepared.items():
+                for record_type in rdatas:
+                    expected[record_type] = await self._read_rdatas(fqdn, record_type)
+        raise self._concurrently_modified(*batch)
+
+    async def add_record(
+        self, name: str, record_type: RecordType, content: str, ttl: int = 300
+    ) -> DnsChangeMessage:
+        """:see: :meth:`DnsZone.add_record`"""
+        return (await self.update_records(name, {record_type: content}, ttl=ttl))[0]
+
+    async def read_resource_record_set(
+        self, name: str, record_type: RecordType
+    ) -> dns.rrset.RRset | None:
+        """:see: :meth:`DnsZone.read_resource_record_set`"""
+        fqdn = self._normalize_name(name)
+        with self._measure("read"):
+            if self._policy.hedge_reads:
+                return (await self._resolve_hedged(fqdn, record_type)).rrset
+            return (await self._resolve(fqdn, record_type)).rrset
+
+    async def _resolve(
+        self, fqdn: str, record_type: RecordType, skip: int = 0
+    ) -> dns.resolver.Answer:
+        error: Exception | None = None
+        for attempt, delay in enumerate(self._policy.delays()):
+            if attempt > 0:
+                self._count("retries")
+                await asyncio.sleep(delay)
+            for server in self._rotated(skip):
+                start = time.monotonic()
+                try:
+                    answer = await self._resolvers[server].resolve(fqdn, record_type)
+                except AUTHORITATIVE_ERRORS:
+                    server.record_success(time.monotonic() - start, read=True)
+                    raise
+                except READ_ERRORS as e:
+                    server.record_failure()
+                    self._count_error(e)
+                    error = e
+                    continue
+                server.record_success(time.monotonic() - start, read=True)
+                return answer
+        assert error is not None
+        raise error
+
+    async def _resolve_hedged(
+        self, fqdn: str, record_type: RecordType
+    ) -> dns.resolver.Answer:
+        first = asyncio.ensure_future(self._resolve(fqdn, record_type))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_delay())
+        if done:
+            return first.result()
+        self._count("hedged")
+        second = asyncio.ensure_future(self._resolve(fqdn, record_type, 1))
+        pending = {first, second}
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = next((task for task in done if _answered(task)), None)
+                if winner is not None:
+                    if winner is second:
+                        self._count("hedge_wins")
+                    return winner.result()
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def read_record(
+        self, name: str, record_type: RecordType, use_cache: bool = True
+    ) -> str | None:
+        """:see: :meth:`DnsZone.read_record`"""
+        fqdn = self._normalize_name(name)
+        if use_cache:
+            hit, content = self._lookup(fqdn, record_type)
+            if hit:
+                return content
+        content = None
+        ttl: int | None = None
+        try:
+            content, ttl = self._content_from_rrset(
+                record_type, await self.read_resource_record_set(fqdn, record_type)
             )
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            pass
+        if self._cache is not None:
+            self._cache.set(fqdn, record_type, content, ttl)
+        return content
+
+    async def read_a_record(self, name: str) -> str | None:
+        """:see: :meth:`DnsZone.read_a_record`"""
+        return await self.read_record(name, "A")
+
+    async def read_aaaa_record(self, name: str) -> str | None:
+        """:see: :meth:`DnsZone.read_aaaa_record`"""
+        return await self.read_record(name, "AAAA")
+
+    async def is_a_record(self, name: str) -> bool:
+        """:see: :meth:`DnsZone.is_a_record`"""
+        return await self.read_a_record(name) is not None
+
+    async def is_aaaa_record(self, name: str) -> bool:
+        """:see: :meth:`DnsZone.is_aaaa_record`"""
+        return await self.read_aaaa_record(name) is not None
+
+    async def _delete_record(
+        self, name: str, record_type: RecordType = "A"
+    ) -> dns.message.Message:
+        return await self._query(self._build_delete(name, record_type))
+
+    async def delete_record(
+        self, name: str, record_type: RecordType = "A"
+    ) -> DnsChangeMessage:
+        """:see: :meth:`DnsZone.delete_record`"""
+        return (await self.update_records(name, {record_type: None}))[0]
+
+    async def delete_records(self, name: str) -> list[DnsChangeMessage]:
+        """:see: :meth:`DnsZone.delete_records`"""
+        return await self.update_records(name, {"A": None, "AAAA": None})
+
+    async def check(self, mode: CheckMode = "full") -> str:
+        """:see: :meth:`DnsZone.check`"""
+        with self._measure("check"):
+            return await self._check(mode)
+
+    async def _check(self, mode: CheckMode) -> str:
+        if mode == "light":
+            try:
+                response = await self._query(self._build_check_query())
+            except dns.exception.DNSException as e:
+                raise self._unverified_check(e) from e
+            return self._evaluate_light_check(response)
+        random_content: str = self._random_check_content()
+        await self._delete_record(self.CHECK_RECORD_NAME, "TXT")
+        await self.add_record(self.CHECK_RECORD_NAME, "TXT", random_content)
+        result: str | None = await self.read_record(
+            self.CHECK_RECORD_NAME, "TXT", use_cache=False
+        )
+        await self._delete_record(self.CHECK_RECORD_NAME, "TXT")
+        return self._evaluate_check(result, random_content)
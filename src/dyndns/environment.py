@@ -1,65 +1,553 @@
 """Main class that assembles all classes together with the loaded configuration."""
 
+import asyncio
+import functools
+import ipaddress
 import pprint
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Generator
+from typing import TYPE_CHECKING, Any, Generator, Generic, TypeVar
 
 import flask
 
-from dyndns.config import load_config
-from dyndns.dns import DnsChangeMessage, DnsZone
+from dyndns.batch import BatchEntry, BatchResult
+from dyndns.cache import AddressCache, Addresses, CacheStats, RecordCache
+from dyndns.checker import AsyncBackgroundChecker, BackgroundChecker, CheckResult
+from dyndns.config import CheckMode, RecordType, list_nameservers, load_config
+from dyndns.dns import AsyncDnsZone, Batch, DnsChangeMessage, DnsZone
 from dyndns.exceptions import (
+    ConfigurationError,
     DyndnsError,
     ParameterError,
 )
 from dyndns.ipaddresses import IpAddressContainer
+from dyndns.locks import AsyncStripedLock, LockStats, StripedLock
 from dyndns.log import LogLevel, logger
+from dyndns.metrics import DnsMetrics, DnsMetricsStats, RequestMetrics
 from dyndns.names import FullyQualifiedDomainName
-from dyndns.zones import ZonesCollection
+from dyndns.notify import NotifyListener
+from dyndns.policy import QueryPolicy
+from dyndns.pool import get_async_pool, get_pool
+from dyndns.prometheus import (
+    MetricsDirectory,
+    Samples,
+    add_samples,
+    dns_samples,
+    format_prometheus,
+    request_samples,
+)
+from dyndns.ratelimit import RateLimiter
+from dyndns.shadow import ZoneShadow
+from dyndns.singleflight import AsyncSingleFlight, SingleFlight, SingleFlightStats
+from dyndns.verify import Verifier
+from dyndns.writebehind import UpdateQueue
+from dyndns.zones import Zone, ZonesCollection
 
 if TYPE_CHECKING:
     from dyndns.config import Config
 
 
-class ConfiguredEnvironment:
+DnsZoneT = TypeVar("DnsZoneT", DnsZone, AsyncDnsZone)
+
+BatchPlan = dict[str, tuple[Batch, dict[str, tuple[int, str]]]]
+"""The entries of a batch update by zone name: the batch of the zone and
+the index of the entry and the fully qualified domain name by record
+name."""
+
+
+def _normalize_address(address: str | None) -> str | None:
+    """The address cache compares the addresses of a request with the
+    contents of the update messages, which spell some IPv6 addresses
+    differently (``::ffff:102:304`` and ``::ffff:1.2.3.4``)."""
+    if address is None:
+        return None
+    return str(ipaddress.ip_address(address))
+
+
+class BaseEnvironment(ABC, Generic[DnsZoneT]):
+    """The configuration, the zones and the message formatting shared by
+    :class:`ConfiguredEnvironment` and :class:`AsyncConfiguredEnvironment`."""
+
     config: "Config"
 
     zones: ZonesCollection
 
-    _dns_zones: dict[str, DnsZone]
+    _dns_zones: dict[str, DnsZoneT]
+
+    _updates: "SingleFlight[str] | AsyncSingleFlight[str]"
+    """Coalesces identical updates in flight at the same time."""
+
+    _locks: StripedLock | AsyncStripedLock
+    """Serializes the updates and deletions of the same name."""
+
+    _address_caches: dict[str, AddressCache]
+    """The addresses of the last update of each name by zone name. Empty if
+    the cache is disabled."""
+
+    notify_listener: NotifyListener | None
+    """Receives the NOTIFY messages of the nameservers. ``None`` if
+    disabled."""
+
+    rate_limiter: RateLimiter | None
+    """``None`` if the rate limit is disabled."""
+
+    request_metrics: RequestMetrics | None
+    """Counts the requests of the web app. ``None`` if the metrics are
+    disabled."""
+
+    metrics_directory: MetricsDirectory | None
+    """Shares the metrics with the other worker processes. ``None`` if no
+    directory is configured."""
+
+    checker: BackgroundChecker | AsyncBackgroundChecker | None
+    """Checks the zones in the background. ``None`` if no ``check.interval``
+    is configured."""
 
     def __init__(self, config_file: str | Path | None = None) -> None:
         self.config = load_config(config_file)
+        self._check_config()
         logger.set_level(self.config.log_level)
         self.zones = ZonesCollection(self.config.zones)
         self._dns_zones = {}
+        self._address_caches = {}
+        for zone in self.zones:
+            self._dns_zones[zone.name] = self._create_dns_zone(
+                zone, self._create_cache(), self._create_shadow(zone)
+            )
+            if self.config.address_cache.size > 0:
+                self._address_caches[zone.name] = AddressCache(
+                    self.config.address_cache.size, self.config.address_cache.max_age
+                )
+        self.notify_listener = self._create_notify_listener()
+        self.rate_limiter = None
+        if self.config.rate_limit.enabled:
+            self.rate_limiter = RateLimiter(self.config.rate_limit)
+        self.request_metrics = None
+        self.metrics_directory = None
+        if self.config.metrics.enabled:
+            self.request_metrics = RequestMetrics()
+            if self.config.metrics.directory is not None:
+                self.metrics_directory = MetricsDirectory(
+                    self.config.metrics.directory,
+                    self.metric_samples,
+                    self.config.metrics.flush_interval,
+                ).start()
+
+    def _create_cache(self) -> RecordCache | None:
+        if self.config.record_cache.size > 0:
+            return RecordCache(
+                self.config.record_cache.size, self.config.record_cache.max_ttl
+            )
+        return None
+
+    def _get_nameservers(self, zone: Zone) -> list[str]:
+        """:return: The IP addresses of the nameservers of a zone."""
+        if zone.nameservers is not None:
+            return zone.nameservers
+        return list_nameservers(self.config.nameserver)
+
+    def _create_shadow(self, zone: Zone) -> ZoneShadow | None:
+        if not self.config.zone_shadow.enabled:
+            return None
+        # The zone is transferred from the first (primary) nameserver.
+        shadow = ZoneShadow(
+            zone.name,
+            self._get_nameservers(zone)[0],
+            self.config.port,
+            zone.keyring,
+            zone.key.algorithm,
+        )
+        shadow.start(self.config.zone_shadow.refresh_interval)
+        return shadow
+
+    def _check_config(self) -> None:
+        """:raises ConfigurationError: If the configuration enables a
+        feature the environment doesn’t support."""
+
+    @abstractmethod
+    def _create_dns_zone(
+        self, zone: Zone, cache: RecordCache | None, shadow: ZoneShadow | None
+    ) -> DnsZoneT:
+        """:return: The synchronous or asynchronous client of the zone."""
+
+    def _create_notify_listener(self) -> NotifyListener | None:
+        if not self.config.notify.enabled:
+            return None
+        listener = NotifyListener(self.config.notify.address, self.config.notify.port)
         for zone in self.zones:
-            self._dns_zones[zone.name] = DnsZone(
-                str(self.config.nameserver), self.config.port, zone
+            listener.register(
+                zone.name,
+                self._get_nameservers(zone),
+                functools.partial(self.invalidate, zone.name),
+                zone.key,
             )
+        return listener.start()
+
+    def invalidate(self, zone_name: str, serial: int | None = None) -> None:
+        """Drop everything cached about a zone after it was changed, for
+        example by a NOTIFY of the nameserver.
+
+        The nameserver also sends a NOTIFY after each update of dyndns. With
+        ``zone_shadow`` enabled only the names whose addresses differ from
+        the refreshed copy of the zone are dropped from the address cache.
+        Without a copy of the zone all names are dropped.
+
+        :see: :meth:`dyndns.dns.DnsZone.invalidate`"""
+        zone_name = self.zones.get_zone(zone_name).name
+        dns = self._dns_zones[zone_name]
+        dns.invalidate(serial)
+        address_cache = self._address_caches.get(zone_name)
+        if address_cache is not None:
+
+            def keep(fqdn: str, addresses: Addresses) -> bool:
+                shadowed = dns.shadowed_addresses(fqdn)
+                return shadowed is not None and addresses[:2] == (
+                    _normalize_address(shadowed[0]),
+                    _normalize_address(shadowed[1]),
+                )
+
+            address_cache.retain(keep)
+
+    def limit_rate(
+        self,
+        client: str | None = None,
+        fqdn: str | None = None,
+        secret: str | None = None,
+    ) -> None:
+        """Count a request against the rate limit of its client address,
+        domain name and secret. The routes limit the client address before
+        the authentication and the domain name and the secret after it, so
+        requests with a wrong secret can’t drain the buckets of a name.
+
+        :raises RateLimitError: If the request exceeds one of the limits."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.check(client, fqdn, secret)
+
+    def address_cache_stats(self) -> dict[str, CacheStats]:
+        """:return: The counters of the address cache by zone name."""
+        return {
+            zone_name: address_cache.stats
+            for zone_name, address_cache in self._address_caches.items()
+        }
+
+    def _unchanged_update(
+        self, name: FullyQualifiedDomainName, ip: IpAddressContainer, ttl: int
+    ) -> str | None:
+        """:return: The log message of an update that repeats the addresses
+        of the previous update of the name or ``None`` if the nameserver
+        has to be asked."""
+        address_cache = self._address_caches.get(name.zone_name)
+        if address_cache is None:
+            return None
+        addresses = (_normalize_address(ip.ipv4), _normalize_address(ip.ipv6), ttl)
+        if address_cache.get(name.fqdn) != addresses:
+            return None
+        return self._log_update(
+            [
+                DnsChangeMessage(name.fqdn, ip.ipv4, ip.ipv4, "A"),
+                DnsChangeMessage(name.fqdn, ip.ipv6, ip.ipv6, "AAAA"),
+            ]
+        )
+
+    def _remember_addresses(
+        self, fqdn: str, zone_name: str, results: list[DnsChangeMessage], ttl: int
+    ) -> None:
+        address_cache = self._address_caches.get(zone_name)
+        if address_cache is None:
+            return
+        new = {result.record_type: result.new for result in results}
+        address_cache.set(
+            fqdn,
+            (
+                _normalize_address(new.get("A")),
+                _normalize_address(new.get("AAAA")),
+                ttl,
+            ),
+        )
+
+    @staticmethod
+    def _update_key(
+        name: FullyQualifiedDomainName, ip: IpAddressContainer, ttl: int
+    ) -> tuple[str, str | None, str | None, int]:
+        """Identical updates in flight at the same time are sent once."""
+        return (name.fqdn.lower(), ip.ipv4, ip.ipv6, ttl)
+
+    @property
+    def lock_stats(self) -> LockStats:
+        """How often an update had to wait for another update of a name on
+        the same lock stripe."""
+        return self._locks.stats
+
+    @property
+    def single_flight_stats(self) -> SingleFlightStats:
+        """How many updates were coalesced with an identical update in
+        flight."""
+        return self._updates.stats
+
+    def _forget_addresses(self, fqdn: str, zone_name: str) -> None:
+        address_cache = self._address_caches.get(zone_name)
+        if address_cache is not None:
+            address_cache.invalidate(fqdn)
+
+    def _create_policy(self) -> QueryPolicy:
+        return QueryPolicy(**self.config.queries.model_dump())
 
-    def get_dns_for_zone(self, name: str) -> DnsZone:
+    def _create_verifier(self) -> Verifier:
+        return Verifier(**self.config.verification.model_dump())
+
+    def _create_metrics(self, zone: Zone) -> DnsMetrics | None:
+        if not self.config.metrics.enabled:
+            return None
+        return DnsMetrics(zone.name)
+
+    def metrics(self) -> list[DnsMetricsStats]:
+        """:return: A snapshot of the metrics of each zone with enabled
+            metrics."""
+        return [
+            stats
+            for stats in (dns_zone.metrics for dns_zone in self.dns_zones)
+            if stats is not None
+        ]
+
+    def observe_request(self, route: str, status_code: int, seconds: float) -> None:
+        """Count a request of the web app.
+
+        :param route: The name of the view function."""
+        if self.request_metrics is None:
+            return
+        self.request_metrics.observe_request(route, status_code, seconds)
+        if self.metrics_directory is not None:
+            # Restarts the writing thread in a forked worker process.
+            self.metrics_directory.start()
+
+    def count_error(self, error: BaseException) -> None:
+        if self.request_metrics is not None:
+            self.request_metrics.count_error(error)
+
+    def metric_samples(self) -> Samples:
+        """:return: The metrics of this process as Prometheus samples."""
+        samples = dns_samples(self.metrics())
+        if self.request_metrics is not None:
+            add_samples(samples, request_samples(self.request_metrics.stats))
+        return samples
+
+    def prometheus_metrics(self) -> str:
+        """:return: The metrics in the Prometheus text format, added up over
+        all worker processes if a metrics directory is configured."""
+        samples = self.metric_samples()
+        if self.metrics_directory is not None:
+            samples = self.metrics_directory.aggregate(samples)
+        return format_prometheus(samples)
+
+    def cached_check(self, mode: CheckMode | None = None) -> CheckResult | None:
+        """:param mode: A check mode other than the configured mode is never
+            answered from the background check.
+
+        :return: The last result of the background check or ``None`` if the
+            zones have to be checked now."""
+        if self.checker is None:
+            return None
+        if mode is not None and mode != self.config.check.mode:
+            return None
+        # Restarts the thread in a forked worker process or the task in the
+        # event loop of the server.
+        self.checker.start()
+        return self.checker.result
+
+    def _check_mode(self, mode: CheckMode | None) -> CheckMode:
+        if mode is None:
+            return self.config.check.mode
+        return mode
+
+    def get_dns_for_zone(self, name: str) -> DnsZoneT:
         """:param name: A zone name or a fully qualifed domain name."""
         return self._dns_zones[self.zones.get_zone(name).name]
 
     @property
-    def dns_zones(self) -> Generator[DnsZone, Any, Any]:
+    def dns_zones(self) -> Generator[DnsZoneT, Any, Any]:
         for dns_zone in self._dns_zones.values():
             yield dns_zone
 
     def print_config(self) -> None:
         pprint.pprint(self.config, indent=2)
 
-    def check(self) -> str:
-        outputs: list[str] = []
-        for dns_zone in self.dns_zones:
-            outputs.append(dns_zone.check())
-        return "\n".join(outputs)
-
     def authenticate(self, secret: Any) -> None:
         if str(secret) != str(self.config.secret):
             raise ParameterError("You specified a wrong secret key.")
 
+    @staticmethod
+    def _address_records(ip: IpAddressContainer) -> dict[RecordType, str | None]:
+        if not ip:
+            raise DyndnsError("No ip addresses set.")
+        return {"A": ip.ipv4, "AAAA": ip.ipv6}
+
+    def _log_update(self, results: list[DnsChangeMessage]) -> str:
+        messages: list[str] = []
+        for result in results:
+            messages.append(logger.log_change(result))
+        if self.request_metrics is not None:
+            self.request_metrics.count_update(
+                "updated"
+                if any(result.old != result.new for result in results)
+                else "unchanged"
+            )
+        return "".join(messages)
+
+    def _plan_batch(
+        self,
+        entries: Sequence[BatchEntry | ParameterError],
+        remote_addr: str | None,
+    ) -> tuple[list[BatchResult | None], BatchPlan]:
+        """Group the entries of a batch update by zone.
+
+        :return: The results of the invalid entries (``None`` for the valid
+            entries) and the valid entries by zone."""
+        if len(entries) > self.config.batch.max_entries:
+            raise ParameterError(
+                f"The batch contains more than {self.config.batch.max_entries} "
+                "entries."
+            )
+        results: list[BatchResult | None] = [None] * len(entries)
+        plan: BatchPlan = {}
+        for index, entry in enumerate(entries):
+            if isinstance(entry, ParameterError):
+                results[index] = BatchResult.from_error(None, entry)
+                continue
+            try:
+                name = FullyQualifiedDomainName(self.zones, fqdn=entry.fqdn)
+                ip = IpAddressContainer(
+                    ipv4=entry.ipv4, ipv6=entry.ipv6, remote_addr=remote_addr
+                )
+                batch, names = plan.setdefault(name.zone_name, ({}, {}))
+                if name.record_name in batch:
+                    raise ParameterError(
+                        f"The domain name '{name.fqdn}' is listed more than once."
+                    )
+                self.limit_rate(fqdn=name.fqdn)
+            except DyndnsError as e:
+                results[index] = BatchResult.from_error(entry.fqdn, e)
+                continue
+            unchanged = self._unchanged_update(name, ip, entry.ttl)
+            if unchanged is not None:
+                results[index] = BatchResult(name.fqdn, 200, unchanged)
+                continue
+            self._forget_addresses(name.fqdn, name.zone_name)
+            batch[name.record_name] = (self._address_records(ip), entry.ttl)
+            names[name.record_name] = (index, name.fqdn)
+        return results, plan
+
+    def _record_batch_results(
+        self,
+        results: list[BatchResult | None],
+        zone_name: str,
+        batch: Batch,
+        names: dict[str, tuple[int, str]],
+        changes: dict[str, list[DnsChangeMessage]] | DyndnsError,
+    ) -> None:
+        """Fill in the results of the entries of one zone."""
+        for record_name, (index, fqdn) in names.items():
+            if isinstance(changes, DyndnsError):
+                results[index] = BatchResult.from_error(fqdn, changes)
+            else:
+                self._remember_addresses(
+                    fqdn, zone_name, changes[record_name], batch[record_name][1]
+                )
+                results[index] = BatchResult(
+                    fqdn, 200, self._log_update(changes[record_name])
+                )
+
+    @staticmethod
+    def _completed(results: list[BatchResult | None]) -> list[BatchResult]:
+        completed: list[BatchResult] = []
+        for result in results:
+            assert result is not None
+            completed.append(result)
+        return completed
+
+    @staticmethod
+    def _log_deletion(
+        name: FullyQualifiedDomainName, results: list[DnsChangeMessage]
+    ) -> str:
+        if any(result.changed for result in results):
+            return LogLevel.UPDATED.log(
+                f"The A and AAAA records of the domain name '{name.fqdn}' were deleted."
+            )
+        return LogLevel.UNCHANGED.log(
+            f"The deletion of the domain name '{name.fqdn}' was not executed because there were no A or AAAA records."
+        )
+
+
+class ConfiguredEnvironment(BaseEnvironment[DnsZone]):
+    _updates: SingleFlight[str]
+
+    _queued_writes: dict[str, object]
+    """The last update of each name waiting in a write-behind queue. Only
+    this update remembers its addresses."""
+
+    def __init__(self, config_file: str | Path | None = None) -> None:
+        super().__init__(config_file)
+        self._updates = SingleFlight()
+        self._locks = StripedLock(self.config.lock_stripes)
+        self._queued_writes = {}
+        self.checker = None
+        if self.config.check.interval is not None:
+            # Started by the web app, see cached_check().
+            self.checker = BackgroundChecker(self.check, self.config.check.interval)
+
+    def _create_dns_zone(
+        self, zone: Zone, cache: RecordCache | None, shadow: ZoneShadow | None
+    ) -> DnsZone:
+        nameservers = self._get_nameservers(zone)
+        for nameserver in nameservers:
+            get_pool(
+                nameserver,
+                self.config.port,
+                size=self.config.connection_pool.size,
+                idle_timeout=self.config.connection_pool.idle_timeout,
+                keepalive=self.config.connection_pool.keepalive,
+            )
+        return DnsZone(
+            nameservers,
+            self.config.port,
+            zone,
+            conditional_updates=self.config.conditional_updates,
+            cache=cache,
+            shadow=shadow,
+            policy=self._create_policy(),
+            queue=self._create_queue(),
+            verifier=self._create_verifier(),
+            metrics=self._create_metrics(zone),
+        )
+
+    def _create_queue(self) -> UpdateQueue | None:
+        if not self.config.write_behind.enabled:
+            return None
+        return UpdateQueue(
+            self.config.write_behind.window, self.config.write_behind.max_changes
+        )
+
+    def check(self, mode: CheckMode | None = None) -> str:
+        """Check all zones in parallel. At most ``check.concurrency`` zones
+        are checked at the same time.
+
+        :param mode: ``light`` or ``full``. If not specified, the configured
+            mode is used.
+
+        :return: The log messages in the order of the zones.
+        """
+        check_mode = self._check_mode(mode)
+        dns_zones = list(self.dns_zones)
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(self.config.check.concurrency, len(dns_zones))),
+            thread_name_prefix="dyndns-check",
+        ) as executor:
+            outputs = list(
+                executor.map(lambda dns_zone: dns_zone.check(check_mode), dns_zones)
+            )
+        return "\n".join(outputs)
+
     def update_dns_record(
         self,
         fqdn: str | None = None,
@@ -106,25 +594,92 @@ class ConfiguredEnvironment:
             request=flask.request,
         )
 
+        unchanged = self._unchanged_update(name, ip, ttl)
+        if unchanged is not None:
+            return unchanged
+
+        return self._updates.do(
+            self._update_key(name, ip, ttl), lambda: self._update(name, ip, ttl)
+        )
+
+    def _update(
+        self, name: FullyQualifiedDomainName, ip: IpAddressContainer, ttl: int
+    ) -> str:
         dns: DnsZone = self.get_dns_for_zone(name.zone_name)
+        if dns.write_behind:
+            return self._update_behind(dns, name, ip, ttl)
 
-        results: list[DnsChangeMessage] = []
-        if not ip:
-            raise DyndnsError("No ip addresses set.")
-        if ip.ipv4:
-            results.append(dns.add_record(name.record_name, "A", ip.ipv4, ttl=ttl))
-        else:
-            results.append(dns.delete_record(name.record_name, "A"))
-        if ip.ipv6:
-            results.append(dns.add_record(name.record_name, "AAAA", ip.ipv6, ttl=ttl))
-        else:
-            results.append(dns.delete_record(name.record_name, "AAAA"))
+        assert isinstance(self._locks, StripedLock)
+        with self._locks.hold(name.fqdn):
+            self._forget_addresses(name.fqdn, name.zone_name)
+            results: list[DnsChangeMessage] = dns.update_records(
+                name.record_name, self._address_records(ip), ttl=ttl
+            )
+            self._remember_addresses(name.fqdn, name.zone_name, results, ttl)
+        return self._log_update(results)
 
-        messages: list[str] = []
-        for result in results:
-            messages.append(logger.log_change(result))
+    def _update_behind(
+        self,
+        dns: DnsZone,
+        name: FullyQualifiedDomainName,
+        ip: IpAddressContainer,
+        ttl: int,
+    ) -> str:
+        """Update a name through the write-behind queue of its zone.
 
-        return "".join(messages)
+        The lock of the name is held only while the update is queued, not
+        during the window of the queue. Otherwise the other names on the same
+        lock stripe couldn’t join the batch. The queue keeps the order of
+        the updates of a name."""
+        assert isinstance(self._locks, StripedLock)
+        with self._locks.hold(name.fqdn):
+            self._forget_addresses(name.fqdn, name.zone_name)
+            queued = dns.queue_records(
+                name.record_name, self._address_records(ip), ttl=ttl
+            )
+            write = self._queued_writes[name.fqdn] = object()
+        results: list[DnsChangeMessage] | None = None
+        try:
+            results = queued.result()
+        finally:
+            with self._locks.hold(name.fqdn):
+                # A later update of the name may have been queued meanwhile.
+                if self._queued_writes.get(name.fqdn) is write:
+                    del self._queued_writes[name.fqdn]
+                    if results is not None:
+                        self._remember_addresses(
+                            name.fqdn, name.zone_name, results, ttl
+                        )
+        return self._log_update(results)
+
+    def update_dns_records(
+        self,
+        entries: Sequence[BatchEntry | ParameterError],
+        remote_addr: str | None = None,
+    ) -> list[BatchResult]:
+        """
+        Update the address records of many names. The names of a zone are
+        updated in a single atomic update message. If it fails, all
+        entries of the zone fail.
+
+        :param entries: The entries parsed by
+            :func:`dyndns.batch.parse_batch`.
+        :param remote_addr: The address of the client. It is used for the
+            entries without an IP address.
+
+        :return: One result per entry in the order of ``entries``.
+        """
+        results, plan = self._plan_batch(entries, remote_addr)
+        for zone_name, (batch, names) in plan.items():
+            changes: dict[str, list[DnsChangeMessage]] | DyndnsError
+            assert isinstance(self._locks, StripedLock)
+            with self._locks.hold(*(fqdn for _, fqdn in names.values())):
+                try:
+                    changes = self.get_dns_for_zone(zone_name).update_many(batch)
+                except DyndnsError as e:
+                    changes = e
+                self._record_batch_results(results, zone_name, batch, names, changes)
+        return self._completed(results)
 
     def delete_dns_record(self, fqdn: str) -> str:
         """
@@ -132,17 +687,177 @@ class ConfiguredEnvironment:
         """
         name = FullyQualifiedDomainName(self.zones, fqdn=fqdn)
         dns: DnsZone = self.get_dns_for_zone(name.zone_name)
-        IS_A: bool = dns.is_a_record(name.record_name)
-        IS_AAAA: bool = dns.is_aaaa_record(name.record_name)
-        if IS_A or IS_AAAA:
-            dns.delete_records(name.record_name)
-            return LogLevel.UPDATED.log(
-                f"The A and AAAA records of the domain name '{name.fqdn}' were deleted."
+        assert isinstance(self._locks, StripedLock)
+        with self._locks.hold(name.fqdn):
+            self._forget_addresses(name.fqdn, name.zone_name)
+            results = dns.delete_records(name.record_name)
+        return self._log_deletion(name, results)
+
+
+class AsyncConfiguredEnvironment(BaseEnvironment[AsyncDnsZone]):
+    """The asyncio counterpart of :class:`ConfiguredEnvironment`. The zones
+    talk to the nameserver by :class:`AsyncDnsZone` and the methods that
+    need the nameserver are coroutines. There is no flask request, so the
+    address of the client has to be passed as ``remote_addr``."""
+
+    _updates: AsyncSingleFlight[str]
+
+    def __init__(self, config_file: str | Path | None = None) -> None:
+        super().__init__(config_file)
+        self._updates = AsyncSingleFlight()
+        self._locks = AsyncStripedLock(self.config.lock_stripes)
+        self.checker = None
+        if self.config.check.interval is not None:
+            # Started in the event loop of the web app, see cached_check().
+            self.checker = AsyncBackgroundChecker(
+                self.check, self.config.check.interval
             )
-        return LogLevel.UNCHANGED.log(
-            f"The deletion of the domain name '{name.fqdn}' was not executed because there were no A or AAAA records."
+
+    def _check_config(self) -> None:
+        if self.config.write_behind.enabled:
+            raise ConfigurationError(
+                "The asyncio web app doesn’t support write_behind. "
+                "Disable it or serve the updates by the Flask app."
+            )
+
+    def _create_dns_zone(
+        self, zone: Zone, cache: RecordCache | None, shadow: ZoneShadow | None
+    ) -> AsyncDnsZone:
+        nameservers = self._get_nameservers(zone)
+        for nameserver in nameservers:
+            get_async_pool(
+                nameserver,
+                self.config.port,
+                size=self.config.connection_pool.size,
+                idle_timeout=self.config.connection_pool.idle_timeout,
+                keepalive=self.config.connection_pool.keepalive,
+            )
+        return AsyncDnsZone(
+            nameservers,
+            self.config.port,
+            zone,
+            conditional_updates=self.config.conditional_updates,
+            cache=cache,
+            shadow=shadow,
+            policy=self._create_policy(),
+            verifier=self._create_verifier(),
+            metrics=self._create_metrics(zone),
         )
 
+    async def check(self, mode: CheckMode | None = None) -> str:
+        """:see: :meth:`ConfiguredEnvironment.check`"""
+        check_mode = self._check_mode(mode)
+        semaphore = asyncio.Semaphore(self.config.check.concurrency)
+
+        async def check_zone(dns_zone: AsyncDnsZone) -> str:
+            async with semaphore:
+                return await dns_zone.check(check_mode)
+
+        outputs: list[str] = await asyncio.gather(
+            *(check_zone(dns_zone) for dns_zone in self.dns_zones)
+        )
+        return "\n".join(outputs)
+
+    async def update_dns_record(
+        self,
+        fqdn: str | None = None,
+        zone_name: str | None = None,
+        record_name: str | None = None,
+        ip_1: str | None = None,
+        ip_2: str | None = None,
+        ipv4: str | None = None,
+        ipv6: str | None = None,
+        ttl: int = 300,
+        remote_addr: str | None = None,
+    ) -> str:
+        """
+        :see: :meth:`ConfiguredEnvironment.update_dns_record`
+
+        :param remote_addr: The address of the client. It is used if no IP
+            address is specified.
+        """
+        name = FullyQualifiedDomainName(
+            self.zones,
+            fqdn=fqdn,
+            zone_name=zone_name,
+            record_name=record_name,
+        )
+        ip = IpAddressContainer(
+            ip_1=ip_1,
+            ip_2=ip_2,
+            ipv4=ipv4,
+            ipv6=ipv6,
+            remote_addr=remote_addr,
+        )
+
+        unchanged = self._unchanged_update(name, ip, ttl)
+        if unchanged is not None:
+            return unchanged
+
+        return await self._updates.do(
+            self._update_key(name, ip, ttl), lambda: self._update(name, ip, ttl)
+        )
+
+    async def _update(
+        self, name: FullyQualifiedDomainName, ip: IpAddressContainer, ttl: int
+    ) -> str:
+        dns: AsyncDnsZone = self.get_dns_for_zone(name.zone_name)
+
+        assert isinstance(self._locks, AsyncStripedLock)
+        async with self._locks.hold(name.fqdn):
+            self._forget_addresses(name.fqdn, name.zone_name)
+            results: list[DnsChangeMessage] = await dns.update_records(
+                name.record_name, self._address_records(ip), ttl=ttl
+            )
+            self._remember_addresses(name.fqdn, name.zone_name, results, ttl)
+        return self._log_update(results)
+
+    async def update_dns_records(
+        self,
+        entries: Sequence[BatchEntry | ParameterError],
+        remote_addr: str | None = None,
+    ) -> list[BatchResult]:
+        """:see: :meth:`ConfiguredEnvironment.update_dns_records`
+
+        The zones are updated concurrently."""
+        results, plan = self._plan_batch(entries, remote_addr)
+
+        async def update_zone(
+            zone_name: str, batch: Batch, names: dict[str, tuple[int, str]]
+        ) -> None:
+            changes: dict[str, list[DnsChangeMessage]] | DyndnsError
+            assert isinstance(self._locks, AsyncStripedLock)
+            async with self._locks.hold(*(fqdn for _, fqdn in names.values())):
+                try:
+                    changes = await self.get_dns_for_zone(zone_name).update_many(
+                        batch
+                    )
+                except DyndnsError as e:
+                    changes = e
+                self._record_batch_results(
+                    results, zone_name, batch, names, changes
+                )
+
+        await asyncio.gather(
+            *(
+                update_zone(zone_name, batch, names)
+                for zone_name, (batch, names) in plan.items()
+            )
+        )
+        return self._completed(results)
+
+    async def delete_dns_record(self, fqdn: str) -> str:
+        """
+        :return: A log message.
+        """
+        name = FullyQualifiedDomainName(self.zones, fqdn=fqdn)
+        dns: AsyncDnsZone = self.get_dns_for_zone(name.zone_name)
+        assert isinstance(self._locks, AsyncStripedLock)
+        async with self._locks.hold(name.fqdn):
+            self._forget_addresses(name.fqdn, name.zone_name)
+            results = await dns.delete_records(name.record_name)
+        return self._log_deletion(name, results)
+
 
 _environment: ConfiguredEnvironment | None = None
 
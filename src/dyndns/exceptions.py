@@ -50,6 +50,21 @@ class ParameterError(DyndnsError):
     status_code = 456
 
 
+class RateLimitError(DyndnsError):
+    """A client sent too many requests."""
+
+    log_level = LogLevel.RATE_LIMIT_ERROR
+
+    status_code = 429
+
+    retry_after: float
+    """The seconds until the request would be allowed."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class CheckError(DyndnsError):
     """The check failed."""
 
@@ -21,6 +21,8 @@ class IpAddressContainer:
     :param str ip_2: An IP address of unkown version.
     :param str ipv4: An IPv4 IP address.
     :param str ipv6: An IPv6 IP address.
+    :param str remote_addr: The address of the client. It is used if no IP
+        address is specified and there is no flask request.
     """
 
     ipv4: str | None
@@ -31,6 +33,8 @@ class IpAddressContainer:
 
     request: Request
 
+    remote_addr: str | None
+
     def __init__(
         self,
         ip_1: str | None = None,
@@ -38,9 +42,11 @@ class IpAddressContainer:
         ipv4: str | None = None,
         ipv6: str | None = None,
         request: Request | None = None,
+        remote_addr: str | None = None,
     ) -> None:
         if request:
             self.request = request
+        self.remote_addr = remote_addr
 
         self.ipv4 = None
         if ipv4:
@@ -73,11 +79,12 @@ class IpAddressContainer:
 
     def _get_client_ip(self) -> str | None:
         # request.environ['REMOTE_ADDR']
+        remote_addr: str | None = self.remote_addr
         if hasattr(self, "request"):
-            remote_addr: str | None = self.request.remote_addr
-            if remote_addr:
-                self._set_ip(remote_addr)
-                return remote_addr
+            remote_addr = self.request.remote_addr
+        if remote_addr:
+            self._set_ip(remote_addr)
+            return remote_addr
         return None
 
     def _set_ip(self, address: str) -> None:
@@ -0,0 +1,157 @@
+"""Serialize the updates of the same name.
+
+An update of a name reads the current records, deletes them and adds the
+new records. Two updates of the same name running at the same time can
+interleave and leave a mix of both. A fixed number of locks (stripes) is
+shared by all names: a name always maps to the same stripe, so the updates
+of a name run one after the other, while the updates of names on
+different stripes run in parallel."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+import zlib
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class LockStats:
+    """Counters of a :class:`StripedLock`."""
+
+    acquisitions: int = 0
+
+    contended: int = 0
+    """The number of acquisitions that had to wait for another holder."""
+
+    wait: float = 0.0
+    """The total time spent waiting in seconds."""
+
+    max_wait: float = 0.0
+    """The longest wait in seconds."""
+
+
+class _BaseStripedLock:
+    stripes: int
+
+    _stats: LockStats
+
+    _stats_lock: threading.Lock
+
+    def __init__(self, stripes: int = 64) -> None:
+        self.stripes = stripes
+        self._stats = LockStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self) -> LockStats:
+        """A snapshot of the counters."""
+        with self._stats_lock:
+            return LockStats(
+                self._stats.acquisitions,
+                self._stats.contended,
+                self._stats.wait,
+                self._stats.max_wait,
+            )
+
+    def _indexes(self, keys: tuple[str, ...]) -> list[int]:
+        """The stripes of the keys in ascending order, so two holders of
+        several stripes can not deadlock."""
+        return sorted(
+            {zlib.crc32(key.lower().encode()) % self.stripes for key in keys}
+        )
+
+    def _count(self, wait: float | None) -> None:
+        """:param wait: The seconds waited or ``None`` if the stripe was
+        free."""
+        with self._stats_lock:
+            self._stats.acquisitions += 1
+            if wait is not None:
+                self._stats.contended += 1
+                self._stats.wait += wait
+                self._stats.max_wait = max(self._stats.max_wait, wait)
+
+
+class StripedLock(_BaseStripedLock):
+    """Striped locks for threads.
+
+    :param stripes: The number of locks.
+    """
+
+    _locks: list[threading.Lock]
+
+    def __init__(self, stripes: int = 64) -> None:
+        super().__init__(stripes)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    @contextmanager
+    def hold(self, *keys: str) -> Iterator[None]:
+        """Hold the stripes of the given names (e. g. fully qualified domain
+        names) in the ``with`` block."""
+        acquired: list[threading.Lock] = []
+        try:
+            for index in self._indexes(keys):
+                lock = self._locks[index]
+                if lock.acquire(blocking=False):
+                    self._count(None)
+                else:
+                    start = time.perf_counter()
+                    lock.acquire()
+                    self._count(time.perf_counter() - start)
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+class AsyncStripedLock(_BaseStripedLock):
+    """Striped locks for the tasks of an event loop. Each event loop gets
+    its own locks.
+
+    :param stripes: The number of locks.
+    """
+
+    _locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, list[asyncio.Lock]]
+
+    def __init__(self, stripes: int = 64) -> None:
+        super().__init__(stripes)
+        self._locks = weakref.WeakKeyDictionary()
+
+    @asynccontextmanager
+    async def hold(self, *keys: str) -> AsyncIterator[None]:
+        """:see: :meth:`StripedLock.hold`"""
+        loop = asyncio.get_running_loop()
+        locks = self._locks.get(loop)
+        if locks is None:
+            locks = [asyncio.Lock() for _ in range(self.stripes)]
+            self._locks[loop] = locks
+        acquired: list[asyncio.Lock] = []
+        try:
+            for index in self._indexes(keys):
+                lock = locks[index]
+                if not lock.locked():
+                    await lock.acquire()
+                    self._count(None)
+                else:
+                    start = time.perf_counter()
+                    await lock.acquire()
+                    self._count(time.perf_counter() - start)
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+def format_lock_stats(stats: LockStats) -> str:
+    mean = stats.wait / stats.contended if stats.contended else 0.0
+    return (
+        f"name locks acquisitions={stats.acquisitions} "
+        f"contended={stats.contended} mean_wait={mean * 1000:.3g}ms "
+        f"max_wait={stats.max_wait * 1000:.3g}ms\n"
+    )
@@ -47,6 +47,11 @@ class LogLevel(Enum):
     :see: :exc:`dyndns.exceptions.IpAddressesError`
     """
 
+    RATE_LIMIT_ERROR = 44
+    """
+    :see: :exc:`dyndns.exceptions.RateLimitError`
+    """
+
     DNS_NAME_ERROR = 43
     """
     :see: :exc:`dyndns.exceptions.DnsNameError`
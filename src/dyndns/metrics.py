@@ -0,0 +1,411 @@
+"""Measure how long the nameservers take to answer.
+
+Each zone records the latency of its operations in histograms with fixed
+buckets, counts the failed queries and the bytes exchanged over the TCP
+connections. The measurements live in memory. If the metrics are
+disabled, the zone has no :class:`DnsMetrics` object and pays only a
+``None`` check per operation.
+
+The requests of the web app are counted by :class:`RequestMetrics`."""
+
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import time
+import weakref
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Literal, TypeVar, get_args
+
+import dns.exception
+import dns.tsig
+
+Operation = Literal["read", "update", "delete", "check"]
+
+K = TypeVar("K")
+
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""The upper bounds of the latency buckets in seconds."""
+
+
+@dataclass
+class HistogramStats:
+    """A snapshot of a :class:`Histogram`."""
+
+    buckets: tuple[float, ...]
+    """The upper bounds of the buckets in seconds."""
+
+    counts: list[int]
+    """The number of observations per bucket. The last count belongs to
+    the bucket above the highest bound."""
+
+    count: int = 0
+
+    sum: float = 0.0
+    """The sum of all observations in seconds."""
+
+    def percentile(self, quantile: float) -> float | None:
+        """:param quantile: For example ``0.95``.
+
+        :return: The upper bound of the bucket containing the given share
+            of the observations, ``inf`` if it is above the highest bound or
+            ``None`` if nothing was observed."""
+        if self.count == 0:
+            return None
+        rank = quantile * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Histogram:
+    """Count observations in buckets with fixed upper bounds."""
+
+    buckets: tuple[float, ...]
+
+    _counts: list[int]
+
+    _sum: float
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Not thread safe, see :class:`DnsMetrics`."""
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    def add(self, other: Histogram) -> None:
+        """Add the observations of a histogram with the same buckets."""
+        counts = list(other._counts)
+        self._counts = [a + b for a, b in zip(self._counts, counts)]
+        self._sum += other._sum
+
+    @property
+    def stats(self) -> HistogramStats:
+        return HistogramStats(
+            self.buckets, list(self._counts), sum(self._counts), self._sum
+        )
+
+
+@dataclass
+class DnsMetricsStats:
+    """A snapshot of the :class:`DnsMetrics` of a zone."""
+
+    zone: str
+
+    latency: dict[Operation, HistogramStats] = field(default_factory=dict)
+    """The latency histogram of each operation. ``read`` is a read of a
+    record set including retries, ``update`` and ``delete`` are update
+    messages and ``check`` is a whole check of the zone."""
+
+    timeouts: int = 0
+    """The number of queries a nameserver didn’t answer in time."""
+
+    bad_keys: int = 0
+    """The number of queries the nameserver rejected because of the TSIG
+    key (``PeerBadKey``)."""
+
+    errors: int = 0
+    """The number of failed queries, including the timeouts and the bad
+    keys."""
+
+    bytes_sent: int = 0
+    """The bytes sent over the TCP connections, including the length
+    prefixes."""
+
+    bytes_received: int = 0
+    """The bytes received over the TCP connections, including the length
+    prefixes."""
+
+
+def _reset_after_fork(reset: Callable[[], None]) -> None:
+    """Let a forked worker process count from zero. Otherwise every worker
+    would report the counts of the parent process again. The reference to
+    the collector is weak, so the collector can be garbage collected."""
+    method = weakref.WeakMethod(reset)
+
+    def after_in_child() -> None:
+        bound = method()
+        if bound is not None:
+            bound()
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
+class DnsMetrics:
+    """The latency histograms and the error and byte counters of one zone.
+
+    :param zone: The zone name (e. g. ``example.com.``).
+    """
+
+    zone: str
+
+    _histograms: dict[Operation, Histogram]
+
+    _timeouts: int
+
+    _bad_keys: int
+
+    _errors: int
+
+    _bytes_sent: int
+
+    _bytes_received: int
+
+    _lock: threading.Lock
+
+    def __init__(self, zone: str) -> None:
+        self.zone = zone
+        self._reset()
+        _reset_after_fork(self._reset)
+
+    def _reset(self) -> None:
+        self._histograms = {
+            operation: Histogram() for operation in get_args(Operation)
+        }
+        self._timeouts = 0
+        self._bad_keys = 0
+        self._errors = 0
+        self._bytes_sent = 0
+        self._bytes_received = 0
+        self._lock = threading.Lock()
+
+    def observe(self, operation: Operation, seconds: float) -> None:
+        with self._lock:
+            self._histograms[operation].observe(seconds)
+
+    @contextmanager
+    def measure(self, operation: Operation) -> Iterator[None]:
+        """Observe the time spent in the ``with`` block, even if it
+        raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, time.perf_counter() - start)
+
+    def count_error(self, error: BaseException) -> None:
+        with self._lock:
+            self._errors += 1
+            if isinstance(error, dns.exception.Timeout):
+                self._timeouts += 1
+            elif isinstance(error, dns.tsig.PeerBadKey):
+                self._bad_keys += 1
+
+    def count_bytes(self, sent: int, received: int) -> None:
+        with self._lock:
+            self._bytes_sent += sent
+            self._bytes_received += received
+
+    @property
+    def stats(self) -> DnsMetricsStats:
+        with self._lock:
+            return DnsMetricsStats(
+                zone=self.zone,
+                latency={
+                    operation: histogram.stats
+                    for operation, histogram in self._histograms.items()
+                },
+                timeouts=self._timeouts,
+                bad_keys=self._bad_keys,
+                errors=self._errors,
+                bytes_sent=self._bytes_sent,
+                bytes_received=self._bytes_received,
+            )
+
+
+UpdateResult = Literal["updated", "unchanged"]
+
+
+@dataclass
+class RequestMetricsStats:
+    """A snapshot of the :class:`RequestMetrics`."""
+
+    requests: dict[tuple[str, int], int] = field(default_factory=dict)
+    """The number of requests by route (the name of the view function) and
+    HTTP status code."""
+
+    latency: dict[str, HistogramStats] = field(default_factory=dict)
+    """The time spent answering the requests of each route."""
+
+    errors: dict[str, int] = field(default_factory=dict)
+    """The number of failed requests by the class name of the exception,
+    e. g. ``ParameterError``."""
+
+    updates: dict[UpdateResult, int] = field(default_factory=dict)
+    """The number of updated and unchanged names."""
+
+
+def _add_counts(total: dict[K, int], counts: dict[K, int]) -> None:
+    for key, count in counts.items():
+        total[key] = total.get(key, 0) + count
+
+
+class _RequestShard:
+    """The counters of one thread."""
+
+    requests: dict[tuple[str, int], int]
+
+    histograms: dict[str, Histogram]
+
+    errors: dict[str, int]
+
+    updates: dict[UpdateResult, int]
+
+    def __init__(self) -> None:
+        self.requests = {}
+        self.histograms = {}
+        self.errors = {}
+        self.updates = {}
+
+    def add(self, other: _RequestShard) -> None:
+        """Add the counters of another shard, whose thread may still be
+        counting."""
+        # Copying a dict or a list is atomic, so the copies are consistent.
+        _add_counts(self.requests, dict(other.requests))
+        _add_counts(self.errors, dict(other.errors))
+        _add_counts(self.updates, dict(other.updates))
+        for route, histogram in dict(other.histograms).items():
+            total = self.histograms.get(route)
+            if total is None:
+                total = self.histograms[route] = Histogram(histogram.buckets)
+            total.add(histogram)
+
+    @property
+    def stats(self) -> RequestMetricsStats:
+        return RequestMetricsStats(
+            requests=dict(self.requests),
+            latency={
+                route: histogram.stats for route, histogram in self.histograms.items()
+            },
+            errors=dict(self.errors),
+            updates=dict(self.updates),
+        )
+
+
+class RequestMetrics:
+    """Count the requests, their latency, the errors and the outcome of the
+    updates.
+
+    Each thread counts into its own shard, so the requests don’t contend
+    for a lock. The shards are only added up by :attr:`stats`. The shard of
+    a finished thread is added to the shard of the finished threads."""
+
+    _local: threading.local
+
+    _shards: list[_RequestShard]
+
+    _finished: _RequestShard
+    """The counters of the finished threads."""
+
+    _lock: threading.Lock
+    """Guards the list of shards, not the counters."""
+
+    def __init__(self) -> None:
+        self._reset()
+        _reset_after_fork(self._reset)
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        self._shards = []
+        self._finished = _RequestShard()
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _RequestShard:
+        shard: _RequestShard | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _RequestShard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+        return shard
+
+    def _retire(self, shard: _RequestShard) -> None:
+        with self._lock:
+            # The shards of the threads of the parent process are dropped
+            # after a fork.
+            if shard in self._shards:
+                self._finished.add(shard)
+                self._shards.remove(shard)
+
+    def observe_request(self, route: str, status_code: int, seconds: float) -> None:
+        shard = self._shard()
+        key = (route, status_code)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        histogram = shard.histograms.get(route)
+        if histogram is None:
+            histogram = shard.histograms[route] = Histogram()
+        histogram.observe(seconds)
+
+    def count_error(self, error: BaseException) -> None:
+        shard = self._shard()
+        name = error.__class__.__name__
+        shard.errors[name] = shard.errors.get(name, 0) + 1
+
+    def count_update(self, result: UpdateResult) -> None:
+        shard = self._shard()
+        shard.updates[result] = shard.updates.get(result, 0) + 1
+
+    @property
+    def stats(self) -> RequestMetricsStats:
+        total = _RequestShard()
+        with self._lock:
+            total.add(self._finished)
+            for shard in self._shards:
+                total.add(shard)
+        return total.stats
+
+
+def _format_seconds(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return f">{LATENCY_BUCKETS[-1]:g}s"
+    return f"{seconds * 1000:.3g}ms"
+
+
+def format_metrics(stats: list[DnsMetricsStats]) -> str:
+    """Format the metrics of several zones as a table: the number of
+    operations, the mean latency and the bucket of the 50th and 99th
+    percentile."""
+    lines: list[str] = []
+    for zone in stats:
+        lines.append(
+            f"{zone.zone} timeouts={zone.timeouts} bad_keys={zone.bad_keys} "
+            f"errors={zone.errors} sent={zone.bytes_sent}B "
+            f"received={zone.bytes_received}B"
+        )
+        for operation, histogram in zone.latency.items():
+            mean = histogram.sum / histogram.count if histogram.count else None
+            lines.append(
+                f"  {operation:<7} count={histogram.count} "
+                f"mean={_format_seconds(mean)} "
+                f"p50<={_format_seconds(histogram.percentile(0.5))} "
+                f"p99<={_format_seconds(histogram.percentile(0.99))}"
+            )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,239 @@
+"""Choose the fastest healthy nameserver if several nameservers are
+configured.
+
+The latency and the error rate of every nameserver are measured with each
+query. The nameservers are tried in the order of their score. A nameserver
+that fails (for example by a timeout) is skipped for a while and the next
+nameserver takes over."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+
+@dataclass
+class NameserverStats:
+    """A snapshot of the health of a :class:`Nameserver`."""
+
+    address: str
+
+    port: int
+
+    latency: float | None
+    """The smoothed latency in seconds. ``None`` if the nameserver was not
+    asked yet."""
+
+    error_rate: float
+    """The smoothed share of failed queries between ``0`` and ``1``."""
+
+    queries: int
+
+    errors: int
+
+    healthy: bool
+
+
+class Nameserver:
+    """The health of one nameserver. The object is shared by all zones
+    that are hosted on the nameserver, see :func:`get_nameserver`.
+
+    :param address: The ip address of the nameserver, for example
+        ``127.0.0.1``.
+    :param port: The port of the nameserver.
+    """
+
+    SMOOTHING: float = 0.3
+    """The weight of the latest measurement in the moving averages."""
+
+    ERROR_PENALTY: float = 10.0
+    """A nameserver failing every query scores like a nameserver with this
+    times the latency."""
+
+    BACKOFF: float = 1.0
+    """Seconds a nameserver is skipped after the first failure. The time
+    doubles with each further failure in a row."""
+
+    MAX_BACKOFF: float = 60.0
+
+    READ_SAMPLES: int = 200
+    """The number of recent read latencies kept for :meth:`read_percentile`."""
+
+    MIN_READ_SAMPLES: int = 20
+    """Percentiles of fewer read latencies are not meaningful."""
+
+    address: str
+
+    port: int
+
+    _latency: float | None
+
+    _error_rate: float
+
+    _queries: int
+
+    _errors: int
+
+    _failures: int
+    """The number of failures in a row."""
+
+    _down_until: float
+
+    _read_latencies: deque[float]
+
+    _lock: threading.Lock
+
+    def __init__(self, address: str, port: int) -> None:
+        self.address = address
+        self.port = port
+        self._latency = None
+        self._error_rate = 0.0
+        self._queries = 0
+        self._errors = 0
+        self._failures = 0
+        self._down_until = 0.0
+        self._read_latencies = deque(maxlen=self.READ_SAMPLES)
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"Nameserver({self.address!r}, {self.port})"
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    @property
+    def down_until(self) -> float:
+        """The monotonic time until the nameserver is skipped."""
+        return self._down_until
+
+    @property
+    def score(self) -> float:
+        """Lower is better. Nameservers that were not asked yet score ``0``,
+        so they are measured soon."""
+        return (self._latency or 0.0) * (1 + self.ERROR_PENALTY * self._error_rate)
+
+    @property
+    def stats(self) -> NameserverStats:
+        with self._lock:
+            return NameserverStats(
+                address=self.address,
+                port=self.port,
+                latency=self._latency,
+                error_rate=self._error_rate,
+                queries=self._queries,
+                errors=self._errors,
+                healthy=self.healthy,
+            )
+
+    def read_percentile(self, quantile: float) -> float | None:
+        """:param quantile: For example ``0.95``.
+
+        :return: The latency in seconds below which the given share of the
+            recent reads were answered or ``None`` if too few reads were
+            measured."""
+        with self._lock:
+            if len(self._read_latencies) < self.MIN_READ_SAMPLES:
+                return None
+            latencies = sorted(self._read_latencies)
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+    def record_success(self, latency: float, read: bool = False) -> None:
+        """:param latency: The duration of the query in seconds.
+        :param read: ``True`` if the query was a read."""
+        with self._lock:
+            if read:
+                self._read_latencies.append(latency)
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency += self.SMOOTHING * (latency - self._latency)
+            self._error_rate -= self.SMOOTHING * self._error_rate
+            self._queries += 1
+            self._failures = 0
+            self._down_until = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._error_rate += self.SMOOTHING * (1 - self._error_rate)
+            self._queries += 1
+            self._errors += 1
+            self._failures += 1
+            self._down_until = time.monotonic() + min(
+                self.MAX_BACKOFF, self.BACKOFF * 2 ** (self._failures - 1)
+            )
+
+
+class NameserverGroup:
+    """The nameservers of a zone.
+
+    :param nameservers: The nameservers in the configured order. The order
+        breaks ties between nameservers with the same score.
+    """
+
+    nameservers: list[Nameserver]
+
+    def __init__(self, nameservers: Sequence[Nameserver]) -> None:
+        self.nameservers = list(nameservers)
+
+    def __len__(self) -> int:
+        return len(self.nameservers)
+
+    @property
+    def primary(self) -> Nameserver:
+        """The first configured nameserver."""
+        return self.nameservers[0]
+
+    def ordered(self) -> list[Nameserver]:
+        """:return: The healthy nameservers by score followed by the
+        unhealthy nameservers, which are tried as a last resort."""
+        if len(self.nameservers) == 1:
+            return self.nameservers
+        healthy = [ns for ns in self.nameservers if ns.healthy]
+        unhealthy = [ns for ns in self.nameservers if not ns.healthy]
+        healthy.sort(key=lambda ns: ns.score)
+        unhealthy.sort(key=lambda ns: ns.down_until)
+        return healthy + unhealthy
+
+    def describe(self) -> str:
+        """:return: The addresses for error messages, for example
+        ``192.168.1.1, 192.168.1.2``."""
+        return ", ".join(ns.address for ns in self.nameservers)
+
+
+_nameservers: dict[tuple[str, int], Nameserver] = {}
+
+_nameservers_lock = threading.Lock()
+
+
+def get_nameserver(address: str, port: int) -> Nameserver:
+    """Get the shared health of a nameserver. The object is created on the
+    first call.
+
+    :param address: The ip address of the nameserver, for example
+        ``127.0.0.1``.
+    :param port: The port of the nameserver.
+    """
+    key = (address, port)
+    with _nameservers_lock:
+        nameserver = _nameservers.get(key)
+        if nameserver is None:
+            nameserver = Nameserver(address, port)
+            _nameservers[key] = nameserver
+        return nameserver
+
+
+def get_nameserver_group(addresses: str | Sequence[str], port: int) -> NameserverGroup:
+    """:param addresses: One ip address or several ip addresses."""
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    return NameserverGroup([get_nameserver(address, port) for address in addresses])
+
+
+def get_nameserver_stats() -> list[NameserverStats]:
+    with _nameservers_lock:
+        nameservers = list(_nameservers.values())
+    return [nameserver.stats for nameserver in nameservers]
@@ -0,0 +1,204 @@
+"""Listen for DNS NOTIFY messages (RFC 1996) of the nameservers.
+
+A nameserver sends a NOTIFY to its ``also-notify`` targets whenever a zone
+changes, no matter whether the change was made by dyndns, by ``nsupdate``
+or by editing the zone file. The listener answers the NOTIFY and asks the
+zone to drop the records it has cached, so the records can be cached for a
+long time without serving stale content."""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.opcode
+import dns.rcode
+import dns.rdatatype
+import dns.tsig
+
+from dyndns.log import LogLevel, logger
+
+NotifyHandler = Callable[[int | None], None]
+"""Called with the SOA serial announced by the NOTIFY (or ``None`` if the
+NOTIFY carries no SOA record)."""
+
+
+@dataclass
+class NotifySource:
+    nameservers: set[str]
+    """The IP addresses the NOTIFY messages of the zone are accepted from."""
+
+    handler: NotifyHandler
+
+
+class NotifyListener:
+    """A UDP socket served by a background thread.
+
+    The listener runs in the process that starts it. With several worker
+    processes only this process drops its cached records.
+
+    :param address: The IP address to listen on, for example ``127.0.0.1``.
+    :param port: The UDP port to listen on. ``0`` picks a free port.
+    """
+
+    address: str
+
+    port: int
+    """The UDP port. After :meth:`start` it is the port actually bound."""
+
+    _sources: dict[dns.name.Name, NotifySource]
+
+    _keyring: dict[dns.name.Name, dns.tsig.Key]
+    """Verifies the NOTIFY messages signed with the TSIG key of a zone."""
+
+    _socket: socket.socket | None
+
+    _thread: threading.Thread | None
+
+    _pid: int | None
+
+    def __init__(self, address: str = "127.0.0.1", port: int = 5300) -> None:
+        self.address = address
+        self.port = port
+        self._sources = {}
+        self._keyring = {}
+        self._socket = None
+        self._thread = None
+        self._pid = None
+
+    def register(
+        self,
+        zone_name: str,
+        nameservers: list[str],
+        handler: NotifyHandler,
+        key: dns.tsig.Key | None = None,
+    ) -> None:
+        """
+        :param zone_name: The zone name (e. g. ``example.com.``).
+        :param nameservers: The IP addresses of the nameservers of the zone.
+            NOTIFY messages from other addresses are refused.
+        :param handler: Called for every accepted NOTIFY of the zone.
+        :param key: The TSIG key of the zone. Unsigned NOTIFY messages are
+            accepted as well.
+        """
+        name = dns.name.from_text(zone_name)
+        self._sources[name] = NotifySource(set(nameservers), handler)
+        if key is not None:
+            self._keyring[key.name] = key
+
+    def handle(
+        self, wire: bytes, source: str
+    ) -> tuple[bytes | None, Callable[[], None] | None]:
+        """Answer one message.
+
+        :param wire: The received message.
+        :param source: The IP address of the sender.
+
+        :return: The response (``None`` if the message is not answered) and
+            the call of the zone handler, which is made after the response
+            is sent (``None`` if the NOTIFY is not accepted)."""
+        try:
+            message = dns.message.from_wire(wire, keyring=self._keyring)
+        except dns.exception.DNSException as e:
+            logger.log(
+                LogLevel.DEBUG, f"An invalid NOTIFY from '{source}' was dropped: {e}"
+            )
+            return None, None
+        if message.opcode() != dns.opcode.NOTIFY or message.flags & dns.flags.QR:
+            return None, None
+        response = dns.message.make_response(message)
+        if (
+            len(message.question) != 1
+            or message.question[0].rdtype != dns.rdatatype.SOA
+        ):
+            response.set_rcode(dns.rcode.FORMERR)
+            return response.to_wire(), None
+        name = message.question[0].name
+        notify_source = self._sources.get(name)
+        if notify_source is None or source not in notify_source.nameservers:
+            logger.log(
+                LogLevel.WARNING,
+                f"A NOTIFY for the zone '{name}' from '{source}' was refused.",
+            )
+            response.set_rcode(dns.rcode.REFUSED)
+            return response.to_wire(), None
+        response.flags |= dns.flags.AA
+        serial: int | None = None
+        for rrset in message.answer:
+            if rrset.rdtype == dns.rdatatype.SOA and rrset.name == name:
+                serial = rrset[0].serial
+        return response.to_wire(), lambda: self._notify(
+            name, notify_source.handler, serial
+        )
+
+    @staticmethod
+    def _notify(
+        name: dns.name.Name, handler: NotifyHandler, serial: int | None
+    ) -> None:
+        logger.log(
+            LogLevel.DEBUG, f"The zone '{name}' was changed (serial {serial})."
+        )
+        try:
+            handler(serial)
+        except Exception as e:
+            logger.log(
+                LogLevel.WARNING,
+                f"The NOTIFY for the zone '{name}' could not be processed: {e}",
+            )
+
+    def start(self) -> NotifyListener:
+        """Bind the socket and start the thread. Nothing happens if the
+        listener is already running in the current process."""
+        if self._thread is not None and self._pid == os.getpid():
+            return self
+        family = socket.AF_INET6 if ":" in self.address else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.bind((self.address, self.port))
+        self.port = sock.getsockname()[1]
+        self._socket = sock
+        self._thread = threading.Thread(
+            target=self._run, args=(sock,), name="dyndns-notify", daemon=True
+        )
+        self._pid = os.getpid()
+        self._thread.start()
+        return self
+
+    def _run(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                wire, peer = sock.recvfrom(65535)
+            except OSError:
+                return
+            if self._socket is not sock:
+                # The listener was closed.
+                return
+            response, notify = self.handle(wire, peer[0])
+            if response is not None:
+                try:
+                    sock.sendto(response, peer)
+                except OSError:
+                    pass
+            if notify is not None:
+                notify()
+
+    def close(self) -> None:
+        """Stop listening."""
+        sock = self._socket
+        self._socket = None
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        sock.close()
+        self._thread = None
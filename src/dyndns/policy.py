@@ -0,0 +1,95 @@
+"""Timeouts, retries and hedging of the queries sent to the nameservers."""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass
+class QueryPolicy:
+    """How long to wait for a nameserver and how often to try again.
+
+    A query is first sent to the nameservers in the order of their score.
+    If all nameservers fail with a timeout or a connection error, the query
+    is retried after a jittered exponential backoff."""
+
+    read_timeout: float = 2.0
+    """Seconds to wait for one nameserver to answer a read."""
+
+    update_timeout: float = 5.0
+    """Seconds to wait for one nameserver to answer an update."""
+
+    retries: int = 2
+    """How often a failed query is sent again."""
+
+    backoff: float = 0.1
+    """The upper bound of the first backoff in seconds. The bound doubles
+    with each retry."""
+
+    max_backoff: float = 2.0
+    """The upper bound of the backoff in seconds."""
+
+    hedge_reads: bool = False
+    """Send a second read to the next nameserver (or again to the same
+    nameserver) if the first read has not been answered within the 95th
+    percentile of the read latency. The first answer wins."""
+
+    hedge_min_delay: float = 0.01
+    """Never hedge a read earlier than this number of seconds."""
+
+    def delays(self) -> Iterator[float]:
+        """Yield the seconds to sleep before each attempt: ``0`` for the
+        first attempt and a random backoff (“full jitter”) for each
+        retry."""
+        yield 0.0
+        for retry in range(self.retries):
+            yield random.uniform(0, min(self.max_backoff, self.backoff * 2**retry))
+
+    def hedge_delay(self, p95: float | None) -> float:
+        """:param p95: The 95th percentile of the read latency of the best
+            nameserver or ``None`` if not enough reads were measured yet.
+
+        :return: Seconds to wait before a read is hedged."""
+        if p95 is None:
+            return max(self.hedge_min_delay, self.read_timeout / 2)
+        return max(self.hedge_min_delay, p95)
+
+
+@dataclass
+class QueryStats:
+    """Counters of the retries and the hedged reads of a zone."""
+
+    retries: int = 0
+    """The number of queries sent again after all nameservers failed."""
+
+    hedged: int = 0
+    """The number of reads for which a second read was sent."""
+
+    hedge_wins: int = 0
+    """The number of hedged reads answered first by the second read."""
+
+
+_executor: ThreadPoolExecutor | None = None
+
+_executor_pid: int | None = None
+
+_executor_lock = threading.Lock()
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    """The threads that send hedged reads. The pool is created again after
+    a fork because the threads of the parent process don’t exist in the
+    child process."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=32, thread_name_prefix="dyndns-hedge"
+            )
+            _executor_pid = os.getpid()
+        return _executor
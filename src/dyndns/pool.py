@@ -0,0 +1,645 @@
+"""Keep TCP connections to the nameservers open and reuse them across
+requests."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+import dns.asyncbackend
+import dns.asyncquery
+import dns.edns
+import dns.exception
+import dns.inet
+import dns.message
+import dns.query
+
+if TYPE_CHECKING:
+    from dyndns.metrics import DnsMetrics
+
+
+KEEPALIVE_SIZE = 15
+"""The bytes the pool adds to a message without EDNS: an OPT record (11
+bytes) with an empty ``edns-tcp-keepalive`` option (4 bytes)."""
+
+
+@dataclass
+class PoolStats:
+    """Counters of a :class:`ConnectionPool`."""
+
+    created: int = 0
+    """The number of TCP connections opened to the nameserver."""
+
+    reused: int = 0
+    """The number of queries sent over an already open connection."""
+
+    reconnects: int = 0
+    """The number of queries that failed on a reused connection and were sent
+    again over a fresh one."""
+
+    expired: int = 0
+    """The number of idle connections closed because they exceeded the idle
+    timeout or were closed by the nameserver."""
+
+    discarded: int = 0
+    """The number of connections closed after an error or because the pool
+    was full."""
+
+    idle: int = 0
+    """The number of connections currently waiting in the pool."""
+
+    in_use: int = 0
+    """The number of connections currently used by a query."""
+
+    keepalive: float | None = None
+    """The idle timeout in seconds the nameserver advertised last by the
+    RFC 7828 ``edns-tcp-keepalive`` option. ``None`` if it advertised
+    none."""
+
+
+SocketT = TypeVar("SocketT")
+
+
+class BaseConnectionPool(ABC, Generic[SocketT]):
+    """The bookkeeping shared by the blocking and the asyncio connection
+    pool.
+
+    :param nameserver: The ip address of the nameserver, for example
+        ``127.0.0.1``.
+    :param port: The port of the nameserver.
+    :param size: The maximum number of idle connections kept open. Queries
+        exceeding this number in parallel get a temporary connection that is
+        closed afterwards.
+    :param idle_timeout: Connections that have not been used for this number
+        of seconds are closed.
+    :param keepalive: Send the RFC 7828 ``edns-tcp-keepalive`` option with
+        each message. If the nameserver answers with an idle timeout,
+        connections idle for longer are closed even if ``idle_timeout``
+        allows more. A timeout of ``0`` closes the connection right away.
+    """
+
+    nameserver: str
+
+    port: int
+
+    size: int
+
+    idle_timeout: float
+
+    keepalive: bool
+
+    _idle: list[tuple[SocketT, float, float | None]]
+    """The idle connections together with the time they were last used and
+    the idle timeout advertised by the nameserver on the connection. The
+    most recently used connection is at the end of the list."""
+
+    _stats: PoolStats
+
+    _lock: threading.Lock
+
+    _pid: int
+
+    def __init__(
+        self,
+        nameserver: str,
+        port: int,
+        size: int = 4,
+        idle_timeout: float = 30.0,
+        keepalive: bool = True,
+    ) -> None:
+        self.nameserver = nameserver
+        self.port = port
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self._idle = []
+        self._stats = PoolStats()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def stats(self) -> PoolStats:
+        """A snapshot of the pool counters."""
+        with self._lock:
+            return replace(self._stats, idle=len(self._idle))
+
+    def _is_foreign(self) -> bool:
+        """``True`` if the idle connections can not be used by the caller."""
+        return self._pid != os.getpid()
+
+    @abstractmethod
+    def _close_foreign(self, socks: list[SocketT]) -> None:
+        """Close idle connections the caller can not use."""
+
+    def _adopt(self) -> None:
+        """Close the idle connections of the parent process or of another
+        event loop and take the pool over. Called with the lock held."""
+        self._close_foreign([sock for sock, _, _ in self._idle])
+        self._stats.discarded += len(self._idle)
+        self._idle = []
+        if self._pid != os.getpid():
+            # The threads that use the connections of the parent process
+            # don’t exist in the child process, so they are never put back.
+            self._stats.in_use = 0
+            self._pid = os.getpid()
+
+    def _take_idle(self) -> tuple[SocketT | None, list[SocketT]]:
+        """:return: The most recently used idle connection (or ``None``) and
+        the connections that exceeded the idle timeout."""
+        now: float = time.monotonic()
+        expired: list[SocketT] = []
+        with self._lock:
+            if self._is_foreign():
+                self._adopt()
+            while self._idle:
+                sock, last_used, keepalive = self._idle.pop()
+                idle_timeout = self.idle_timeout
+                if keepalive is not None:
+                    idle_timeout = min(idle_timeout, keepalive)
+                if now - last_used > idle_timeout:
+                    expired.append(sock)
+                    continue
+                self._stats.expired += len(expired)
+                return sock, expired
+            self._stats.expired += len(expired)
+        return None, expired
+
+    def _count(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            setattr(self._stats, counter, getattr(self._stats, counter) + value)
+
+    def _prepare(self, message: dns.message.Message) -> None:
+        """Add the ``edns-tcp-keepalive`` option to a message."""
+        if not self.keepalive:
+            return
+        if any(option.otype == dns.edns.KEEPALIVE for option in message.options):
+            return
+        options = [*message.options, dns.edns.GenericOption(dns.edns.KEEPALIVE, b"")]
+        if message.edns < 0:
+            message.use_edns(0, options=options)
+        else:
+            message.use_edns(
+                message.edns, message.ednsflags, message.payload, options=options
+            )
+
+    def _advertised_keepalive(self, response: dns.message.Message) -> float | None:
+        """:return: The idle timeout in seconds the nameserver advertised in
+        the response or ``None``."""
+        if not self.keepalive:
+            return None
+        for option in response.options:
+            if option.otype == dns.edns.KEEPALIVE:
+                data = option.to_wire()
+                if data is not None and len(data) == 2:
+                    # The timeout is given in units of 100 milliseconds.
+                    return struct.unpack("!H", data)[0] / 10
+        return None
+
+    def _put_back(self, sock: SocketT, keepalive: float | None = None) -> bool:
+        """:param keepalive: The idle timeout advertised by the nameserver.
+
+        :return: ``False`` if the pool is full or the nameserver asked to
+            close the connection, so the connection has to be closed."""
+        with self._lock:
+            self._stats.in_use -= 1
+            if keepalive is not None:
+                self._stats.keepalive = keepalive
+            if (
+                len(self._idle) < self.size
+                and not self._is_foreign()
+                and keepalive != 0
+            ):
+                self._idle.append((sock, time.monotonic(), keepalive))
+                return True
+            self._stats.discarded += 1
+            return False
+
+    def _count_discard(self) -> None:
+        with self._lock:
+            self._stats.in_use -= 1
+            self._stats.discarded += 1
+
+    def _drain(self) -> list[SocketT]:
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        return [sock for sock, _, _ in idle]
+
+
+def _expiration(timeout: float | None) -> float | None:
+    return None if timeout is None else time.time() + timeout
+
+
+def _remaining(expiration: float | None) -> float | None:
+    if expiration is None:
+        return None
+    remaining = expiration - time.time()
+    if remaining <= 0:
+        raise dns.exception.Timeout
+    return remaining
+
+
+def _parse_response(
+    message: dns.message.Message, wire: bytes
+) -> dns.message.Message:
+    response = dns.message.from_wire(
+        wire, keyring=message.keyring, request_mac=message.mac
+    )
+    if not message.is_response(response):
+        raise dns.query.BadResponse
+    return response
+
+
+def _read_exactly(sock: socket.socket, count: int, expiration: float | None) -> bytes:
+    """Read ``count`` bytes from a nonblocking socket."""
+    data = b""
+    while len(data) < count:
+        readable, _, _ = select.select([sock], [], [], _remaining(expiration))
+        if not readable:
+            raise dns.exception.Timeout
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise EOFError("The nameserver closed the connection.")
+        data += chunk
+    return data
+
+
+def _exchange(
+    sock: socket.socket, message: dns.message.Message, timeout: float | None
+) -> tuple[dns.message.Message, int, int]:
+    """Send a message over TCP and read the response like
+    :func:`dns.query.tcp`, but keep track of the size of both messages.
+
+    :return: The response, the bytes sent and the bytes received (each
+        including the two byte length prefix)."""
+    expiration = _expiration(timeout)
+    sent, _ = dns.query.send_tcp(sock, message.to_wire(), expiration)
+    (length,) = struct.unpack("!H", _read_exactly(sock, 2, expiration))
+    wire = _read_exactly(sock, length, expiration)
+    return _parse_response(message, wire), sent, length + 2
+
+
+class ConnectionPool(BaseConnectionPool[socket.socket]):
+    """A pool of blocking TCP connections to one nameserver."""
+
+    def _connect(self, timeout: float | None) -> socket.socket:
+        sock = socket.create_connection((self.nameserver, self.port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # dns.query.send_tcp() expects a nonblocking connected socket.
+        sock.setblocking(False)
+        with self._lock:
+            self._stats.created += 1
+            self._stats.in_use += 1
+        return sock
+
+    @staticmethod
+    def _is_alive(sock: socket.socket) -> bool:
+        """An idle connection must not have anything to read. If it is
+        readable, the nameserver has closed it (or sent garbage)."""
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _acquire(self, timeout: float | None) -> tuple[socket.socket, bool]:
+        """:return: A connection and ``True`` if the connection is reused."""
+        while True:
+            sock, expired = self._take_idle()
+            for candidate in expired:
+                candidate.close()
+            if sock is None:
+                return self._connect(timeout), False
+            if self._is_alive(sock):
+                with self._lock:
+                    self._stats.reused += 1
+                    self._stats.in_use += 1
+                return sock, True
+            self._count("expired")
+            sock.close()
+
+    def _release(self, sock: socket.socket, keepalive: float | None) -> None:
+        if not self._put_back(sock, keepalive):
+            sock.close()
+
+    def _discard(self, sock: socket.socket) -> None:
+        self._count_discard()
+        sock.close()
+
+    def query(
+        self,
+        message: dns.message.Message,
+        timeout: float | None = None,
+        metrics: DnsMetrics | None = None,
+    ) -> dns.message.Message:
+        """Send a message over a pooled connection and return the response.
+
+        If a reused connection turns out to be broken, the message is sent
+        once more over a new connection.
+
+        :param metrics: Counts the bytes sent and received."""
+        self._prepare(message)
+        sock, reused = self._acquire(timeout)
+        try:
+            response, sent, received = _exchange(sock, message, timeout)
+        except (OSError, EOFError):
+            self._discard(sock)
+            if not reused:
+                raise
+            self._count("reconnects")
+            sock = self._connect(timeout)
+            try:
+                response, sent, received = _exchange(sock, message, timeout)
+            except BaseException:
+                self._discard(sock)
+                raise
+        except BaseException:
+            # After a timeout or a malformed answer the stream is out of sync.
+            self._discard(sock)
+            raise
+        self._release(sock, self._advertised_keepalive(response))
+        if metrics is not None:
+            metrics.count_bytes(sent, received)
+        return response
+
+    def _close_foreign(self, socks: list[socket.socket]) -> None:
+        # Closes the copies of the child process only, the connections of
+        # the parent process stay open.
+        for sock in socks:
+            sock.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        for sock in self._drain():
+            sock.close()
+
+
+async def _read_exactly_async(
+    sock: dns.asyncbackend.StreamSocket, count: int, expiration: float | None
+) -> bytes:
+    """:see: :func:`_read_exactly`"""
+    data = b""
+    while len(data) < count:
+        chunk = await sock.recv(count - len(data), _remaining(expiration))
+        if not chunk:
+            raise EOFError("The nameserver closed the connection.")
+        data += chunk
+    return data
+
+
+async def _exchange_async(
+    sock: dns.asyncbackend.StreamSocket,
+    message: dns.message.Message,
+    timeout: float | None,
+) -> tuple[dns.message.Message, int, int]:
+    """:see: :func:`_exchange`"""
+    expiration = _expiration(timeout)
+    sent, _ = await dns.asyncquery.send_tcp(sock, message.to_wire(), expiration)
+    (length,) = struct.unpack("!H", await _read_exactly_async(sock, 2, expiration))
+    wire = await _read_exactly_async(sock, length, expiration)
+    return _parse_response(message, wire), sent, length + 2
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class AsyncConnectionPool(BaseConnectionPool[dns.asyncbackend.StreamSocket]):
+    """A pool of asyncio TCP connections to one nameserver. The connections
+    belong to the event loop that opened them."""
+
+    _loop: asyncio.AbstractEventLoop | None
+
+    def __init__(
+        self, nameserver: str, port: int, size: int = 4, idle_timeout: float = 30.0
+    ) -> None:
+        super().__init__(nameserver, port, size, idle_timeout)
+        self._loop = None
+
+    def _is_foreign(self) -> bool:
+        return _running_loop() is not self._loop or super()._is_foreign()
+
+    def _close_foreign(self, socks: list[dns.asyncbackend.StreamSocket]) -> None:
+        """The connections can’t be awaited in the running event loop. They
+        are closed in the event loop that opened them. A closed event loop
+        can’t run the callbacks of its transports, so the connections are
+        shut down and their sockets are closed once the transports are
+        garbage collected."""
+        loop = self._loop
+        for sock in socks:
+            writer: asyncio.StreamWriter | None = getattr(sock, "writer", None)
+            if writer is None:
+                continue
+            if loop is not None:
+                try:
+                    loop.call_soon_threadsafe(writer.close)
+                    continue
+                except RuntimeError:
+                    # The event loop is closed.
+                    pass
+            raw = writer.get_extra_info("socket")
+            if raw is not None:
+                try:
+                    raw.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _adopt(self) -> None:
+        super()._adopt()
+        self._loop = _running_loop()
+
+    async def _connect(self, timeout: float | None) -> dns.asyncbackend.StreamSocket:
+        backend = dns.asyncbackend.get_default_backend()
+        sock = await backend.make_socket(
+            dns.inet.af_for_address(self.nameserver),
+            socket.SOCK_STREAM,
+            0,
+            None,
+            (self.nameserver, self.port),
+            timeout,
+        )
+        with self._lock:
+            self._stats.created += 1
+            self._stats.in_use += 1
+        return sock
+
+    @staticmethod
+    def _is_alive(sock: dns.asyncbackend.StreamSocket) -> bool:
+        """The asyncio backend of dnspython wraps a stream reader and writer.
+        The reader is at EOF once the nameserver has closed the connection."""
+        reader: asyncio.StreamReader | None = getattr(sock, "reader", None)
+        writer: asyncio.StreamWriter | None = getattr(sock, "writer", None)
+        if reader is not None and reader.at_eof():
+            return False
+        return writer is None or not writer.is_closing()
+
+    async def _acquire(
+        self, timeout: float | None
+    ) -> tuple[dns.asyncbackend.StreamSocket, bool]:
+        while True:
+            sock, expired = self._take_idle()
+            for candidate in expired:
+                await candidate.close()
+            if sock is None:
+                return await self._connect(timeout), False
+            if self._is_alive(sock):
+                with self._lock:
+                    self._stats.reused += 1
+                    self._stats.in_use += 1
+                return sock, True
+            self._count("expired")
+            await sock.close()
+
+    async def _discard(self, sock: dns.asyncbackend.StreamSocket) -> None:
+        self._count_discard()
+        await sock.close()
+
+    async def query(
+        self,
+        message: dns.message.Message,
+        timeout: float | None = None,
+        metrics: DnsMetrics | None = None,
+    ) -> dns.message.Message:
+        """Send a message over a pooled connection and return the response.
+
+        If a reused connection turns out to be broken, the message is sent
+        once more over a new connection.
+
+        :param metrics: Counts the bytes sent and received."""
+        self._prepare(message)
+        sock, reused = await self._acquire(timeout)
+        try:
+            response, sent, received = await _exchange_async(sock, message, timeout)
+        except (OSError, EOFError):
+            await self._discard(sock)
+            if not reused:
+                raise
+            self._count("reconnects")
+            sock = await self._connect(timeout)
+            try:
+                response, sent, received = await _exchange_async(
+                    sock, message, timeout
+                )
+            except BaseException:
+                await self._discard(sock)
+                raise
+        except BaseException:
+            await self._discard(sock)
+            raise
+        if not self._put_back(sock, self._advertised_keepalive(response)):
+            await sock.close()
+        if metrics is not None:
+            metrics.count_bytes(sent, received)
+        return response
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        for sock in self._drain():
+            await sock.close()
+
+
+_pools: dict[tuple[str, int], ConnectionPool] = {}
+
+_async_pools: dict[tuple[str, int], AsyncConnectionPool] = {}
+
+_pools_lock = threading.Lock()
+
+
+def get_pool(
+    nameserver: str,
+    port: int,
+    size: int | None = None,
+    idle_timeout: float | None = None,
+    keepalive: bool | None = None,
+) -> ConnectionPool:
+    """Get the connection pool of a nameserver. The pool is created on the
+    first call and shared by all callers talking to the same nameserver.
+
+    :param nameserver: The ip address of the nameserver, for example
+        ``127.0.0.1``.
+    :param port: The port of the nameserver.
+    :param size: The maximum number of idle connections kept open.
+        ``None`` keeps the current size of an existing pool.
+    :param idle_timeout: Connections that have not been used for this number
+        of seconds are closed. ``None`` keeps the current timeout of an
+        existing pool.
+    :param keepalive: Negotiate the idle timeout with the nameserver.
+        ``None`` keeps the current setting of an existing pool.
+    """
+    key = (nameserver, port)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(nameserver, port)
+            _pools[key] = pool
+        if size is not None:
+            pool.size = size
+        if idle_timeout is not None:
+            pool.idle_timeout = idle_timeout
+        if keepalive is not None:
+            pool.keepalive = keepalive
+        return pool
+
+
+def get_async_pool(
+    nameserver: str,
+    port: int,
+    size: int | None = None,
+    idle_timeout: float | None = None,
+    keepalive: bool | None = None,
+) -> AsyncConnectionPool:
+    """The asyncio counterpart of :func:`get_pool`."""
+    key = (nameserver, port)
+    with _pools_lock:
+        pool = _async_pools.get(key)
+        if pool is None:
+            pool = AsyncConnectionPool(nameserver, port)
+            _async_pools[key] = pool
+        if size is not None:
+            pool.size = size
+        if idle_timeout is not None:
+            pool.idle_timeout = idle_timeout
+        if keepalive is not None:
+            pool.keepalive = keepalive
+        return pool
+
+
+def get_pool_stats() -> dict[str, PoolStats]:
+    """:return: The counters of all pools, keyed by ``nameserver:port``. The
+    asyncio pools are suffixed with `` (async)``."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        async_pools = list(_async_pools.values())
+    stats = {f"{pool.nameserver}:{pool.port}": pool.stats for pool in pools}
+    for async_pool in async_pools:
+        stats[f"{async_pool.nameserver}:{async_pool.port} (async)"] = async_pool.stats
+    return stats
+
+
+def format_pool_stats(stats: dict[str, PoolStats]) -> str:
+    """:param stats: The counters by pool, see :func:`get_pool_stats`."""
+    return "".join(
+        f"connection pool {name} created={pool.created} reused={pool.reused} "
+        f"reconnects={pool.reconnects} expired={pool.expired} "
+        f"discarded={pool.discarded} idle={pool.idle} in_use={pool.in_use}\n"
+        for name, pool in stats.items()
+    )
+
+
+def close_pools() -> None:
+    """Close the idle connections of all blocking pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,327 @@
+"""Expose the metrics in the Prometheus text format.
+
+The metrics are flattened to samples, a mapping of the series (the metric
+name and the labels, e. g. ``dyndns_requests_total{route="check",status="200"}``)
+to its value. All metrics are counters or histograms, so the samples of
+several worker processes are simply added up. Each process writes its
+samples to a file in a shared directory (:class:`MetricsDirectory`) and a
+scrape of any process answers the sum of all files.
+
+https://prometheus.io/docs/instrumenting/exposition_formats/"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+from dyndns.log import LogLevel, logger
+from dyndns.metrics import DnsMetricsStats, HistogramStats, RequestMetricsStats
+
+Samples = dict[str, float]
+"""The value of each series."""
+
+MetricType = Literal["counter", "histogram"]
+
+FAMILIES: dict[str, tuple[MetricType, str]] = {
+    "dyndns_requests_total": (
+        "counter",
+        "The HTTP requests by route and status code.",
+    ),
+    "dyndns_request_duration_seconds": (
+        "histogram",
+        "The time spent answering the HTTP requests by route.",
+    ),
+    "dyndns_errors_total": (
+        "counter",
+        "The failed HTTP requests by exception class.",
+    ),
+    "dyndns_updates_total": (
+        "counter",
+        "The updated and unchanged domain names.",
+    ),
+    "dyndns_dns_latency_seconds": (
+        "histogram",
+        "The latency of the DNS operations by zone and operation.",
+    ),
+    "dyndns_dns_timeouts_total": (
+        "counter",
+        "The queries a nameserver didn’t answer in time.",
+    ),
+    "dyndns_dns_bad_keys_total": (
+        "counter",
+        "The queries a nameserver rejected because of the TSIG key.",
+    ),
+    "dyndns_dns_errors_total": (
+        "counter",
+        "The failed queries, including the timeouts and the bad keys.",
+    ),
+    "dyndns_dns_sent_bytes_total": (
+        "counter",
+        "The bytes sent to the nameservers over TCP.",
+    ),
+    "dyndns_dns_received_bytes_total": (
+        "counter",
+        "The bytes received from the nameservers over TCP.",
+    ),
+}
+"""The type and the help text of each metric."""
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name: str, **labels: str) -> str:
+    if not labels:
+        return name
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return f"{name}{{{pairs}}}"
+
+
+def _add_histogram(
+    samples: Samples, name: str, stats: HistogramStats, **labels: str
+) -> None:
+    cumulative = 0
+    for bound, count in zip(stats.buckets, stats.counts):
+        cumulative += count
+        samples[_series(f"{name}_bucket", **labels, le=str(bound))] = cumulative
+    samples[_series(f"{name}_bucket", **labels, le="+Inf")] = stats.count
+    samples[_series(f"{name}_sum", **labels)] = stats.sum
+    samples[_series(f"{name}_count", **labels)] = stats.count
+
+
+def request_samples(stats: RequestMetricsStats) -> Samples:
+    samples: Samples = {}
+    for (route, status_code), count in stats.requests.items():
+        samples[
+            _series("dyndns_requests_total", route=route, status=str(status_code))
+        ] = count
+    for route, histogram in stats.latency.items():
+        _add_histogram(
+            samples, "dyndns_request_duration_seconds", histogram, route=route
+        )
+    for error, count in stats.errors.items():
+        samples[_series("dyndns_errors_total", error=error)] = count
+    for result, count in stats.updates.items():
+        samples[_series("dyndns_updates_total", result=result)] = count
+    return samples
+
+
+def dns_samples(stats: list[DnsMetricsStats]) -> Samples:
+    samples: Samples = {}
+    for zone in stats:
+        for operation, histogram in zone.latency.items():
+            _add_histogram(
+                samples,
+                "dyndns_dns_latency_seconds",
+                histogram,
+                zone=zone.zone,
+                operation=operation,
+            )
+        for name, value in (
+            ("dyndns_dns_timeouts_total", zone.timeouts),
+            ("dyndns_dns_bad_keys_total", zone.bad_keys),
+            ("dyndns_dns_errors_total", zone.errors),
+            ("dyndns_dns_sent_bytes_total", zone.bytes_sent),
+            ("dyndns_dns_received_bytes_total", zone.bytes_received),
+        ):
+            samples[_series(name, zone=zone.zone)] = value
+    return samples
+
+
+def add_samples(total: Samples, samples: Samples) -> None:
+    for series, value in samples.items():
+        total[series] = total.get(series, 0) + value
+
+
+def _family(series: str) -> str:
+    name = series.split("{", 1)[0]
+    if name in FAMILIES:
+        return name
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in FAMILIES:
+            return name[: -len(suffix)]
+    return name
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_prometheus(samples: Samples) -> str:
+    """:return: The samples grouped by metric with ``# HELP`` and
+    ``# TYPE`` lines. The series of a metric keep their order, so the
+    buckets of a histogram stay in ascending order."""
+    families: dict[str, list[str]] = {}
+    for series, value in samples.items():
+        families.setdefault(_family(series), []).append(
+            f"{series} {_format_value(value)}"
+        )
+    lines: list[str] = []
+    for family in sorted(families):
+        if family in FAMILIES:
+            metric_type, help_text = FAMILIES[family]
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {metric_type}")
+        lines.extend(families[family])
+    return "".join(f"{line}\n" for line in lines)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process runs as another user.
+        return True
+    return True
+
+
+class MetricsDirectory:
+    """Share the samples of several worker processes through a directory.
+
+    Each process writes its samples to its own file every
+    ``flush_interval`` seconds and when it exits. The files of exited
+    processes are kept while the server runs, so the counters don’t drop
+    when a worker is replaced. The files of processes that no longer run,
+    for example of an earlier start of the server, are removed when the
+    directory is opened. A forked worker counts from zero, see
+    :mod:`dyndns.metrics`, so the counts of the parent process are only
+    in the file of the parent process.
+
+    :param directory: A directory all worker processes can write to.
+    :param collect: Returns the samples of this process.
+    :param flush_interval: Seconds between two writes.
+    """
+
+    directory: Path
+
+    flush_interval: float
+
+    _collect: Callable[[], Samples]
+
+    _flusher: threading.Thread | None
+
+    _flusher_pid: int | None
+
+    _stop: threading.Event
+
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        directory: str | Path,
+        collect: Callable[[], Samples],
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        self.flush_interval = flush_interval
+        self._collect = collect
+        self._flusher = None
+        self._flusher_pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _prune(self) -> None:
+        """Remove the files of the processes that no longer run."""
+        for path in self.directory.glob("dyndns-*.json"):
+            try:
+                pid = int(path.stem.removeprefix("dyndns-"))
+            except ValueError:
+                continue
+            if _is_running(pid):
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.log(
+                    LogLevel.WARNING, f"The metrics file '{path}' was kept: {e}"
+                )
+
+    @property
+    def path(self) -> Path:
+        """The file of this process."""
+        return self.directory / f"dyndns-{os.getpid()}.json"
+
+    def flush(self) -> None:
+        """Write the samples of this process. The file is replaced
+        atomically, so a reader never sees a partial file."""
+        path = self.path
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".dyndns-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(self._collect(), file)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def aggregate(self, samples: Samples) -> Samples:
+        """:param samples: The current samples of this process. They replace
+            the file of this process, which may be outdated.
+
+        :return: The sum of the samples of all processes."""
+        total = dict(samples)
+        own = self.path
+        for path in sorted(self.directory.glob("dyndns-*.json")):
+            if path == own:
+                continue
+            try:
+                add_samples(total, json.loads(path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.log(
+                    LogLevel.WARNING, f"The metrics file '{path}' was skipped: {e}"
+                )
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.log(LogLevel.WARNING, f"The metrics could not be written: {e}")
+
+    def start(self) -> MetricsDirectory:
+        """Start the thread that writes the samples. After a fork (for
+        example by uWSGI) the thread of the parent process doesn’t exist in
+        the child process, so the thread is started again."""
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            return self
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid():
+                return self
+            if self._flusher is None:
+                atexit.register(self._flush_at_exit)
+            self._stop = threading.Event()
+            self._flusher = threading.Thread(
+                target=self._run, name="dyndns-metrics", daemon=True
+            )
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+        return self
+
+    def _flush_at_exit(self) -> None:
+        if self._flusher is not None and self._flusher_pid == os.getpid():
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        """Stop the thread and write the samples a last time."""
+        self._stop.set()
+        self._flush_at_exit()
+        self._flusher = None
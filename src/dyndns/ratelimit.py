@@ -0,0 +1,285 @@
+"""Limit the request rate of the clients by token buckets.
+
+Each client address, each domain name and each secret has a bucket that
+holds up to ``burst`` tokens and is refilled by ``rate`` tokens per second.
+A request takes one token of each of its buckets. If a bucket is empty the
+request is rejected before any DNS work is done.
+
+A bucket that has been idle long enough to be full again is the same as a
+missing bucket, so idle buckets are dropped and the number of buckets is
+bounded. The buckets live in memory or, to share them between several
+worker processes, in a SQLite database file."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+
+from dyndns.config import RateLimitConfig, TokenBucketConfig
+from dyndns.exceptions import RateLimitError
+
+BucketKind = Literal["client", "fqdn", "secret"]
+
+Bucket = tuple[float, float]
+"""The number of tokens and the time they were counted."""
+
+
+@dataclass
+class RateLimitStats:
+    allowed: int = 0
+    """The checks that found a token in each of their buckets. An update
+    is checked before and after the authentication."""
+
+    rejected: dict[str, int] = field(default_factory=dict)
+    """The rejected requests by the kind of the empty bucket."""
+
+
+def _refill(bucket: Bucket | None, limit: TokenBucketConfig, now: float) -> float:
+    """:return: The tokens of a bucket at the time ``now``."""
+    if bucket is None:
+        return float(limit.burst)
+    tokens, updated = bucket
+    return min(float(limit.burst), tokens + max(0.0, now - updated) * limit.rate)
+
+
+def _idle_time(limit: TokenBucketConfig) -> float:
+    """:return: The seconds after which an empty bucket is full again."""
+    return limit.burst / limit.rate
+
+
+class MemoryBucketStore:
+    """The buckets of one process, least recently used first.
+
+    :param size: The maximum number of buckets. The least recently used
+        bucket is dropped, which at worst lets its next request pass.
+    """
+
+    size: int
+
+    clock: Callable[[], float]
+
+    _buckets: OrderedDict[str, Bucket]
+
+    _lock: threading.Lock
+
+    def __init__(self, size: int = 10000) -> None:
+        self.size = size
+        self.clock = time.monotonic
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(
+        self, keys: list[tuple[str, TokenBucketConfig]], max_idle: float
+    ) -> list[float]:
+        """Take one token of each bucket if none of them is empty.
+
+        :return: The seconds until each bucket holds a token again, ``0``
+            for the buckets that had a token."""
+        with self._lock:
+            now = self.clock()
+            self._expire(now - max_idle)
+            tokens = [
+                _refill(self._buckets.get(key), limit, now) for key, limit in keys
+            ]
+            waits = [
+                max(0.0, (1 - count) / limit.rate)
+                for count, (_, limit) in zip(tokens, keys)
+            ]
+            if not any(waits):
+                for count, (key, _) in zip(tokens, keys):
+                    self._buckets[key] = (count - 1, now)
+                    self._buckets.move_to_end(key)
+                while len(self._buckets) > self.size:
+                    self._buckets.popitem(last=False)
+            return waits
+
+    def _expire(self, before: float) -> None:
+        # The least recently used buckets come first.
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if updated > before:
+                break
+            del self._buckets[key]
+
+
+class SqliteBucketStore:
+    """The buckets in a SQLite database shared by several processes.
+
+    :param path: The database file. It is created if it doesn’t exist.
+    :param size: The maximum number of buckets.
+    """
+
+    path: Path
+
+    size: int
+
+    clock: Callable[[], float]
+    """The wall clock, the processes don’t share a monotonic clock."""
+
+    _connections: threading.local
+    """The connection of each thread together with the process ID that
+    opened it."""
+
+    _calls: int
+
+    def __init__(self, path: str | Path, size: int = 10000) -> None:
+        self.path = Path(path)
+        self.size = size
+        self.clock = time.time
+        self._connections = threading.local()
+        self._calls = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection per thread. A connection must not be used
+        across a fork (for example by uWSGI or a preloading Gunicorn), so the
+        child process opens its own connection and leaves the connection of
+        the parent process alone."""
+        connection: sqlite3.Connection | None = getattr(
+            self._connections, "connection", None
+        )
+        if connection is None or self._connections.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._connections.connection = connection
+            self._connections.pid = os.getpid()
+        return connection
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def take(
+        self, keys: list[tuple[str, TokenBucketConfig]], max_idle: float
+    ) -> list[float]:
+        """:see: :meth:`MemoryBucketStore.take`"""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            tokens: list[float] = []
+            for key, limit in keys:
+                row = connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens.append(_refill(row, limit, now))
+            waits = [
+                max(0.0, (1 - count) / limit.rate)
+                for count, (_, limit) in zip(tokens, keys)
+            ]
+            if not any(waits):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                    [(key, count - 1, now) for count, (key, _) in zip(tokens, keys)],
+                )
+            self._calls += 1
+            if self._calls % 100 == 0:
+                self._expire(connection, now - max_idle)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return waits
+
+    def _expire(self, connection: sqlite3.Connection, before: float) -> None:
+        connection.execute("DELETE FROM buckets WHERE updated <= ?", (before,))
+        connection.execute(
+            "DELETE FROM buckets WHERE key IN (SELECT key FROM buckets "
+            "ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (self.size,),
+        )
+
+
+class RateLimiter:
+    """Check the requests against the buckets of their client address,
+    domain name and secret."""
+
+    config: RateLimitConfig
+
+    store: MemoryBucketStore | SqliteBucketStore
+
+    _max_idle: float
+    """The idle time after which every bucket is full again."""
+
+    _stats: RateLimitStats
+
+    _stats_lock: threading.Lock
+
+    def __init__(self, config: RateLimitConfig) -> None:
+        self.config = config
+        self._max_idle = max(
+            (
+                _idle_time(limit)
+                for limit in (config.client, config.fqdn, config.secret)
+                if limit.rate > 0
+            ),
+            default=0.0,
+        )
+        if config.store is None:
+            self.store = MemoryBucketStore(config.size)
+        else:
+            self.store = SqliteBucketStore(config.store, config.size)
+        self._stats = RateLimitStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self) -> RateLimitStats:
+        with self._stats_lock:
+            return RateLimitStats(self._stats.allowed, dict(self._stats.rejected))
+
+    def _keys(
+        self, client: str | None, fqdn: str | None, secret: str | None
+    ) -> list[tuple[BucketKind, str, TokenBucketConfig]]:
+        keys: list[tuple[BucketKind, str, TokenBucketConfig]] = []
+        if client:
+            keys.append(("client", client, self.config.client))
+        if fqdn:
+            keys.append(("fqdn", fqdn.lower().rstrip("."), self.config.fqdn))
+        if secret:
+            # The secrets are not kept in memory or written to the store.
+            digest = hashlib.sha256(secret.encode()).hexdigest()[:32]
+            keys.append(("secret", digest, self.config.secret))
+        return [key for key in keys if key[2].rate > 0]
+
+    def check(
+        self,
+        client: str | None = None,
+        fqdn: str | None = None,
+        secret: str | None = None,
+    ) -> None:
+        """Take a token of the bucket of each given key.
+
+        :raises RateLimitError: If one of the buckets is empty. No token is
+            taken in that case."""
+        keys = self._keys(client, fqdn, secret)
+        if not keys:
+            return
+        waits = self.store.take(
+            [(f"{kind}:{key}", limit) for kind, key, limit in keys], self._max_idle
+        )
+        wait, kind = max(zip(waits, (kind for kind, _, _ in keys)))
+        with self._stats_lock:
+            if wait == 0:
+                self._stats.allowed += 1
+                return
+            self._stats.rejected[kind] = self._stats.rejected.get(kind, 0) + 1
+        raise RateLimitError(
+            f"Too many requests for this {kind.replace('fqdn', 'domain name')}. "
+            f"Retry in {wait:.1f} seconds.",
+            retry_after=wait,
+        )
@@ -0,0 +1,368 @@
+"""Keep a copy of the address records of a zone in memory. The copy is loaded
+by a full zone transfer (AXFR) and kept up to date by incremental zone
+transfers (IXFR)."""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections.abc import Iterator
+
+import dns.exception
+import dns.ipv4
+import dns.ipv6
+import dns.name
+import dns.query
+import dns.rdatatype
+import dns.rrset
+import dns.tsig
+
+from dyndns.config import RecordType
+from dyndns.log import LogLevel, logger
+
+_ADDRESS_LENGTHS: dict[dns.rdatatype.RdataType, int] = {
+    dns.rdatatype.A: 4,
+    dns.rdatatype.AAAA: 16,
+}
+
+
+def _pack(rdtype: dns.rdatatype.RdataType, address: str) -> bytes:
+    if rdtype == dns.rdatatype.A:
+        return dns.ipv4.inet_aton(address)
+    return dns.ipv6.inet_aton(address)
+
+
+def _unpack(rdtype: dns.rdatatype.RdataType, packed: bytes) -> str:
+    if rdtype == dns.rdatatype.A:
+        return dns.ipv4.inet_ntoa(packed)
+    return dns.ipv6.inet_ntoa(packed)
+
+
+class ZoneShadow:
+    """An in-memory copy of the ``A`` and ``AAAA`` records of a zone.
+
+    The addresses of a name are stored packed (4 bytes per IPv4 and 16 bytes
+    per IPv6 address) in one :class:`bytes` object per record type, keyed by
+    the lower case record name relative to the zone. 100,000 names with an
+    IPv4 and an IPv6 address need about 25 MB.
+
+    :param zone_name: The zone name (e. g. ``example.com.``).
+    :param nameserver: The ip address of the nameserver, for example
+        ``127.0.0.1``.
+    :param port: The port of the nameserver.
+    :param keyring: The TSIG keyring of the zone.
+    :param keyalgorithm: The TSIG algorithm.
+    :param timeout: Seconds to wait for each message of a transfer.
+    """
+
+    origin: dns.name.Name
+
+    serial: int | None
+    """The SOA serial of the copy. ``None`` if the zone is not loaded yet."""
+
+    refresh_interval: float | None
+    """Seconds between two IXFR polls. ``None`` disables polling."""
+
+    _suffix: str
+    """The lower case zone name with a leading dot, for example
+    ``.example.com.``."""
+
+    _records: dict[dns.rdatatype.RdataType, dict[str, bytes]]
+
+    _lock: threading.Lock
+
+    _refresh_lock: threading.Lock
+    """Serializes the refreshes of the polling thread and of NOTIFY
+    messages."""
+
+    _poller: threading.Thread | None
+
+    _poller_pid: int | None
+
+    _stop: threading.Event
+
+    def __init__(
+        self,
+        zone_name: str,
+        nameserver: str,
+        port: int,
+        keyring: dict[dns.name.Name, dns.tsig.Key],
+        keyalgorithm: dns.name.Name | str = dns.tsig.HMAC_SHA512,
+        timeout: float = 10.0,
+    ) -> None:
+        self.origin = dns.name.from_text(zone_name)
+        self.serial = None
+        self.refresh_interval = None
+        self._nameserver = nameserver
+        self._port = port
+        self._keyring = keyring
+        self._keyalgorithm = keyalgorithm
+        self._timeout = timeout
+        self._suffix = "." + self.origin.to_text().lower()
+        self._records = {rdtype: {} for rdtype in _ADDRESS_LENGTHS}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._poller = None
+        self._poller_pid = None
+        self._stop = threading.Event()
+
+    @property
+    def loaded(self) -> bool:
+        return self.serial is not None
+
+    def __len__(self) -> int:
+        return len(
+            set(self._records[dns.rdatatype.A]) | set(self._records[dns.rdatatype.AAAA])
+        )
+
+    @staticmethod
+    def covers(record_type: RecordType) -> bool:
+        """``True`` if records of the given type are shadowed."""
+        return record_type in ("A", "AAAA")
+
+    def _key(self, fqdn: str) -> str:
+        fqdn = fqdn.lower()
+        if fqdn.endswith(self._suffix):
+            # Both record types share the same key object.
+            return sys.intern(fqdn[: -len(self._suffix)])
+        return "@"
+
+    def _key_from_name(self, name: dns.name.Name) -> str:
+        return self._key(name.to_text())
+
+    def get(self, fqdn: str, record_type: RecordType) -> str | None:
+        """
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param record_type: ``A`` or ``AAAA``.
+
+        :return: The first address of the name or ``None``.
+        """
+        self._ensure_poller()
+        rdtype = dns.rdatatype.from_text(record_type)
+        packed = self._records[rdtype].get(self._key(fqdn))
+        if not packed:
+            return None
+        return _unpack(rdtype, packed[: _ADDRESS_LENGTHS[rdtype]])
+
+    def set(self, fqdn: str, record_type: RecordType, content: str | None) -> None:
+        """Store the result of an update that was committed by dyndns.
+
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param record_type: ``A`` or ``AAAA``.
+        :param content: The new address or ``None`` if the records were
+            deleted.
+        """
+        rdtype = dns.rdatatype.from_text(record_type)
+        key = self._key(fqdn)
+        with self._lock:
+            if content is None:
+                self._records[rdtype].pop(key, None)
+            else:
+                self._records[rdtype][key] = _pack(rdtype, content)
+
+    def add(self, fqdn: str, record_type: RecordType, content: str) -> None:
+        """Store an address that was added to the existing addresses of a
+        name by dyndns.
+
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param record_type: ``A`` or ``AAAA``.
+        """
+        with self._lock:
+            self._change(
+                dns.rdatatype.from_text(record_type), self._key(fqdn), [content], False
+            )
+
+    def _transfer(
+        self, rdtype: dns.rdatatype.RdataType, serial: int = 0
+    ) -> Iterator[dns.rrset.RRset]:
+        messages = dns.query.xfr(
+            self._nameserver,
+            self.origin,
+            rdtype=rdtype,
+            port=self._port,
+            timeout=self._timeout,
+            lifetime=self._timeout * 6,
+            keyring=self._keyring,
+            keyname=self.origin,
+            keyalgorithm=self._keyalgorithm,
+            relativize=False,
+            serial=serial,
+        )
+        for message in messages:
+            yield from message.answer
+
+    def _load_rrsets(
+        self, first: dns.rrset.RRset, rrsets: Iterator[dns.rrset.RRset]
+    ) -> None:
+        records: dict[dns.rdatatype.RdataType, dict[str, bytes]] = {
+            rdtype: {} for rdtype in _ADDRESS_LENGTHS
+        }
+        for rrset in rrsets:
+            if rrset.rdtype not in records:
+                continue
+            key = self._key_from_name(rrset.name)
+            packed = records[rrset.rdtype].get(key, b"")
+            for rdata in rrset:
+                packed += _pack(rrset.rdtype, getattr(rdata, "address"))
+            records[rrset.rdtype][key] = packed
+        with self._lock:
+            self._records = records
+            self.serial = first[0].serial
+
+    def _apply_rrsets(
+        self, first: dns.rrset.RRset, rrsets: Iterator[dns.rrset.RRset]
+    ) -> None:
+        """Apply the differences of an incremental zone transfer. The
+        differences are collected first and applied at once, so a failed
+        transfer leaves the copy untouched."""
+        changes: list[tuple[bool, dns.rrset.RRset]] = []
+        deleting = True
+        for rrset in rrsets:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                # Every difference sequence starts with the old SOA record
+                # followed by the deleted records, the new SOA record and the
+                # added records.
+                deleting = not deleting
+                continue
+            if rrset.rdtype in _ADDRESS_LENGTHS:
+                changes.append((deleting, rrset))
+        with self._lock:
+            for deleting, rrset in changes:
+                self._change(
+                    rrset.rdtype,
+                    self._key_from_name(rrset.name),
+                    [getattr(rdata, "address") for rdata in rrset],
+                    deleting,
+                )
+            self.serial = first[0].serial
+
+    def _change(
+        self,
+        rdtype: dns.rdatatype.RdataType,
+        key: str,
+        addresses: list[str],
+        deleting: bool,
+    ) -> None:
+        """Add addresses to or remove addresses from the addresses of a name.
+        Must be called with the lock held."""
+        length = _ADDRESS_LENGTHS[rdtype]
+        records = self._records[rdtype]
+        packed_addresses = records.get(key, b"")
+        chunks = [
+            packed_addresses[i : i + length]
+            for i in range(0, len(packed_addresses), length)
+        ]
+        for address in addresses:
+            packed = _pack(rdtype, address)
+            if deleting and packed in chunks:
+                chunks.remove(packed)
+            elif not deleting and packed not in chunks:
+                chunks.append(packed)
+        if chunks:
+            records[key] = b"".join(chunks)
+        else:
+            records.pop(key, None)
+
+    def load(self) -> None:
+        """Load the whole zone by a full zone transfer (AXFR)."""
+        rrsets = self._transfer(dns.rdatatype.AXFR)
+        first = next(rrsets)
+        self._load_rrsets(first, rrsets)
+
+    def refresh(self) -> bool:
+        """Poll the nameserver by an incremental zone transfer (IXFR) based on
+        the SOA serial of the copy. Loads the whole zone if the copy is not
+        loaded yet.
+
+        :return: ``True`` if the zone has changed.
+        """
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        if self.serial is None:
+            self.load()
+            return True
+        serial = self.serial
+        rrsets = self._transfer(dns.rdatatype.IXFR, serial)
+        first = next(rrsets)
+        if first[0].serial == serial:
+            for _ in rrsets:
+                pass
+            return False
+        second = next(rrsets, None)
+        if second is None:
+            # The nameserver answered with the SOA record only.
+            self.load()
+        elif second.rdtype == dns.rdatatype.SOA and second[0].serial != first[0].serial:
+            self._apply_rrsets(first, rrsets)
+        else:
+            self._load_rrsets(first, _chain(second, rrsets))
+        return True
+
+    def invalidate(self) -> None:
+        """Forget the whole copy. It is loaded again by the next refresh."""
+        with self._lock:
+            self.serial = None
+            self._records = {rdtype: {} for rdtype in _ADDRESS_LENGTHS}
+
+    def _poll(self) -> None:
+        assert self.refresh_interval is not None
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except (dns.exception.DNSException, OSError, EOFError) as e:
+                logger.log(
+                    LogLevel.WARNING,
+                    f"The copy of the zone '{self.origin}' could not be refreshed: {e}",
+                )
+
+    def _ensure_poller(self) -> None:
+        """Start the polling thread. After a fork (for example by uWSGI) the
+        thread of the parent process doesn’t exist in the child process, so
+        the thread is started again."""
+        if self.refresh_interval is None:
+            return
+        if self._poller is not None and self._poller_pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller is not None and self._poller_pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            self._poller = threading.Thread(
+                target=self._poll, name=f"dyndns-shadow-{self.origin}", daemon=True
+            )
+            self._poller_pid = os.getpid()
+            self._poller.start()
+
+    def start(self, refresh_interval: float) -> None:
+        """Load the zone and poll the nameserver in a background thread.
+
+        :param refresh_interval: Seconds between two IXFR polls.
+        """
+        self.refresh_interval = refresh_interval
+        try:
+            self.refresh()
+        except (dns.exception.DNSException, OSError, EOFError) as e:
+            logger.log(
+                LogLevel.WARNING,
+                f"The zone '{self.origin}' could not be transferred: {e}",
+            )
+        self._ensure_poller()
+
+    def stop(self) -> None:
+        """Stop the polling thread."""
+        self.refresh_interval = None
+        self._stop.set()
+        self._poller = None
+
+
+def _chain(
+    first: dns.rrset.RRset, rest: Iterator[dns.rrset.RRset]
+) -> Iterator[dns.rrset.RRset]:
+    yield first
+    yield from rest
@@ -0,0 +1,125 @@
+"""Coalesce concurrent identical calls into one.
+
+Misbehaving clients send bursts of the same update. While the first
+update of a burst is in flight, the identical updates wait for it and
+receive its result (or its exception) instead of sending their own update
+messages."""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0
+    """The number of calls that did the work."""
+
+    shared: int = 0
+    """The number of calls that received the result of another call."""
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce identical calls of several threads."""
+
+    _calls: dict[Hashable, concurrent.futures.Future[T]]
+
+    _stats: SingleFlightStats
+
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self._calls = {}
+        self._stats = SingleFlightStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return SingleFlightStats(self._stats.calls, self._stats.shared)
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """Call ``function`` unless a call with the same key is in flight.
+        In that case wait for it and return its result.
+
+        :raises: The exception of the call in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+                self._stats.calls += 1
+                leader = True
+            else:
+                self._stats.shared += 1
+                leader = False
+        if not leader:
+            return future.result()
+        try:
+            result = function()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key: Hashable) -> None:
+        # Calls arriving from now on do the work again.
+        with self._lock:
+            del self._calls[key]
+
+
+class AsyncSingleFlight(Generic[T]):
+    """Coalesce identical calls of several tasks of an event loop."""
+
+    _calls: dict[Hashable, asyncio.Future[T]]
+
+    _stats: SingleFlightStats
+
+    def __init__(self) -> None:
+        self._calls = {}
+        self._stats = SingleFlightStats()
+
+    @property
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(self._stats.calls, self._stats.shared)
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """:see: :meth:`SingleFlight.do`"""
+        loop = asyncio.get_running_loop()
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is loop:
+            self._stats.shared += 1
+            # A cancelled waiter must not cancel the call in flight.
+            return await asyncio.shield(future)
+        future = loop.create_future()
+        self._calls[key] = future
+        self._stats.calls += 1
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            self._finish(key, future)
+            future.cancel()
+            raise
+        except BaseException as e:
+            self._finish(key, future)
+            future.set_exception(e)
+            # Mark the exception as retrieved if nobody waits for it.
+            future.exception()
+            raise
+        self._finish(key, future)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key: Hashable, future: asyncio.Future[T]) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,81 @@
+"""Prepare the TSIG keys of the zones and measure the cost of signing.
+
+Each key is decoded once when the zone is configured. The resulting
+:class:`dns.tsig.Key` object is shared by all messages of the zone, so
+signing a message doesn’t decode the key again."""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from typing import get_args
+
+import dns.name
+import dns.tsig
+import dns.update
+
+from dyndns.config import TsigAlgorithm
+
+TSIG_ALGORITHMS: dict[TsigAlgorithm, dns.name.Name] = {
+    "hmac-sha256": dns.tsig.HMAC_SHA256,
+    "hmac-sha384": dns.tsig.HMAC_SHA384,
+    "hmac-sha512": dns.tsig.HMAC_SHA512,
+}
+
+
+def create_key(
+    zone_name: str, secret: str, algorithm: TsigAlgorithm = "hmac-sha512"
+) -> dns.tsig.Key:
+    """
+    :param zone_name: The zone name (e. g. ``example.com.``), which is the
+        name of the key.
+    :param secret: The base64 encoded secret (e. g. ``tPyvZA==``).
+    :param algorithm: The name of the algorithm (e. g. ``hmac-sha512``).
+    """
+    return dns.tsig.Key(zone_name, secret, TSIG_ALGORITHMS[algorithm])
+
+
+@dataclass
+class SigningBenchmark:
+    """The time to render a small update message with and without a TSIG
+    signature."""
+
+    algorithm: TsigAlgorithm
+
+    signed: float
+    """Seconds per signed message."""
+
+    unsigned: float
+    """Seconds per unsigned message."""
+
+    @property
+    def signing(self) -> float:
+        """Seconds spent on the signature per message."""
+        return self.signed - self.unsigned
+
+
+def _time_rendering(message: dns.update.UpdateMessage, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        message.to_wire()
+    return (time.perf_counter() - start) / count
+
+
+def benchmark_signing(count: int = 10000) -> list[SigningBenchmark]:
+    """Render a typical dynamic DNS update (replace the ``A`` record of one
+    name) ``count`` times per algorithm.
+
+    :return: The time per message for each algorithm."""
+    results: list[SigningBenchmark] = []
+    for algorithm in get_args(TsigAlgorithm):
+        message = dns.update.UpdateMessage("example.com.")
+        message.delete("dyndns.example.com.", "A")
+        message.add("dyndns.example.com.", 300, "A", "192.0.2.1")
+        unsigned = _time_rendering(message, count)
+        key = dns.tsig.Key("example.com.", os.urandom(64), TSIG_ALGORITHMS[algorithm])
+        message.use_tsig(key)
+        results.append(
+            SigningBenchmark(algorithm, _time_rendering(message, count), unsigned)
+        )
+    return results
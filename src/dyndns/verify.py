@@ -0,0 +1,233 @@
+"""Verify that the nameserver serves the records written by dyndns.
+
+The nameserver confirms every update with ``NOERROR``. Reading the records
+back costs a further round trip per record, so it is optional:
+
+* ``trust``: The ``NOERROR`` answer is trusted, nothing is read back.
+* ``sync``: The records are read back before the update returns.
+* ``async``: A sample of the written records is read back by a background
+  thread. The update returns without waiting for the verification."""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+
+from dyndns.config import RecordType, VerificationMode
+from dyndns.log import LogLevel, logger
+
+RecordReader = Callable[[str, RecordType], "str | None"]
+
+
+@dataclass
+class VerifierStats:
+    """Counters of a :class:`Verifier`."""
+
+    verified: int = 0
+    """The number of records read back."""
+
+    mismatches: int = 0
+    """The number of records read back with a content other than the written
+    content."""
+
+    dropped: int = 0
+    """The number of sampled records that were not read back because too
+    many records were waiting for verification."""
+
+    errors: int = 0
+    """The number of records that could not be read back."""
+
+
+@dataclass
+class PendingVerification:
+    fqdn: str
+
+    record_type: RecordType
+
+    expected: str | None
+
+    due: float
+    """The monotonic time the record is read back."""
+
+
+class Verifier:
+    """The verification of the written records of one zone.
+
+    :param mode: ``trust``, ``sync`` or ``async``.
+    :param sample_rate: The share of the written records that are read back
+        in the ``async`` mode.
+    :param delay: Seconds between the update and the read in the ``async``
+        mode.
+    :param max_pending: The maximum number of records waiting for
+        verification in the ``async`` mode. Further records are dropped.
+    """
+
+    mode: VerificationMode
+
+    sample_rate: float
+
+    delay: float
+
+    max_pending: int
+
+    _read: RecordReader | None
+    """Reads a record from the nameserver, see :meth:`attach`."""
+
+    _pending: deque[PendingVerification]
+
+    _condition: threading.Condition
+
+    _worker: threading.Thread | None
+
+    _worker_pid: int | None
+
+    _closed: bool
+
+    _stats: VerifierStats
+
+    def __init__(
+        self,
+        mode: VerificationMode = "trust",
+        sample_rate: float = 1.0,
+        delay: float = 0.5,
+        max_pending: int = 1000,
+    ) -> None:
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.delay = delay
+        self.max_pending = max_pending
+        self._read = None
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self._stats = VerifierStats()
+
+    def attach(self, read: RecordReader) -> None:
+        """:param read: Reads a record from the nameserver without asking
+        the cache."""
+        self._read = read
+
+    @property
+    def stats(self) -> VerifierStats:
+        """A snapshot of the verification counters."""
+        with self._condition:
+            return replace(self._stats)
+
+    def compare(
+        self,
+        fqdn: str,
+        record_type: RecordType,
+        expected: str | None,
+        actual: str | None,
+    ) -> bool:
+        """Count a read back record and log a mismatch.
+
+        :return: ``True`` if the record has the written content."""
+        with self._condition:
+            self._stats.verified += 1
+            if expected == actual:
+                return True
+            self._stats.mismatches += 1
+        logger.log(
+            LogLevel.WARNING,
+            f"The verification of '{fqdn}' {record_type} failed: "
+            f"'{expected}' was written, but the nameserver serves '{actual}'.",
+        )
+        return False
+
+    def count_error(self) -> None:
+        with self._condition:
+            self._stats.errors += 1
+
+    def count_dropped(self) -> None:
+        with self._condition:
+            self._stats.dropped += 1
+
+    def sample(self) -> bool:
+        """``True`` if a written record is read back in the ``async``
+        mode."""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread, again after a fork. Must be called with
+        the condition held."""
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        self._pending.clear()
+        self._worker = threading.Thread(
+            target=self._run, name="dyndns-verifier", daemon=True
+        )
+        self._worker_pid = os.getpid()
+        self._worker.start()
+
+    def submit(self, fqdn: str, record_type: RecordType, expected: str | None) -> None:
+        """Queue a written record for the background verification if it is
+        sampled."""
+        if not self.sample():
+            return
+        with self._condition:
+            if self._closed:
+                return
+            self._ensure_worker()
+            if len(self._pending) >= self.max_pending:
+                self._stats.dropped += 1
+                return
+            self._pending.append(
+                PendingVerification(
+                    fqdn, record_type, expected, time.monotonic() + self.delay
+                )
+            )
+            self._condition.notify()
+
+    def _take(self) -> PendingVerification | None:
+        """Wait until the oldest record is due.
+
+        :return: The record or ``None`` if the verifier is closed."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if self._pending:
+                    remaining = self._pending[0].due - time.monotonic()
+                    if remaining <= 0:
+                        return self._pending.popleft()
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+
+    def _run(self) -> None:
+        while True:
+            pending = self._take()
+            if pending is None:
+                return
+            assert self._read is not None
+            try:
+                actual = self._read(pending.fqdn, pending.record_type)
+            except Exception as e:
+                self.count_error()
+                logger.log(
+                    LogLevel.WARNING,
+                    f"The verification of '{pending.fqdn}' "
+                    f"{pending.record_type} failed: {e}",
+                )
+                continue
+            self.compare(
+                pending.fqdn, pending.record_type, pending.expected, actual
+            )
+
+    def close(self) -> None:
+        """Stop the worker thread. Records waiting for verification are
+        dropped."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None and self._worker_pid == os.getpid():
+            worker.join()
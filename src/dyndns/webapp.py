@@ -1,17 +1,40 @@
-"""Initialize the Flask app."""
+"""Initialize the Flask app and its ASGI counterpart."""
 
 from __future__ import annotations
 
 import logging
+import math
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
 from importlib.metadata import version as get_version
-from typing import Any, Optional
+from typing import Any, Optional, TypeVar
+from urllib.parse import parse_qsl
 
 import flask
 from pydantic import BaseModel, ConfigDict, ValidationError
 from pydantic_core import ErrorDetails
+from werkzeug.routing import Map, Rule
 
-from dyndns.environment import ConfiguredEnvironment
-from dyndns.exceptions import ParameterError
+from dyndns.batch import format_batch_results, parse_batch
+from dyndns.checker import CheckResult
+from dyndns.config import CheckMode
+from dyndns.environment import AsyncConfiguredEnvironment, ConfiguredEnvironment
+from dyndns.exceptions import ParameterError, RateLimitError
+from dyndns.locks import format_lock_stats
+from dyndns.metrics import format_metrics
+from dyndns.pool import format_pool_stats, get_pool_stats
+from dyndns.prometheus import CONTENT_TYPE
+
+AsgiScope = dict[str, Any]
+
+AsgiReceive = Callable[[], Awaitable[dict[str, Any]]]
+
+AsgiSend = Callable[[dict[str, Any]], Awaitable[None]]
+
+AsgiApp = Callable[[AsgiScope, AsgiReceive, AsgiSend], Awaitable[None]]
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
 
 class UpdateQueryParams(BaseModel):
@@ -27,6 +50,74 @@ class UpdateQueryParams(BaseModel):
     ttl: int = 300
 
 
+class CheckQueryParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    mode: Optional[CheckMode] = None
+
+
+def validate_query_params(model: type[ModelT], args: Any) -> ModelT:
+    try:
+        return model(**args)
+    except ValidationError as e:
+        error: ErrorDetails = e.errors(include_url=False)[0]
+        raise ParameterError(
+            "{}: {} ({}).".format(error["type"], error["msg"], error["input"])
+        )
+
+
+def query_fqdn(args: Mapping[str, str]) -> str | None:
+    """:return: The domain name of the query string of an update as far as
+    it can be told before the zone of the name is looked up."""
+    if args.get("fqdn"):
+        return args["fqdn"]
+    if args.get("record_name") and args.get("zone_name"):
+        return f"{args['record_name']}.{args['zone_name']}"
+    return None
+
+
+def handle_exception(e: Exception) -> tuple[str, int, dict[str, str]]:
+    """:return: The response body, the HTTP status code and the additional
+    headers of an error."""
+    # https://www.iana.org/assignments/http-status-codes/http-status-codes.xhtml
+    status_code: int = 500
+    if hasattr(e, "status_code"):
+        status_code = getattr(e, "status_code")
+    else:
+        status_code = 500
+
+    log_level: str
+    if hasattr(e, "log_level"):
+        log_level = getattr(e, "log_level").name
+    else:
+        log_level = e.__class__.__name__.upper()
+
+    headers: dict[str, str] = {}
+    if isinstance(e, RateLimitError):
+        headers["Retry-After"] = str(max(1, math.ceil(e.retry_after)))
+
+    return f"{log_level}: {e}\n", status_code, headers
+
+
+def check_response(result: CheckResult) -> tuple[str, int, dict[str, str]]:
+    """:return: The response body, the HTTP status code and the additional
+    headers of the result of a background check. The ``Age`` header and
+    the last line tell how old the result is."""
+    text: str
+    status_code: int
+    headers: dict[str, str]
+    if result.error is None:
+        text, status_code, headers = result.output, 200, {}
+    else:
+        text, status_code, headers = handle_exception(result.error)
+    age = result.age
+    headers["Age"] = str(int(age))
+    return (
+        f"{text.rstrip()}\nThe zones were checked {age:.1f} seconds ago.\n",
+        status_code,
+        headers,
+    )
+
+
 def create_app(env: ConfiguredEnvironment) -> flask.Flask:
     app = flask.Flask(__name__)
 
@@ -34,30 +125,59 @@ def create_app(env: ConfiguredEnvironment) -> flask.Flask:
     # log.disabled = True
     log.setLevel(logging.WARNING)
 
-    @app.errorhandler(Exception)
-    def handle_exception(e: Exception) -> tuple[str, int]:
-        # https://www.iana.org/assignments/http-status-codes/http-status-codes.xhtml
-        status_code: int = 500
-        if hasattr(e, "status_code"):
-            status_code = getattr(e, "status_code")
-        else:
-            status_code = 500
+    def handle_error(e: Exception) -> tuple[str, int, dict[str, str]]:
+        env.count_error(e)
+        return handle_exception(e)
+
+    app.register_error_handler(Exception, handle_error)
+
+    if env.checker is not None:
+        env.checker.start()
 
-        log_level: str
-        if hasattr(e, "log_level"):
-            log_level = getattr(e, "log_level").name
-        else:
-            log_level = e.__class__.__name__.upper()
+    @app.before_request
+    def start_timer() -> None:
+        flask.g.start = time.perf_counter()
 
-        return f"{log_level}: {e}\n", status_code
+    @app.after_request
+    def observe_request(response: flask.Response) -> flask.Response:
+        env.observe_request(
+            flask.request.endpoint or "unknown",
+            response.status_code,
+            time.perf_counter() - flask.g.start,
+        )
+        return response
 
     @app.route("/")
     def home() -> str:
         return f"dyndns v{get_version('dyndns')}\n"
 
+    def limit_client() -> None:
+        env.limit_rate(flask.request.remote_addr)
+
+    @app.route("/healthz")
+    def healthz() -> str:
+        return "OK\n"
+
     @app.route("/check")
-    def check() -> str:
-        return env.check()
+    def check() -> str | tuple[str, int, dict[str, str]]:
+        limit_client()
+        params = validate_query_params(CheckQueryParams, flask.request.args.to_dict())
+        result = env.cached_check(params.mode)
+        if result is not None:
+            return check_response(result)
+        return env.check(params.mode)
+
+    @app.route("/stats")
+    def stats() -> str:
+        return (
+            format_metrics(env.metrics())
+            + format_lock_stats(env.lock_stats)
+            + format_pool_stats(get_pool_stats())
+        )
+
+    @app.route("/metrics")
+    def metrics() -> flask.Response:
+        return flask.Response(env.prometheus_metrics(), mimetype=CONTENT_TYPE)
 
     @app.route("/update-by-path/<secret>/<fqdn>")
     @app.route("/update-by-path/<secret>/<fqdn>/<ip_1>")
@@ -65,22 +185,19 @@ def create_app(env: ConfiguredEnvironment) -> flask.Flask:
     def update_by_path(
         secret: str, fqdn: str, ip_1: str | None = None, ip_2: str | None = None
     ) -> str:
+        limit_client()
         env.authenticate(secret)
+        env.limit_rate(fqdn=fqdn, secret=secret)
         return env.update_dns_record(fqdn=fqdn, ip_1=ip_1, ip_2=ip_2)
 
     @app.route("/update-by-query")
     def update_by_query_string() -> str:
-        args: Any = flask.request.args.to_dict()
-
-        try:
-            params = UpdateQueryParams(**args)
-        except ValidationError as e:
-            error: ErrorDetails = e.errors(include_url=False)[0]
-            raise ParameterError(
-                "{}: {} ({}).".format(error["type"], error["msg"], error["input"])
-            )
+        limit_client()
+        args = flask.request.args.to_dict()
+        params = validate_query_params(UpdateQueryParams, args)
 
         env.authenticate(params.secret)
+        env.limit_rate(fqdn=query_fqdn(args), secret=params.secret)
         return env.update_dns_record(
             fqdn=params.fqdn,
             zone_name=params.zone_name,
@@ -92,13 +209,242 @@ def create_app(env: ConfiguredEnvironment) -> flask.Flask:
             ttl=params.ttl,
         )
 
+    @app.route("/update-batch/<secret>", methods=["POST"])
+    def update_batch(secret: str) -> flask.Response:
+        limit_client()
+        env.authenticate(secret)
+        env.limit_rate(secret=secret)
+        results = env.update_dns_records(
+            parse_batch(flask.request.get_data()), flask.request.remote_addr
+        )
+        return flask.Response(
+            format_batch_results(results), mimetype="application/json"
+        )
+
     @app.route("/delete-by-path/<secret>/<fqdn>")
     def delete_by_path(secret: str, fqdn: str) -> str:
+        limit_client()
         env.authenticate(secret)
+        env.limit_rate(fqdn=fqdn, secret=secret)
         return env.delete_dns_record(fqdn=fqdn)
 
     return app
 
 
+class AsgiRequest:
+    """The parts of an ASGI HTTP request the routes need."""
+
+    args: dict[str, str]
+    """The query string. Like ``flask.request.args.to_dict()`` only the
+    first value of a repeated parameter is kept."""
+
+    remote_addr: str | None
+
+    body: bytes
+    """The body of a ``POST`` request."""
+
+    def __init__(self, scope: AsgiScope, body: bytes = b"") -> None:
+        self.body = body
+        self.args = {}
+        query_string: bytes = scope.get("query_string", b"")
+        for key, value in parse_qsl(
+            query_string.decode("utf-8", "replace"), keep_blank_values=True
+        ):
+            self.args.setdefault(key, value)
+        client = scope.get("client")
+        self.remote_addr = client[0] if client else None
+
+
+@dataclass
+class AsgiResponse:
+    """Returned by the routes of :func:`create_asgi_app` that don’t answer
+    with the default content type or status code."""
+
+    body: str
+
+    mimetype: str = "text/html"
+
+    headers: dict[str, str] = field(default_factory=dict)
+
+    status_code: int = 200
+
+
+async def _read_body(receive: AsgiReceive) -> bytes:
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _serve_lifespan(
+    env: AsyncConfiguredEnvironment, receive: AsgiReceive, send: AsgiSend
+) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if env.checker is not None:
+                env.checker.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if env.checker is not None:
+                env.checker.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def create_asgi_app(env: AsyncConfiguredEnvironment) -> AsgiApp:
+    """The routes of :func:`create_app` as an ASGI application.
+
+    The requests are handled on the event loop of the ASGI server and the
+    zones talk to the nameservers by the coroutines of
+    :class:`~dyndns.environment.AsyncConfiguredEnvironment`, so a waiting
+    request doesn’t block a worker thread."""
+
+    async def home(request: AsgiRequest) -> str:
+        return f"dyndns v{get_version('dyndns')}\n"
+
+    async def healthz(request: AsgiRequest) -> str:
+        return "OK\n"
+
+    async def check(request: AsgiRequest) -> str | AsgiResponse:
+        env.limit_rate(request.remote_addr)
+        params = validate_query_params(CheckQueryParams, request.args)
+        result = env.cached_check(params.mode)
+        if result is not None:
+            text, status_code, headers = check_response(result)
+            return AsgiResponse(text, headers=headers, status_code=status_code)
+        return await env.check(params.mode)
+
+    async def stats(request: AsgiRequest) -> str:
+        return (
+            format_metrics(env.metrics())
+            + format_lock_stats(env.lock_stats)
+            + format_pool_stats(get_pool_stats())
+        )
+
+    async def metrics(request: AsgiRequest) -> AsgiResponse:
+        return AsgiResponse(env.prometheus_metrics(), CONTENT_TYPE)
+
+    async def update_by_path(
+        request: AsgiRequest,
+        secret: str,
+        fqdn: str,
+        ip_1: str | None = None,
+        ip_2: str | None = None,
+    ) -> str:
+        env.limit_rate(request.remote_addr)
+        env.authenticate(secret)
+        env.limit_rate(fqdn=fqdn, secret=secret)
+        return await env.update_dns_record(
+            fqdn=fqdn, ip_1=ip_1, ip_2=ip_2, remote_addr=request.remote_addr
+        )
+
+    async def update_by_query_string(request: AsgiRequest) -> str:
+        env.limit_rate(request.remote_addr)
+        params = validate_query_params(UpdateQueryParams, request.args)
+
+        env.authenticate(params.secret)
+        env.limit_rate(fqdn=query_fqdn(request.args), secret=params.secret)
+        return await env.update_dns_record(
+            fqdn=params.fqdn,
+            zone_name=params.zone_name,
+            record_name=params.record_name,
+            ip_1=params.ip_1,
+            ip_2=params.ip_2,
+            ipv4=params.ipv4,
+            ipv6=params.ipv6,
+            ttl=params.ttl,
+            remote_addr=request.remote_addr,
+        )
+
+    async def update_batch(request: AsgiRequest, secret: str) -> AsgiResponse:
+        env.limit_rate(request.remote_addr)
+        env.authenticate(secret)
+        env.limit_rate(secret=secret)
+        results = await env.update_dns_records(
+            parse_batch(request.body), request.remote_addr
+        )
+        return AsgiResponse(format_batch_results(results), "application/json")
+
+    async def delete_by_path(request: AsgiRequest, secret: str, fqdn: str) -> str:
+        env.limit_rate(request.remote_addr)
+        env.authenticate(secret)
+        env.limit_rate(fqdn=fqdn, secret=secret)
+        return await env.delete_dns_record(fqdn=fqdn)
+
+    routes: dict[str, Callable[..., Awaitable[str | AsgiResponse]]] = {
+        "/": home,
+        "/healthz": healthz,
+        "/check": check,
+        "/stats": stats,
+        "/metrics": metrics,
+        "/update-by-path/<secret>/<fqdn>": update_by_path,
+        "/update-by-path/<secret>/<fqdn>/<ip_1>": update_by_path,
+        "/update-by-path/<secret>/<fqdn>/<ip_1>/<ip_2>": update_by_path,
+        "/update-by-query": update_by_query_string,
+        "/delete-by-path/<secret>/<fqdn>": delete_by_path,
+    }
+    url_map = Map(
+        [Rule(path, endpoint=view, methods=["GET"]) for path, view in routes.items()]
+        + [Rule("/update-batch/<secret>", endpoint=update_batch, methods=["POST"])]
+    )
+    urls = url_map.bind("localhost")
+
+    async def app(scope: AsgiScope, receive: AsgiReceive, send: AsgiSend) -> None:
+        if scope["type"] == "lifespan":
+            await _serve_lifespan(env, receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        start = time.perf_counter()
+        route = "unknown"
+        try:
+            view, path_args = urls.match(scope["path"], method=scope["method"])
+            route = view.__name__
+            body = b""
+            if scope["method"] == "POST":
+                body = await _read_body(receive)
+            response = await view(AsgiRequest(scope, body), **path_args)
+            if not isinstance(response, AsgiResponse):
+                response = AsgiResponse(response)
+            status_code = response.status_code
+        except Exception as e:
+            env.count_error(e)
+            text, status_code, headers = handle_exception(e)
+            response = AsgiResponse(text, headers=headers)
+        env.observe_request(route, status_code, time.perf_counter() - start)
+        content = response.body.encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (
+                        b"content-type",
+                        f"{response.mimetype}; charset=utf-8".encode(),
+                    ),
+                    (b"content-length", str(len(content)).encode()),
+                ]
+                + [
+                    (name.lower().encode(), value.encode())
+                    for name, value in response.headers.items()
+                ],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"" if scope["method"] == "HEAD" else content,
+            }
+        )
+
+    return app
+
+
 if __name__ == "__main__":
     create_app(ConfiguredEnvironment()).run()
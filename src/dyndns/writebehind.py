@@ -0,0 +1,297 @@
+"""Merge the updates of many clients into few update messages (write-behind).
+
+The updates of a zone are queued. A background thread waits a short window
+after the first queued update, merges all updates of the window and sends
+them in one TSIG signed update message. The last write per name and record
+type wins. Every caller waits until the batch containing its update is
+committed."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+
+from dyndns.config import RecordType
+from dyndns.dns import Batch, DnsChangeMessage, format_content
+from dyndns.log import LogLevel, logger
+
+BatchCommitter = Callable[[Batch], dict[str, list[DnsChangeMessage]]]
+
+
+@dataclass
+class QueueStats:
+    """Counters of an :class:`UpdateQueue`."""
+
+    submitted: int = 0
+    """The number of updates queued by callers."""
+
+    batches: int = 0
+    """The number of batches sent to the nameserver."""
+
+    coalesced: int = 0
+    """The number of record changes that were overwritten by a later change
+    of the same name and record type within the same batch."""
+
+    failed: int = 0
+    """The number of batches the nameserver didn’t apply."""
+
+    mismatches: int = 0
+    """The number of record changes the verification read back with a
+    content other than the written content."""
+
+
+@dataclass
+class QueuedUpdate:
+    fqdn: str
+
+    records: dict[RecordType, str | None]
+
+    ttl: int
+
+    new: dict[RecordType, str | None]
+    """The content formatted the way the nameserver returns it."""
+
+    future: Future[list[DnsChangeMessage]] = field(default_factory=Future)
+
+
+class UpdateQueue:
+    """The write-behind queue of one zone.
+
+    :param window: Seconds to wait for further updates after the first
+        update of a batch was queued.
+    :param max_changes: A batch is sent as soon as it contains this number of
+        distinct record changes (name and record type). This also bounds the
+        size of the update message.
+    """
+
+    window: float
+
+    max_changes: int
+
+    _commit: BatchCommitter | None
+    """Sends a batch to the nameserver, see :meth:`attach`."""
+
+    _pending: list[QueuedUpdate]
+
+    _keys: set[tuple[str, RecordType]]
+    """The distinct names and record types of the pending updates."""
+
+    _since: float
+    """The time the first pending update was queued."""
+
+    _condition: threading.Condition
+
+    _worker: threading.Thread | None
+
+    _worker_pid: int | None
+
+    _closed: bool
+
+    _stats: QueueStats
+
+    def __init__(self, window: float = 0.05, max_changes: int = 100) -> None:
+        self.window = window
+        self.max_changes = max_changes
+        self._commit = None
+        self._pending = []
+        self._keys = set()
+        self._since = 0.0
+        self._condition = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self._stats = QueueStats()
+
+    def attach(self, commit: BatchCommitter) -> None:
+        """:param commit: Sends a batch in one update message and returns the
+        change messages by fully qualified domain name."""
+        self._commit = commit
+
+    @property
+    def stats(self) -> QueueStats:
+        """A snapshot of the queue counters."""
+        with self._condition:
+            return replace(self._stats)
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread. After a fork (for example by uWSGI) the
+        thread of the parent process doesn’t exist in the child process, so
+        the thread is started again. Must be called with the condition
+        held."""
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        self._pending = []
+        self._keys = set()
+        self._worker = threading.Thread(
+            target=self._run, name="dyndns-write-behind", daemon=True
+        )
+        self._worker_pid = os.getpid()
+        self._worker.start()
+
+    def submit(
+        self, fqdn: str, records: dict[RecordType, str | None], ttl: int = 300
+    ) -> Future[list[DnsChangeMessage]]:
+        """Queue an update.
+
+        :param fqdn: The fully qualified domain name (e. g.
+            ``dyndns.example.com.``).
+        :param records: The new content by record type. ``None`` deletes the
+            records of the given type.
+        :param ttl: Time to live.
+
+        :return: A future that resolves to a change message for each record
+            type in the order of ``records`` once the batch is committed.
+        """
+        # Invalid content raises here and not in the worker thread, so it
+        # can’t spoil the batch of other callers.
+        new = {
+            record_type: None
+            if content is None
+            else format_content(record_type, content)
+            for record_type, content in records.items()
+        }
+        update = QueuedUpdate(fqdn, dict(records), ttl, new)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The update queue is closed.")
+            self._ensure_worker()
+            if not self._pending:
+                self._since = time.monotonic()
+            self._pending.append(update)
+            self._keys.update((fqdn, record_type) for record_type in records)
+            self._stats.submitted += 1
+            self._condition.notify()
+        return update.future
+
+    def _take_batch(self) -> list[QueuedUpdate] | None:
+        """Wait until the window of the pending updates is over or the batch
+        is full.
+
+        :return: The updates of the batch or ``None`` if the queue is
+            closed."""
+        with self._condition:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._condition.wait()
+            while len(self._keys) < self.max_changes and not self._closed:
+                remaining = self._since + self.window - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            # Updates queued while the previous batch was sent may exceed
+            # the limit. They are sent with the next batch without waiting.
+            keys: set[tuple[str, RecordType]] = set()
+            end = 0
+            for end, update in enumerate(self._pending):
+                update_keys = {
+                    (update.fqdn, record_type) for record_type in update.records
+                }
+                if end > 0 and len(keys | update_keys) > self.max_changes:
+                    break
+                keys |= update_keys
+            else:
+                end = len(self._pending)
+            batch = self._pending[:end]
+            self._pending = self._pending[end:]
+            self._keys = {
+                (update.fqdn, record_type)
+                for update in self._pending
+                for record_type in update.records
+            }
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, updates: list[QueuedUpdate]) -> None:
+        """Send the merged updates and resolve the futures of the callers."""
+        assert self._commit is not None
+        batch: Batch = {}
+        changes = 0
+        for update in updates:
+            records, _ = batch.get(update.fqdn, ({}, update.ttl))
+            records.update(update.records)
+            batch[update.fqdn] = (records, update.ttl)
+            changes += len(update.records)
+        try:
+            results = self._commit(batch)
+        except Exception as e:
+            with self._condition:
+                self._stats.batches += 1
+                self._stats.failed += 1
+            for update in updates:
+                update.future.set_exception(e)
+            return
+        with self._condition:
+            self._stats.batches += 1
+            self._stats.coalesced += changes - sum(
+                len(records) for records, _ in batch.values()
+            )
+        # Replay the updates in the order they were queued, so each caller
+        # sees the content written by its predecessor in the batch as the old
+        # content.
+        current: dict[tuple[str, RecordType], str | None] = {}
+        served: dict[tuple[str, RecordType], str | None] = {}
+        for fqdn, messages in results.items():
+            for message in messages:
+                current[(fqdn, message.record_type)] = message.old
+                served[(fqdn, message.record_type)] = message.new
+        last: dict[tuple[str, RecordType], DnsChangeMessage] = {}
+        owns: list[list[DnsChangeMessage]] = []
+        for update in updates:
+            own: list[DnsChangeMessage] = []
+            for record_type, new in update.new.items():
+                key = (update.fqdn, record_type)
+                last[key] = DnsChangeMessage(
+                    fqdn=update.fqdn,
+                    old=current[key],
+                    new=new,
+                    record_type=record_type,
+                )
+                own.append(last[key])
+                current[key] = new
+            owns.append(own)
+        self._apply_verification(last, served)
+        for update, own in zip(updates, owns):
+            update.future.set_result(own)
+
+    def _apply_verification(
+        self,
+        last: dict[tuple[str, RecordType], DnsChangeMessage],
+        served: dict[tuple[str, RecordType], str | None],
+    ) -> None:
+        """Hand the content the verification read back to the caller whose
+        update was written last, like an update sent without the queue."""
+        mismatches = 0
+        for key, message in last.items():
+            if served[key] == message.new:
+                continue
+            logger.log(
+                LogLevel.WARNING,
+                f"The write-behind batch wrote '{message.new}' to "
+                f"'{message.fqdn}' {message.record_type}, but the nameserver "
+                f"serves '{served[key]}'.",
+            )
+            message.new = served[key]
+            mismatches += 1
+        if mismatches:
+            with self._condition:
+                self._stats.mismatches += mismatches
+
+    def close(self) -> None:
+        """Send the pending updates and stop the worker thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None and self._worker_pid == os.getpid():
+            worker.join()
@@ -1,7 +1,17 @@
 from typing import Iterator
 
-from dyndns.config import ZoneConfig, validate_name, validate_tsig_key
+import dns.name
+import dns.tsig
+
+from dyndns.config import (
+    TsigAlgorithm,
+    ZoneConfig,
+    list_nameservers,
+    validate_name,
+    validate_tsig_key,
+)
 from dyndns.exceptions import DnsNameError
+from dyndns.tsig import create_key
 
 
 class Zone:
@@ -18,15 +28,42 @@ class Zone:
     tsig_key: str
     """The TSIG (Transaction SIGnature) key (e. g. ``tPyvZA==``)."""
 
-    def __init__(self, name: str, tsig_key: str) -> None:
+    tsig_algorithm: TsigAlgorithm
+    """The algorithm of the TSIG key (e. g. ``hmac-sha512``)."""
+
+    key: dns.tsig.Key
+    """The decoded TSIG key. It is prepared once and used to sign all
+    messages of the zone."""
+
+    nameservers: list[str] | None
+    """The IP addresses of the nameservers of this zone. ``None`` if the
+    zone uses the global nameservers."""
+
+    def __init__(
+        self,
+        name: str,
+        tsig_key: str,
+        nameservers: list[str] | None = None,
+        tsig_algorithm: TsigAlgorithm = "hmac-sha512",
+    ) -> None:
         """
         Initialize a Zone object.
 
         :param name: The zone name (e. g. ``example.com.``).
         :param tsig_key: The TSIG (Transaction SIGnature) key (e. g. ``tPyvZA==``).
+        :param nameservers: The IP addresses of the nameservers of this zone.
+        :param tsig_algorithm: The algorithm of the TSIG key.
         """
         self.name = validate_name(name)
         self.tsig_key = validate_tsig_key(tsig_key)
+        self.tsig_algorithm = tsig_algorithm
+        self.key = create_key(self.name, self.tsig_key, tsig_algorithm)
+        self.nameservers = nameservers
+
+    @property
+    def keyring(self) -> dict[dns.name.Name, dns.tsig.Key]:
+        """A keyring with the prepared key of the zone."""
+        return {self.key.name: self.key}
 
     def get_record_name(self, name: str) -> str:
         """
@@ -68,7 +105,15 @@ class ZonesCollection:
     def __init__(self, zones_config: list[ZoneConfig]) -> None:
         self.zones = {}
         for zone_config in zones_config:
-            zone = Zone(name=zone_config.name, tsig_key=zone_config.tsig_key)
+            nameservers: list[str] | None = None
+            if zone_config.nameserver is not None:
+                nameservers = list_nameservers(zone_config.nameserver)
+            zone = Zone(
+                name=zone_config.name,
+                tsig_key=zone_config.tsig_key,
+                nameservers=nameservers,
+                tsig_algorithm=zone_config.tsig_algorithm,
+            )
             self.zones[zone.name] = zone
         self._iter_index = 0
         self._zone_keys = list(self.zones.keys())
@@ -0,0 +1,471 @@
+"""A small authoritative nameserver written in pure Python.
+
+It understands just enough DNS to stand in for the BIND container of
+``dev-dns-server/compose.yaml``: TSIG-verified RFC 2136 UPDATE messages
+including prerequisites, ``A``, ``AAAA``, ``TXT`` and ``SOA`` queries,
+``AXFR``/``IXFR`` zone transfers, ``NOTIFY`` messages and the RFC 7828
+``edns-tcp-keepalive`` option. Latency and packet loss can be injected to
+benchmark the client code paths."""
+
+from __future__ import annotations
+
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any
+
+import dns.edns
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.opcode
+import dns.query
+import dns.rcode
+import dns.rdataclass
+import dns.rdataset
+import dns.rdatatype
+import dns.rrset
+import dns.tsig
+import dns.update
+
+ZONES: dict[str, str] = {
+    "dyndns1.dev.": "aaZI/Ssod3/yqhknm85T3IPKScEU4Q/CbQ2J+QQW9IXeLwkLkxFprkYDoHqre4ECqTfgeu/34DCjHJO8peQc/g==",
+    "dyndns2.dev.": "KdSYRjm4zaz+rBWtJN5Q0r0slhJE9VmJR3EMi+1CMDh4GdNrj8KHuI5iYDIUcLYadGMVx3RFNBCPiceGnWH04w==",
+}
+"""The zones and TSIG keys of ``dev-dns-server/etc/named.conf``."""
+
+PORT = 55553
+"""The port of ``tests/files/dyndnsX.dev.yml``."""
+
+RecordKey = tuple[dns.name.Name, dns.rdatatype.RdataType]
+
+JournalEntry = tuple[int, int, list[dns.rrset.RRset], list[dns.rrset.RRset]]
+"""``(old serial, new serial, deleted, added)``"""
+
+
+def _to_rrset(key: RecordKey, rdataset: dns.rdataset.Rdataset) -> dns.rrset.RRset:
+    rrset = dns.rrset.RRset(key[0], dns.rdataclass.IN, key[1])
+    rrset.update(rdataset)
+    return rrset
+
+
+class FakeZone:
+    """The records of one zone together with its TSIG key and a journal of
+    the applied changes (used to answer ``IXFR`` queries)."""
+
+    origin: dns.name.Name
+
+    key: dns.tsig.Key
+
+    serial: int
+
+    records: dict[RecordKey, dns.rdataset.Rdataset]
+
+    journal: list[JournalEntry]
+
+    def __init__(
+        self,
+        name: str,
+        secret: str,
+        algorithm: dns.name.Name | str = dns.tsig.HMAC_SHA512,
+    ) -> None:
+        self.origin = dns.name.from_text(name)
+        self.key = dns.tsig.Key(self.origin, secret, algorithm)
+        self.serial = 1
+        self.records = {
+            (self.origin, dns.rdatatype.NS): dns.rdataset.from_text(
+                "IN", "NS", 300, f"ns.{self.origin}"
+            )
+        }
+        self.journal = []
+
+    def soa(self, serial: int | None = None) -> dns.rrset.RRset:
+        if serial is None:
+            serial = self.serial
+        return dns.rrset.from_text(
+            self.origin,
+            300,
+            "IN",
+            "SOA",
+            f"ns.{self.origin} admin.{self.origin} {serial} 3600 600 86400 300",
+        )
+
+    def get(
+        self, name: dns.name.Name, rdtype: dns.rdatatype.RdataType
+    ) -> dns.rdataset.Rdataset | None:
+        if rdtype == dns.rdatatype.SOA and name == self.origin:
+            return self.soa().to_rdataset()
+        return self.records.get((name, rdtype))
+
+    def has_name(self, name: dns.name.Name) -> bool:
+        return name == self.origin or any(key[0] == name for key in self.records)
+
+    def check_prerequisites(
+        self, message: dns.update.UpdateMessage
+    ) -> dns.rcode.Rcode:
+        """RFC 2136 section 3.2"""
+        value_dependent: dict[RecordKey, dns.rdataset.Rdataset] = {}
+        for rrset in message.prerequisite:
+            if rrset.deleting == dns.rdataclass.ANY:
+                if rrset.rdtype == dns.rdatatype.ANY:
+                    if not self.has_name(rrset.name):
+                        return dns.rcode.NXDOMAIN
+                elif self.get(rrset.name, rrset.rdtype) is None:
+                    return dns.rcode.NXRRSET
+            elif rrset.deleting == dns.rdataclass.NONE:
+                if rrset.rdtype == dns.rdatatype.ANY:
+                    if self.has_name(rrset.name):
+                        return dns.rcode.YXDOMAIN
+                elif self.get(rrset.name, rrset.rdtype) is not None:
+                    return dns.rcode.YXRRSET
+            else:
+                rdataset = value_dependent.setdefault(
+                    (rrset.name, rrset.rdtype),
+                    dns.rdataset.Rdataset(rrset.rdclass, rrset.rdtype),
+                )
+                rdataset.update(rrset)
+        for (name, rdtype), expected in value_dependent.items():
+            existing = self.get(name, rdtype)
+            if existing is None or set(existing) != set(expected):
+                return dns.rcode.NXRRSET
+        return dns.rcode.NOERROR
+
+    def apply_updates(self, message: dns.update.UpdateMessage) -> bool:
+        """RFC 2136 section 3.4.2
+
+        :return: ``True`` if the zone was changed."""
+        before = {key: rdataset.copy() for key, rdataset in self.records.items()}
+        for rrset in message.update:
+            key = (rrset.name, rrset.rdtype)
+            if rrset.deleting == dns.rdataclass.ANY:
+                if rrset.rdtype == dns.rdatatype.ANY:
+                    if rrset.name != self.origin:
+                        for other in [k for k in self.records if k[0] == rrset.name]:
+                            del self.records[other]
+                elif rrset.rdtype not in (dns.rdatatype.SOA, dns.rdatatype.NS):
+                    self.records.pop(key, None)
+            elif rrset.deleting == dns.rdataclass.NONE:
+                existing = self.records.get(key)
+                if existing is not None:
+                    for rdata in rrset:
+                        existing.discard(rdata)
+                    if len(existing) == 0:
+                        del self.records[key]
+            else:
+                existing = self.records.setdefault(
+                    key, dns.rdataset.Rdataset(rrset.rdclass, rrset.rdtype)
+                )
+                existing.ttl = rrset.ttl
+                for rdata in rrset:
+                    existing.add(rdata)
+        deleted: list[dns.rrset.RRset] = []
+        added: list[dns.rrset.RRset] = []
+        for key in set(before) | set(self.records):
+            old = before.get(key)
+            new = self.records.get(key)
+            if old is not None and new is not None:
+                if old == new and old.ttl == new.ttl:
+                    continue
+            if old is not None:
+                deleted.append(_to_rrset(key, old))
+            if new is not None:
+                added.append(_to_rrset(key, new))
+        if not deleted and not added:
+            return False
+        self.journal.append((self.serial, self.serial + 1, deleted, added))
+        self.serial += 1
+        return True
+
+    def transfer(self, serial: int | None = None) -> list[dns.rrset.RRset]:
+        """Build the answer section of an ``AXFR`` (``serial`` is ``None``)
+        or an ``IXFR`` response. An ``IXFR`` falls back to a full transfer
+        if the journal doesn’t reach back to the given serial."""
+        soa = self.soa()
+        if serial == self.serial:
+            return [soa]
+        if serial is not None:
+            entries = [entry for entry in self.journal if entry[0] >= serial]
+            if entries and entries[0][0] == serial:
+                answer: list[dns.rrset.RRset] = [soa]
+                for old_serial, new_serial, deleted, added in entries:
+                    answer.append(self.soa(old_serial))
+                    answer.extend(deleted)
+                    answer.append(self.soa(new_serial))
+                    answer.extend(added)
+                answer.append(soa)
+                return answer
+        rrsets = [_to_rrset(key, rdataset) for key, rdataset in self.records.items()]
+        return [soa, *rrsets, soa]
+
+
+class FakeNameserver:
+    """An in-process authoritative nameserver listening on TCP and UDP.
+
+    Every zone change is announced by a ``NOTIFY`` message to the
+    ``also_notify`` addresses.
+
+    :param zones: A mapping of zone names to their base64 encoded TSIG
+        secrets.
+    :param address: The IP address to listen on.
+    :param port: The port to listen on. ``0`` picks a free port.
+    :param latency: Seconds to wait before every answer.
+    :param loss: The probability (``0`` to ``1``) that a message is dropped
+        without an answer.
+    :param keepalive: The ``edns-tcp-keepalive`` idle timeout in seconds
+        the server advertises and enforces on its TCP connections.
+    :param also_notify: ``(address, port)`` tuples.
+    """
+
+    zones: dict[dns.name.Name, FakeZone]
+
+    address: str
+
+    port: int
+    """The port. After :meth:`start` it is the port actually bound."""
+
+    latency: float
+
+    loss: float
+
+    keepalive: float
+
+    also_notify: list[tuple[str, int]]
+
+    queries: int
+    """The number of messages the server has received."""
+
+    connections: int
+    """The number of TCP connections the server has accepted."""
+
+    _keyring: dict[dns.name.Name, dns.tsig.Key]
+
+    _lock: threading.Lock
+
+    _servers: list[socketserver.BaseServer]
+
+    def __init__(
+        self,
+        zones: dict[str, str] = ZONES,
+        address: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        loss: float = 0.0,
+        keepalive: float = 30.0,
+        algorithm: dns.name.Name | str = dns.tsig.HMAC_SHA512,
+        also_notify: list[tuple[str, int]] | None = None,
+    ) -> None:
+        self.zones = {}
+        for name, secret in zones.items():
+            zone = FakeZone(name, secret, algorithm)
+            self.zones[zone.origin] = zone
+        self._keyring = {zone.key.name: zone.key for zone in self.zones.values()}
+        self.address = address
+        self.port = port
+        self.latency = latency
+        self.loss = loss
+        self.keepalive = keepalive
+        self.also_notify = also_notify or []
+        self.queries = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._servers = []
+
+    def get_zone(self, zone_name: str) -> FakeZone:
+        return self.zones[dns.name.from_text(zone_name)]
+
+    def find_zone(self, name: dns.name.Name) -> FakeZone | None:
+        for origin in sorted(self.zones, key=len, reverse=True):
+            if name.is_subdomain(origin):
+                return self.zones[origin]
+        return None
+
+    def start(self) -> FakeNameserver:
+        """Bind the TCP and the UDP socket and serve them in background
+        threads.
+
+        :raises OSError: If the port is already in use."""
+        nameserver = self
+
+        class TcpHandler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                nameserver._handle_tcp(self.request)
+
+        class UdpHandler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                data, sock = self.request
+                for wire in nameserver._answer(data, tcp=False):
+                    sock.sendto(wire, self.client_address)
+
+        class TcpServer(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        class UdpServer(socketserver.ThreadingUDPServer):
+            daemon_threads = True
+
+        tcp = TcpServer((self.address, self.port), TcpHandler)
+        self.port = tcp.server_address[1]
+        try:
+            udp = UdpServer((self.address, self.port), UdpHandler)
+        except OSError:
+            tcp.server_close()
+            raise
+        for server in (tcp, udp):
+            threading.Thread(
+                target=server.serve_forever,
+                args=(0.05,),
+                name="fake-nameserver",
+                daemon=True,
+            ).start()
+            self._servers.append(server)
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def __enter__(self) -> FakeNameserver:
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def notify(
+        self, zone_name: str, address: str, port: int, timeout: float = 2.0
+    ) -> dns.message.Message:
+        """Send a signed ``NOTIFY`` message for the given zone and wait for
+        the answer."""
+        zone = self.get_zone(zone_name)
+        message = dns.message.make_query(zone.origin, "SOA")
+        message.set_opcode(dns.opcode.NOTIFY)
+        message.flags |= dns.flags.AA
+        message.answer.append(zone.soa())
+        message.use_tsig(zone.key)
+        return dns.query.udp(message, address, port=port, timeout=timeout)
+
+    def _notify_all(self, zone_name: str) -> None:
+        for address, port in self.also_notify:
+            try:
+                self.notify(zone_name, address, port)
+            except (OSError, dns.exception.DNSException):
+                pass
+
+    def _handle_tcp(self, sock: socket.socket) -> None:
+        with self._lock:
+            self.connections += 1
+        sock.settimeout(self.keepalive)
+        while True:
+            try:
+                (length,) = struct.unpack("!H", _recv_exactly(sock, 2))
+                data = _recv_exactly(sock, length)
+            except (OSError, EOFError):
+                return
+            for wire in self._answer(data, tcp=True):
+                try:
+                    sock.sendall(struct.pack("!H", len(wire)) + wire)
+                except OSError:
+                    return
+
+    def _answer(self, data: bytes, tcp: bool) -> list[bytes]:
+        with self._lock:
+            self.queries += 1
+        if self.loss and random.random() < self.loss:
+            return []
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            message = dns.message.from_wire(data, keyring=self._keyring)
+        except dns.message.UnknownTSIGKey:
+            # Like BIND: an unsigned answer the client cannot verify.
+            query = dns.message.from_wire(data, keyring=False)
+            response = dns.message.make_response(query)
+            response.set_rcode(dns.rcode.NOTAUTH)
+            return [response.to_wire()]
+        except dns.exception.DNSException:
+            return []
+        with self._lock:
+            response, changed = self._process(message, tcp)
+        if changed is not None and self.also_notify:
+            threading.Thread(
+                target=self._notify_all, args=(changed.origin.to_text(),), daemon=True
+            ).start()
+        return [response.to_wire(max_size=65535)]
+
+    def _process(
+        self, message: dns.message.Message, tcp: bool
+    ) -> tuple[dns.message.Message, FakeZone | None]:
+        """:return: The response and the zone changed by an UPDATE."""
+        response = dns.message.make_response(message)
+        response.flags |= dns.flags.AA
+        if tcp and any(
+            option.otype == dns.edns.KEEPALIVE for option in message.options
+        ):
+            response.use_edns(
+                0,
+                options=[
+                    dns.edns.GenericOption(
+                        dns.edns.KEEPALIVE, struct.pack("!H", int(self.keepalive * 10))
+                    )
+                ],
+            )
+        opcode = message.opcode()
+        if not message.question:
+            response.set_rcode(dns.rcode.FORMERR)
+            return response, None
+        question = message.question[0]
+        zone = self.find_zone(question.name)
+        if zone is None:
+            response.flags &= ~dns.flags.AA
+            response.set_rcode(
+                dns.rcode.NOTAUTH if opcode == dns.opcode.UPDATE else dns.rcode.REFUSED
+            )
+            return response, None
+        if opcode == dns.opcode.UPDATE:
+            assert isinstance(message, dns.update.UpdateMessage)
+            if not message.had_tsig or message.keyname != zone.origin:
+                response.set_rcode(dns.rcode.REFUSED)
+                return response, None
+            rcode = zone.check_prerequisites(message)
+            response.set_rcode(rcode)
+            if rcode == dns.rcode.NOERROR and zone.apply_updates(message):
+                return response, zone
+            return response, None
+        if opcode == dns.opcode.NOTIFY:
+            return response, None
+        if question.rdtype in (dns.rdatatype.AXFR, dns.rdatatype.IXFR):
+            if not tcp and question.rdtype == dns.rdatatype.AXFR:
+                response.set_rcode(dns.rcode.REFUSED)
+                return response, None
+            serial: int | None = None
+            if question.rdtype == dns.rdatatype.IXFR:
+                for rrset in message.authority:
+                    if rrset.rdtype == dns.rdatatype.SOA:
+                        serial = rrset[0].serial
+            response.answer = zone.transfer(serial)
+            return response, None
+        rdataset = zone.get(question.name, question.rdtype)
+        if rdataset is not None:
+            response.answer.append(
+                _to_rrset((question.name, question.rdtype), rdataset)
+            )
+        else:
+            if not zone.has_name(question.name):
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            response.authority.append(zone.soa())
+        return response, None
+
+
+def _recv_exactly(sock: socket.socket, count: int) -> bytes:
+    data = b""
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
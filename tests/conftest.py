@@ -10,10 +10,26 @@ from werkzeug.test import TestResponse
 
 from dyndns.config import Config, RecordType
 from dyndns.dns import DnsZone
-from dyndns.environment import ConfiguredEnvironment
+from dyndns.environment import AsyncConfiguredEnvironment, ConfiguredEnvironment
 from dyndns.names import FullyQualifiedDomainName
-from dyndns.webapp import create_app
+from dyndns.webapp import AsgiApp, create_app, create_asgi_app
 from dyndns.zones import Zone, ZonesCollection
+from tests._nameserver import PORT, FakeNameserver
+
+
+@pytest.fixture(scope="session", autouse=True)
+def nameserver() -> Generator[FakeNameserver | None, Any, None]:
+    """Serve the zones of ``tests/files/dyndnsX.dev.yml`` in the test process,
+    unless a nameserver (e. g. the BIND container of ``dev-dns-server``)
+    already listens on the port."""
+    nameserver = FakeNameserver(port=PORT)
+    try:
+        nameserver.start()
+    except OSError:
+        yield None
+        return
+    yield nameserver
+    nameserver.stop()
 
 
 @pytest.fixture
@@ -57,6 +73,13 @@ def app(env: ConfiguredEnvironment) -> Generator[Flask, Any, None]:
     yield app
 
 
+@pytest.fixture
+def asgi_app() -> AsgiApp:
+    return create_asgi_app(
+        AsyncConfiguredEnvironment(Path(__file__).parent / "files" / "dyndnsX.dev.yml")
+    )
+
+
 @pytest.fixture
 def flask_client(app: Flask) -> FlaskClient:
     return app.test_client()
@@ -0,0 +1,139 @@
+import asyncio
+from typing import Any
+
+from dyndns.exceptions import ParameterError
+from dyndns.webapp import AsgiApp
+
+SECRET = "12345678"
+
+
+async def request(
+    app: AsgiApp,
+    path: str,
+    query_string: str = "",
+    method: str = "GET",
+    client: str = "127.0.0.1",
+) -> tuple[int, str]:
+    sent: list[dict[str, Any]] = []
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict[str, Any]) -> None:
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string.encode(),
+        "headers": [],
+        "client": (client, 12345),
+    }
+    await app(scope, receive, send)
+    assert sent[0]["type"] == "http.response.start"
+    return sent[0]["status"], sent[1]["body"].decode()
+
+
+def get(app: AsgiApp, path: str, query_string: str = "") -> tuple[int, str]:
+    return asyncio.run(request(app, path, query_string))
+
+
+class TestRoutes:
+    def test_home(self, asgi_app: AsgiApp) -> None:
+        status, body = get(asgi_app, "/")
+        assert status == 200
+        assert body.startswith("dyndns v")
+
+    def test_update_by_path(self, asgi_app: AsgiApp) -> None:
+        get(asgi_app, f"/delete-by-path/{SECRET}/test.dyndns1.dev")
+        status, body = get(
+            asgi_app, f"/update-by-path/{SECRET}/test.dyndns1.dev/1.2.3.4"
+        )
+        assert status == 200
+        assert "UPDATED" in body
+
+    def test_update_by_query(self, asgi_app: AsgiApp) -> None:
+        status, body = get(
+            asgi_app,
+            "/update-by-query",
+            f"secret={SECRET}&fqdn=test.dyndns1.dev&ipv6=1::2&ttl=600",
+        )
+        assert status == 200
+        assert "1::2" in body
+
+    def test_remote_addr(self, asgi_app: AsgiApp) -> None:
+        status, body = asyncio.run(
+            request(
+                asgi_app,
+                "/update-by-query",
+                f"secret={SECRET}&fqdn=test.dyndns1.dev",
+                client="1.2.3.5",
+            )
+        )
+        assert status == 200
+        assert "1.2.3.5" in body
+
+    def test_delete_by_path(self, asgi_app: AsgiApp) -> None:
+        get(asgi_app, f"/update-by-path/{SECRET}/test.dyndns1.dev/1.2.3.4")
+        status, body = get(asgi_app, f"/delete-by-path/{SECRET}/test.dyndns1.dev")
+        assert status == 200
+        assert "were deleted" in body
+
+    def test_check(self, asgi_app: AsgiApp) -> None:
+        status, body = get(asgi_app, "/check")
+        assert status == 200
+        assert body.count("The light check passed") == 2
+
+    def test_stats(self, asgi_app: AsgiApp) -> None:
+        status, body = get(asgi_app, "/stats")
+        assert status == 200
+        assert "dyndns1.dev." in body
+
+    def test_concurrent_updates(self, asgi_app: AsgiApp) -> None:
+        async def run() -> list[tuple[int, str]]:
+            return await asyncio.gather(
+                *(
+                    request(
+                        asgi_app,
+                        f"/update-by-path/{SECRET}/test{i}.dyndns1.dev/1.2.3.{i}",
+                    )
+                    for i in range(20)
+                )
+            )
+
+        assert all(status == 200 for status, _ in asyncio.run(run()))
+
+
+class TestErrors:
+    def test_wrong_secret(self, asgi_app: AsgiApp) -> None:
+        status, body = get(asgi_app, "/update-by-path/wrong/test.dyndns1.dev/1.2.3")
+        assert status == ParameterError.status_code
+        assert body == "PARAMETER_ERROR: You specified a wrong secret key.\n"
+
+    def test_invalid_query(self, asgi_app: AsgiApp) -> None:
+        status, body = get(asgi_app, "/update-by-query", "secret=1&unknown=1")
+        assert status == ParameterError.status_code
+        assert "extra_forbidden" in body
+
+    def test_head(self, asgi_app: AsgiApp) -> None:
+        status, body = asyncio.run(request(asgi_app, "/", method="HEAD"))
+        assert status == 200
+        assert body == ""
+
+
+def test_lifespan(asgi_app: AsgiApp) -> None:
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent: list[dict[str, Any]] = []
+
+    async def receive() -> dict[str, Any]:
+        return messages.pop(0)
+
+    async def send(message: dict[str, Any]) -> None:
+        sent.append(message)
+
+    asyncio.run(asgi_app({"type": "lifespan"}, receive, send))
+    assert [message["type"] for message in sent] == [
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+    ]
@@ -0,0 +1,160 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import yaml
+
+from dyndns.dns import AsyncDnsZone, DnsChange, DnsZone
+from dyndns.environment import AsyncConfiguredEnvironment
+from dyndns.exceptions import ConfigurationError, IpAddressesError
+from dyndns.pool import get_async_pool
+from dyndns.zones import Zone
+from tests._helper import config_file
+
+
+@pytest.fixture
+def async_env() -> AsyncConfiguredEnvironment:
+    return AsyncConfiguredEnvironment(
+        Path(__file__).parent / "files" / "dyndnsX.dev.yml"
+    )
+
+
+@pytest.fixture
+def async_dns(zone: Zone) -> AsyncDnsZone:
+    return AsyncDnsZone("127.0.0.1", 55553, zone)
+
+
+class TestClassAsyncDnsZone:
+    def test_add_and_read(self, async_dns: AsyncDnsZone, dns: DnsZone) -> None:
+        async def run() -> None:
+            await async_dns.delete_records("test")
+            result = await async_dns.add_record("test", "A", "1.2.3.4")
+            assert result.old is None
+            assert result.new == "1.2.3.4"
+            assert await async_dns.read_a_record("test") == "1.2.3.4"
+            assert await async_dns.is_a_record("test")
+            assert not await async_dns.is_aaaa_record("test")
+
+        asyncio.run(run())
+        assert dns.read_a_record("test") == "1.2.3.4"
+
+    def test_update_records(self, async_dns: AsyncDnsZone) -> None:
+        async def run() -> None:
+            await async_dns.update_records("test", {"A": "1.2.3.4", "AAAA": "1::2"})
+            results = await async_dns.update_records(
+                "test", {"A": "1.2.3.5", "AAAA": None}
+            )
+            assert [(r.record_type, r.old, r.new) for r in results] == [
+                ("A", "1.2.3.4", "1.2.3.5"),
+                ("AAAA", "1::2", None),
+            ]
+            results = await async_dns.delete_records("test")
+            assert any(result.changed for result in results)
+
+        asyncio.run(run())
+
+    def test_concurrent_updates(self, async_dns: AsyncDnsZone) -> None:
+        async def run() -> None:
+            names = [f"async{i}" for i in range(8)]
+            await asyncio.gather(
+                *(
+                    async_dns.add_record(name, "A", f"1.2.3.{i}")
+                    for i, name in enumerate(names)
+                )
+            )
+            for i, name in enumerate(names):
+                assert await async_dns.read_a_record(name) == f"1.2.3.{i}"
+            await asyncio.gather(*(async_dns.delete_records(name) for name in names))
+
+        asyncio.run(run())
+
+    def test_conditional_updates(self, zone: Zone) -> None:
+        async_dns = AsyncDnsZone("127.0.0.1", 55553, zone, conditional_updates=True)
+
+        async def run() -> None:
+            await async_dns.delete_records("test")
+            result = await async_dns.add_record("test", "A", "1.2.3.4")
+            assert result.new == "1.2.3.4"
+            assert await async_dns.read_a_record("test") == "1.2.3.4"
+
+        asyncio.run(run())
+
+    def test_apply_changes(self, async_dns: AsyncDnsZone, dns: DnsZone) -> None:
+        changes = [
+            DnsChange("replace", f"async{i}", "A", f"1.2.3.{i}") for i in range(8)
+        ]
+        results = asyncio.run(async_dns.apply_changes(changes))
+        assert [result.new for result in results] == [f"1.2.3.{i}" for i in range(8)]
+        assert dns.read_a_record("async7") == "1.2.3.7"
+        asyncio.run(
+            async_dns.apply_changes(
+                [DnsChange("delete", f"async{i}", "A") for i in range(8)]
+            )
+        )
+
+    def test_check(self, async_dns: AsyncDnsZone) -> None:
+        assert "The update check passed" in asyncio.run(async_dns.check())
+
+    def test_check_light(self, async_dns: AsyncDnsZone) -> None:
+        assert "The light check passed" in asyncio.run(async_dns.check("light"))
+
+    def test_pool_per_event_loop(self, async_dns: AsyncDnsZone) -> None:
+        asyncio.run(async_dns.add_record("test", "A", "1.2.3.4"))
+        pool = get_async_pool("127.0.0.1", 55553)
+        before = pool.stats
+        asyncio.run(async_dns.add_record("test", "A", "1.2.3.5"))
+        # The connection of the first event loop must not be reused.
+        after = pool.stats
+        assert after.reused == before.reused
+        assert after.created == before.created + 1
+        assert after.discarded == before.discarded + 1
+        assert after.in_use == 0
+
+
+class TestClassAsyncConfiguredEnvironment:
+    def test_update_dns_record(self, async_env: AsyncConfiguredEnvironment) -> None:
+        async def run() -> str:
+            await async_env.delete_dns_record("test.dyndns1.dev")
+            return await async_env.update_dns_record(
+                fqdn="test.dyndns1.dev", ipv4="1.2.3.4"
+            )
+
+        assert "UPDATED" in asyncio.run(run())
+
+    def test_remote_addr(self, async_env: AsyncConfiguredEnvironment) -> None:
+        async def run() -> str | None:
+            await async_env.update_dns_record(
+                fqdn="test.dyndns1.dev", remote_addr="1::4"
+            )
+            return await async_env.get_dns_for_zone("dyndns1.dev").read_aaaa_record(
+                "test"
+            )
+
+        assert asyncio.run(run()) == "1::4"
+
+    def test_write_behind(self, tmp_path: Path) -> None:
+        with open(config_file) as file:
+            config = yaml.safe_load(file)
+        config["write_behind"] = {"enabled": True}
+        path = tmp_path / "dyndns.yml"
+        path.write_text(yaml.dump(config))
+        with pytest.raises(ConfigurationError, match="write_behind"):
+            AsyncConfiguredEnvironment(path)
+
+    def test_no_ip_address(self, async_env: AsyncConfiguredEnvironment) -> None:
+        with pytest.raises(IpAddressesError):
+            asyncio.run(async_env.update_dns_record(fqdn="test.dyndns1.dev"))
+
+    def test_delete_dns_record(self, async_env: AsyncConfiguredEnvironment) -> None:
+        async def run() -> str:
+            await async_env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+            return await async_env.delete_dns_record("test.dyndns1.dev")
+
+        assert "were deleted" in asyncio.run(run())
+
+    def test_check(self, async_env: AsyncConfiguredEnvironment) -> None:
+        assert asyncio.run(async_env.check()).count("The light check passed") == 2
+
+    def test_check_full(self, async_env: AsyncConfiguredEnvironment) -> None:
+        output = asyncio.run(async_env.check("full"))
+        assert output.count("The update check passed") == 2
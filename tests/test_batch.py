@@ -0,0 +1,153 @@
+import asyncio
+import json
+from typing import Any
+
+import pytest
+from flask.testing import FlaskClient
+
+from dyndns.batch import BatchEntry, parse_batch
+from dyndns.dns import DnsZone
+from dyndns.environment import ConfiguredEnvironment
+from dyndns.exceptions import DnsNameError, IpAddressesError, ParameterError
+from dyndns.webapp import AsgiApp
+
+ENTRIES = [
+    {"fqdn": "test1.dyndns1.dev", "ipv4": "1.2.3.4"},
+    {"fqdn": "test2.dyndns1.dev", "ipv4": "1.2.3.5", "ipv6": "1::5", "ttl": 600},
+    {"fqdn": "test.dyndns2.dev", "ipv6": "1::6"},
+]
+
+
+class TestParseBatch:
+    def test_json(self) -> None:
+        entries = parse_batch(json.dumps(ENTRIES).encode())
+        assert entries[1] == BatchEntry(
+            fqdn="test2.dyndns1.dev", ipv4="1.2.3.5", ipv6="1::5", ttl=600
+        )
+        assert len(entries) == 3
+
+    def test_ndjson(self) -> None:
+        body = "\n".join(json.dumps(entry) for entry in ENTRIES) + "\n\n"
+        assert parse_batch(body) == parse_batch(json.dumps(ENTRIES))
+
+    def test_invalid_entry(self) -> None:
+        entries = parse_batch('[{"fqdn": "a.dyndns1.dev"}, {"ip": "1.2.3.4"}]')
+        assert isinstance(entries[0], BatchEntry)
+        assert isinstance(entries[1], ParameterError)
+
+    def test_invalid_json(self) -> None:
+        with pytest.raises(ParameterError, match="not valid JSON"):
+            parse_batch("[{")
+
+    def test_empty(self) -> None:
+        with pytest.raises(ParameterError, match="no entries"):
+            parse_batch("[]")
+
+
+def post(flask_client: FlaskClient, body: Any) -> tuple[int, Any]:
+    response = flask_client.post(
+        "/update-batch/12345678",
+        data=body if isinstance(body, str) else json.dumps(body),
+        environ_base={"REMOTE_ADDR": "1.2.3.9"},
+    )
+    if response.is_json:
+        return response.status_code, response.json
+    return response.status_code, response.data.decode()
+
+
+class TestUpdateBatch:
+    def test_update(self, flask_client: FlaskClient, dns: DnsZone) -> None:
+        status_code, results = post(flask_client, ENTRIES)
+        assert status_code == 200
+        assert [result["status_code"] for result in results] == [200, 200, 200]
+        assert results[1]["fqdn"] == "test2.dyndns1.dev."
+        assert "1::5" in results[1]["message"]
+        assert dns.read_a_record("test1") == "1.2.3.4"
+        assert dns.read_aaaa_record("test2") == "1::5"
+        assert dns.read_resource_record_set("test2", "A").ttl == 600
+
+    def test_one_message_per_zone(
+        self, flask_client: FlaskClient, env: ConfiguredEnvironment
+    ) -> None:
+        post(flask_client, ENTRIES)
+        status_code, _ = post(
+            flask_client,
+            [
+                {"fqdn": f"test{i}.dyndns1.dev", "ipv4": f"1.2.3.{i}"}
+                for i in range(1, 3)
+            ],
+        )
+        assert status_code == 200
+        metrics = env.get_dns_for_zone("dyndns1.dev").metrics
+        assert metrics is not None
+        assert metrics.latency["update"].count == 2
+
+    def test_remote_addr(self, flask_client: FlaskClient, dns: DnsZone) -> None:
+        _, results = post(flask_client, [{"fqdn": "test1.dyndns1.dev"}])
+        assert results[0]["status_code"] == 200
+        assert dns.read_a_record("test1") == "1.2.3.9"
+
+    def test_invalid_entries(self, flask_client: FlaskClient) -> None:
+        _, results = post(
+            flask_client,
+            [
+                {"fqdn": "test1.dyndns1.dev", "ipv4": "1.2.3.4"},
+                {"fqdn": "test.wrong-domain.de", "ipv4": "1.2.3.4"},
+                {"fqdn": "test2.dyndns1.dev", "ipv4": "1::4"},
+                {"fqdn": "test1.dyndns1.dev", "ipv4": "1.2.3.5"},
+                {"ipv4": "1.2.3.4"},
+            ],
+        )
+        assert [result["status_code"] for result in results] == [
+            200,
+            DnsNameError.status_code,
+            IpAddressesError.status_code,
+            ParameterError.status_code,
+            ParameterError.status_code,
+        ]
+        assert "more than once" in results[3]["message"]
+        assert results[4]["fqdn"] is None
+
+    def test_wrong_secret(self, flask_client: FlaskClient) -> None:
+        response = flask_client.post("/update-batch/wrong", data=json.dumps(ENTRIES))
+        assert response.status_code == ParameterError.status_code
+
+    def test_max_entries(
+        self, flask_client: FlaskClient, env: ConfiguredEnvironment
+    ) -> None:
+        env.config.batch.max_entries = 2
+        status_code, body = post(flask_client, ENTRIES)
+        assert status_code == ParameterError.status_code
+        assert "more than 2 entries" in body
+
+
+class TestAsgiUpdateBatch:
+    async def post(self, app: AsgiApp, body: bytes) -> tuple[int, Any]:
+        sent: list[dict[str, Any]] = []
+        chunks = [body[:10], body[10:]]
+
+        async def receive() -> dict[str, Any]:
+            chunk = chunks.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+        async def send(message: dict[str, Any]) -> None:
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/update-batch/12345678",
+            "query_string": b"",
+            "headers": [],
+            "client": ("1.2.3.9", 12345),
+        }
+        await app(scope, receive, send)
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    def test_update(self, asgi_app: AsgiApp, dns: DnsZone) -> None:
+        status_code, results = asyncio.run(
+            self.post(asgi_app, json.dumps(ENTRIES).encode())
+        )
+        assert status_code == 200
+        assert [result["status_code"] for result in results] == [200, 200, 200]
+        assert dns.read_a_record("test2") == "1.2.3.5"
@@ -0,0 +1,259 @@
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+
+from dyndns.cache import AddressCache, RecordCache
+from dyndns.dns import DnsZone
+from dyndns.environment import ConfiguredEnvironment
+from dyndns.zones import Zone
+from tests._helper import config_file
+
+
+class TestClassRecordCache:
+    def test_miss_and_hit(self) -> None:
+        cache = RecordCache()
+        assert cache.get("a.example.com.", "A") == (False, None)
+        cache.set("a.example.com.", "A", "1.2.3.4", 300)
+        assert cache.get("a.example.com.", "A") == (True, "1.2.3.4")
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+        assert cache.stats.size == 1
+
+    def test_negative(self) -> None:
+        cache = RecordCache()
+        cache.set("a.example.com.", "A", None)
+        assert cache.get("a.example.com.", "A") == (True, None)
+
+    def test_ttl(self) -> None:
+        cache = RecordCache()
+        cache.set("a.example.com.", "A", "1.2.3.4", 0.01)
+        time.sleep(0.02)
+        assert cache.get("a.example.com.", "A") == (False, None)
+        assert cache.stats.size == 0
+
+    def test_max_ttl(self) -> None:
+        cache = RecordCache(max_ttl=0.01)
+        cache.set("a.example.com.", "A", "1.2.3.4", 300)
+        time.sleep(0.02)
+        assert cache.get("a.example.com.", "A") == (False, None)
+
+    def test_lru(self) -> None:
+        cache = RecordCache(size=2)
+        cache.set("a.example.com.", "A", "1.1.1.1")
+        cache.set("b.example.com.", "A", "2.2.2.2")
+        cache.get("a.example.com.", "A")
+        cache.set("c.example.com.", "A", "3.3.3.3")
+        assert cache.get("a.example.com.", "A")[0] is True
+        assert cache.get("b.example.com.", "A")[0] is False
+        assert cache.get("c.example.com.", "A")[0] is True
+
+    def test_size_zero(self) -> None:
+        cache = RecordCache(size=0)
+        cache.set("a.example.com.", "A", "1.1.1.1")
+        assert cache.stats.size == 0
+
+    def test_invalidate(self) -> None:
+        cache = RecordCache()
+        cache.set("a.example.com.", "A", "1.1.1.1")
+        cache.set("a.example.com.", "AAAA", "1::1")
+        cache.set("b.example.com.", "A", "2.2.2.2")
+        cache.invalidate("a.example.com.", "A")
+        assert cache.get("a.example.com.", "AAAA")[0] is True
+        cache.invalidate("a.example.com.")
+        assert cache.get("a.example.com.", "AAAA")[0] is False
+        assert cache.get("b.example.com.", "A")[0] is True
+
+
+class TestClassAddressCache:
+    def test_miss_and_hit(self) -> None:
+        cache = AddressCache()
+        assert cache.get("a.example.com.") is None
+        cache.set("a.example.com.", ("1.2.3.4", None, 300))
+        assert cache.get("A.example.com.") == ("1.2.3.4", None, 300)
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_max_age(self) -> None:
+        cache = AddressCache(max_age=0.01)
+        cache.set("a.example.com.", ("1.2.3.4", None, 300))
+        time.sleep(0.02)
+        assert cache.get("a.example.com.") is None
+        assert cache.stats.size == 0
+
+    def test_lru(self) -> None:
+        cache = AddressCache(size=2)
+        cache.set("a.example.com.", ("1.1.1.1", None, 300))
+        cache.set("b.example.com.", ("2.2.2.2", None, 300))
+        cache.get("a.example.com.")
+        cache.set("c.example.com.", ("3.3.3.3", None, 300))
+        assert cache.get("b.example.com.") is None
+        assert cache.stats.size == 2
+
+    def test_invalidate(self) -> None:
+        cache = AddressCache()
+        cache.set("a.example.com.", ("1.1.1.1", None, 300))
+        cache.invalidate("a.example.com.")
+        assert cache.get("a.example.com.") is None
+
+    def test_retain(self) -> None:
+        cache = AddressCache()
+        cache.set("a.example.com.", ("1.1.1.1", None, 300))
+        cache.set("b.example.com.", ("2.2.2.2", None, 300))
+        cache.retain(lambda fqdn, addresses: addresses[0] == "1.1.1.1")
+        assert cache.get("a.example.com.") == ("1.1.1.1", None, 300)
+        assert cache.get("b.example.com.") is None
+
+
+class TestEnvironmentAddressCache:
+    def configure(self, tmp_path: Path, **options: object) -> ConfiguredEnvironment:
+        with open(config_file) as file:
+            config = yaml.safe_load(file)
+        config["address_cache"] = {"size": 4096}
+        config.update(options)
+        path = tmp_path / "dyndns.yml"
+        path.write_text(yaml.dump(config))
+        return ConfiguredEnvironment(path)
+
+    @pytest.fixture
+    def env(self, tmp_path: Path) -> ConfiguredEnvironment:
+        return self.configure(tmp_path)
+
+    @pytest.fixture
+    def shadowed_env(self, tmp_path: Path) -> ConfiguredEnvironment:
+        return self.configure(tmp_path, zone_shadow={"enabled": True})
+
+    def updates(self, env: ConfiguredEnvironment) -> int:
+        metrics = env.get_dns_for_zone("dyndns1.dev").metrics
+        assert metrics is not None
+        return metrics.latency["update"].count
+
+    def test_unchanged(self, env: ConfiguredEnvironment) -> None:
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        updates = self.updates(env)
+        assert (
+            env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+            == "UNCHANGED: test.dyndns1.dev. A 1.2.3.4\n"
+            + "UNCHANGED: test.dyndns1.dev. AAAA None\n"
+        )
+        assert self.updates(env) == updates
+        assert env.address_cache_stats()["dyndns1.dev."].hits == 1
+
+    def test_ipv6_spelling(self, env: ConfiguredEnvironment) -> None:
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv6="::FFFF:1.2.3.4")
+        updates = self.updates(env)
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv6="0:0::ffff:102:304")
+        assert self.updates(env) == updates
+
+    def test_changed(self, env: ConfiguredEnvironment, dns: DnsZone) -> None:
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4", ttl=600)
+        rrset = dns.read_resource_record_set("test", "A")
+        assert rrset is not None
+        assert rrset.ttl == 600
+        assert env.update_dns_record(
+            fqdn="test.dyndns1.dev", ipv4="1.2.3.5", ttl=600
+        ).startswith("UPDATED")
+
+    def test_delete(self, env: ConfiguredEnvironment, dns: DnsZone) -> None:
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        env.delete_dns_record("test.dyndns1.dev")
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        assert dns.read_a_record("test") == "1.2.3.4"
+
+    def test_invalidate(self, env: ConfiguredEnvironment) -> None:
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        # Changed by another tool, announced by a NOTIFY.
+        env.get_dns_for_zone("dyndns1.dev").delete_records("test")
+        env.invalidate("dyndns1.dev")
+        assert env.update_dns_record(
+            fqdn="test.dyndns1.dev", ipv4="1.2.3.4"
+        ).startswith("UPDATED")
+
+    def test_notify_of_own_update(self, shadowed_env: ConfiguredEnvironment) -> None:
+        env = shadowed_env
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        # The nameserver announces our own update by a NOTIFY.
+        env.invalidate("dyndns1.dev")
+        updates = self.updates(env)
+        assert env.update_dns_record(
+            fqdn="test.dyndns1.dev", ipv4="1.2.3.4"
+        ).startswith("UNCHANGED")
+        assert self.updates(env) == updates
+
+    def test_notify_of_foreign_update(
+        self, shadowed_env: ConfiguredEnvironment
+    ) -> None:
+        env = shadowed_env
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        env.update_dns_record(fqdn="other.dyndns1.dev", ipv4="1.2.3.5")
+        env.get_dns_for_zone("dyndns1.dev").delete_records("test")
+        env.invalidate("dyndns1.dev")
+        assert env.update_dns_record(
+            fqdn="test.dyndns1.dev", ipv4="1.2.3.4"
+        ).startswith("UPDATED")
+        assert env.update_dns_record(
+            fqdn="other.dyndns1.dev", ipv4="1.2.3.5"
+        ).startswith("UNCHANGED")
+
+    def test_disabled(self) -> None:
+        env = ConfiguredEnvironment(config_file)
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        updates = self.updates(env)
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        assert self.updates(env) == updates + 1
+        assert env.address_cache_stats() == {}
+
+
+class TestCachedDnsZone:
+    @pytest.fixture
+    def dns(self, env: ConfiguredEnvironment) -> DnsZone:
+        dns = env.get_dns_for_zone("dyndns1.dev")
+        dns.add_record("test", "A", "1.2.3.4")
+        return dns
+
+    def test_reads_are_cached(
+        self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(dns, "read_resource_record_set", None)
+        assert dns.read_a_record("test") == "1.2.3.4"
+        assert dns.is_a_record("test")
+        stats = dns.cache_stats
+        assert stats
+        assert stats.hits == 2
+
+    def test_writes_update_the_cache(
+        self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        dns.delete_record("test", "A")
+        monkeypatch.setattr(dns, "read_resource_record_set", None)
+        assert dns.read_a_record("test") is None
+
+    def test_miss(self, dns: DnsZone) -> None:
+        dns.read_aaaa_record("test")
+        stats = dns.cache_stats
+        assert stats
+        assert stats.misses >= 1
+        assert dns.read_record("test", "AAAA", use_cache=False) is None
+
+    def test_stale_negative_entry(self, dns: DnsZone, zone: Zone) -> None:
+        dns.delete_record("test", "AAAA")
+        assert dns.read_aaaa_record("test") is None
+        # Another process or tool adds a record behind the cache’s back.
+        DnsZone("127.0.0.1", 55553, zone).add_record("test", "AAAA", "1::1")
+        dns.update_records("test", {"A": "1.2.3.5", "AAAA": None})
+        assert dns.read_record("test", "AAAA", use_cache=False) is None
+        dns.add_record("test", "AAAA", "1::1")
+        dns._cache.set(dns._normalize_name("test"), "AAAA", None)
+        dns.delete_records("test")
+        assert dns.read_record("test", "AAAA", use_cache=False) is None
+
+    def test_resolver_is_created_once(self, dns: DnsZone) -> None:
+        resolvers = list(dns._resolvers.values())
+        dns.read_record("test", "A", use_cache=False)
+        assert list(dns._resolvers.values()) == resolvers
+
+
+def test_disabled(zone: Zone) -> None:
+    assert DnsZone("127.0.0.1", 55553, zone).cache_stats is None
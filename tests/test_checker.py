@@ -0,0 +1,132 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Any
+
+from flask.testing import FlaskClient
+
+from dyndns.checker import AsyncBackgroundChecker, BackgroundChecker
+from dyndns.environment import AsyncConfiguredEnvironment, ConfiguredEnvironment
+from dyndns.exceptions import CheckError
+from dyndns.webapp import create_asgi_app
+from tests.test_asgi import request
+
+
+def fail() -> str:
+    raise CheckError("The check failed.")
+
+
+class TestClassBackgroundChecker:
+    def test_run(self) -> None:
+        checker = BackgroundChecker(lambda: "passed", 60)
+        assert checker.result is None
+        result = checker.run()
+        assert checker.result is result
+        assert result.output == "passed"
+        assert result.error is None
+        assert result.age < 1
+
+    def test_error(self) -> None:
+        result = BackgroundChecker(fail, 60).run()
+        assert isinstance(result.error, CheckError)
+        assert result.output == ""
+
+    def test_thread(self) -> None:
+        calls: list[float] = []
+
+        def check() -> str:
+            calls.append(time.monotonic())
+            return "passed"
+
+        checker = BackgroundChecker(check, 0.02).start()
+        deadline = time.monotonic() + 5
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        checker.stop()
+        assert checker.result is not None
+        # The checks start every interval.
+        assert calls[2] - calls[0] >= 0.03
+
+
+class TestClassAsyncBackgroundChecker:
+    def test_task(self) -> None:
+        calls: list[float] = []
+
+        async def check() -> str:
+            calls.append(time.monotonic())
+            return "passed"
+
+        checker = AsyncBackgroundChecker(check, 60)
+
+        async def run() -> None:
+            checker.start()
+            # A second start in the same event loop keeps the task.
+            checker.start()
+            await asyncio.sleep(0.01)
+            checker.stop()
+
+        asyncio.run(run())
+        assert len(calls) == 1
+        assert checker.result is not None
+        assert checker.result.output == "passed"
+
+
+class TestWebapp:
+    def test_healthz(self, flask_client: FlaskClient) -> None:
+        response = flask_client.get("/healthz")
+        assert response.status_code == 200
+        assert response.data == b"OK\n"
+
+    def test_cached(
+        self, env: ConfiguredEnvironment, flask_client: FlaskClient
+    ) -> None:
+        env.checker = BackgroundChecker(env.check, 60)
+        env.checker.run()
+        response = flask_client.get("/check")
+        assert response.status_code == 200
+        assert response.headers["Age"] == "0"
+        body = response.data.decode()
+        assert body.count("The light check passed") == 2
+        assert body.endswith("The zones were checked 0.0 seconds ago.\n")
+        # Another mode than the configured mode is checked at once.
+        response = flask_client.get("/check?mode=full")
+        assert "Age" not in response.headers
+        env.checker.stop()
+
+    def test_cached_error(
+        self, env: ConfiguredEnvironment, flask_client: FlaskClient
+    ) -> None:
+        env.checker = BackgroundChecker(fail, 60)
+        env.checker.run()
+        response = flask_client.get("/check")
+        assert response.status_code == CheckError.status_code
+        assert response.data.decode().startswith("CHECK_ERROR: The check failed.\n")
+        assert "Age" in response.headers
+        env.checker.stop()
+
+    def test_asgi(self) -> None:
+        env = AsyncConfiguredEnvironment(
+            Path(__file__).parent / "files" / "dyndnsX.dev.yml"
+        )
+        env.checker = AsyncBackgroundChecker(env.check, 60)
+        app = create_asgi_app(env)
+        messages = [{"type": "lifespan.startup"}]
+        sent: list[dict[str, Any]] = []
+
+        async def receive() -> dict[str, Any]:
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.05)
+            return {"type": "lifespan.shutdown"}
+
+        async def send(message: dict[str, Any]) -> None:
+            sent.append(message)
+
+        async def run() -> tuple[int, str]:
+            await app({"type": "lifespan"}, receive, send)
+            return await request(app, "/check")
+
+        status, body = asyncio.run(run())
+        assert status == 200
+        assert "seconds ago" in body
+        assert asyncio.run(request(app, "/healthz")) == (200, "OK\n")
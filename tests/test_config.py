@@ -13,6 +13,7 @@ from pydantic import BaseModel, ValidationError
 from dyndns.config import (
     Config,
     IpAddress,
+    list_nameservers,
     load_config,
     validate_name,
     validate_secret,
@@ -206,6 +207,19 @@ class TestConfig:
             with pytest.raises(ValidationError):
                 get_config(nameserver=None)
 
+        def test_list(self) -> None:
+            config = get_config(nameserver=["1.2.3.4", "1::2"])
+            assert list_nameservers(config.nameserver) == ["1.2.3.4", "1::2"]
+
+        def test_empty_list(self) -> None:
+            with pytest.raises(ValidationError):
+                get_config(nameserver=[])
+
+        def test_zone(self) -> None:
+            zones = copy.deepcopy(config["zones"])
+            zones[0]["nameserver"] = ["1.2.3.4"]
+            assert get_config(zones=zones).zones[0].nameserver is not None
+
     class TestPort:
         def test_default(self) -> None:
             config = get_config()
@@ -258,3 +272,17 @@ class TestConfig:
         def test_invalid_tsig_key(self) -> None:
             with pytest.raises(DnsNameError):
                 get_config(zones=[{"name": "dyndns1.dev.", "tsig_key": "xxx"}])
+
+        def test_tsig_algorithm_default(self) -> None:
+            assert get_config().zones[0].tsig_algorithm == "hmac-sha512"
+
+        def test_tsig_algorithm(self) -> None:
+            zones = copy.deepcopy(config["zones"])
+            zones[0]["tsig_algorithm"] = "hmac-sha256"
+            assert get_config(zones=zones).zones[0].tsig_algorithm == "hmac-sha256"
+
+        def test_invalid_tsig_algorithm(self) -> None:
+            zones = copy.deepcopy(config["zones"])
+            zones[0]["tsig_algorithm"] = "hmac-md5"
+            with pytest.raises(ValidationError):
+                get_config(zones=zones)
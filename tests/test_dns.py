@@ -1,7 +1,13 @@
 import pytest
 from dns.exception import SyntaxError
+from dns.message import Message
+from dns.rcode import NXRRSET
+from dns.tsig import HMAC_SHA256
+from dns.update import UpdateMessage
 
-from dyndns.dns import DnsZone
+from dyndns.dns import DnsChange, DnsZone
+from dyndns.exceptions import CheckError, DNSServerError, ParameterError
+from dyndns.zones import Zone
 
 
 def test_class_dns_change_message(dns: DnsZone) -> None:
@@ -91,3 +97,256 @@ class TestClassDnsZone:
             assert message.record_type == "A"
             ip: str | None = dns.read_a_record("test")
             assert ip is None
+
+    class TestUpdateRecords:
+        def test_single_update_message(
+            self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            dns.add_record("test", "A", "1.2.3.4")
+            dns.add_record("test", "AAAA", "1::2")
+            messages: list[Message] = []
+            query = dns._query
+
+            def count(message: Message) -> Message:
+                messages.append(message)
+                return query(message)
+
+            monkeypatch.setattr(dns, "_query", count)
+            results = dns.update_records("test", {"A": "1.2.3.5", "AAAA": "1:0::3"})
+            assert len(messages) == 1
+            assert [(r.record_type, r.old, r.new) for r in results] == [
+                ("A", "1.2.3.4", "1.2.3.5"),
+                ("AAAA", "1::2", "1::3"),
+            ]
+            assert dns.read_a_record("test") == "1.2.3.5"
+            assert dns.read_aaaa_record("test") == "1::3"
+
+        def test_delete_one_type(self, dns: DnsZone) -> None:
+            dns.add_record("test", "A", "1.2.3.4")
+            dns.add_record("test", "AAAA", "1::2")
+            results = dns.update_records("test", {"A": "1.2.3.4", "AAAA": None})
+            assert results[0].changed is False
+            assert results[1].old == "1::2"
+            assert results[1].new is None
+            assert dns.read_aaaa_record("test") is None
+
+        def test_nothing_to_delete(self, dns: DnsZone) -> None:
+            dns.delete_records("test")
+            results = dns.delete_records("test")
+            assert not any(result.changed for result in results)
+            assert dns.read_a_record("test") is None
+
+
+class TestApplyChanges:
+    @pytest.fixture
+    def messages(
+        self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch
+    ) -> list[UpdateMessage]:
+        dns.apply_changes([DnsChange("delete", f"bulk{i}", "A") for i in range(50)])
+        messages: list[UpdateMessage] = []
+        query = dns._query
+
+        def count(message: UpdateMessage) -> Message:
+            messages.append(message)
+            return query(message)
+
+        monkeypatch.setattr(dns, "_query", count)
+        return messages
+
+    def test_one_message(self, dns: DnsZone, messages: list[UpdateMessage]) -> None:
+        results = dns.apply_changes(
+            [
+                DnsChange("replace", "bulk0", "A", "1.2.3.4"),
+                DnsChange("add", "bulk1", "A", "1.2.3.5"),
+                DnsChange("delete", "bulk2", "A"),
+            ]
+        )
+        assert len(messages) == 1
+        assert [(r.fqdn, r.old, r.new) for r in results] == [
+            ("bulk0.dyndns1.dev.", None, "1.2.3.4"),
+            ("bulk1.dyndns1.dev.", None, "1.2.3.5"),
+            ("bulk2.dyndns1.dev.", None, None),
+        ]
+        assert dns.read_a_record("bulk0") == "1.2.3.4"
+        assert dns.read_a_record("bulk1") == "1.2.3.5"
+
+    def test_same_name(self, dns: DnsZone, messages: list[UpdateMessage]) -> None:
+        results = dns.apply_changes(
+            [
+                DnsChange("replace", "bulk0", "A", "1.2.3.4"),
+                DnsChange("add", "bulk0", "A", "1.2.3.5"),
+                DnsChange("replace", "bulk0", "A", "1.2.3.6"),
+                DnsChange("add", "bulk0", "A", "1.2.3.7"),
+            ]
+        )
+        assert [(r.old, r.new) for r in results] == [
+            (None, "1.2.3.4"),
+            ("1.2.3.4", "1.2.3.5"),
+            ("1.2.3.4", "1.2.3.6"),
+            ("1.2.3.6", "1.2.3.7"),
+        ]
+        rrset = dns.read_resource_record_set("bulk0", "A")
+        assert rrset is not None
+        assert sorted(rdata.to_text() for rdata in rrset) == ["1.2.3.6", "1.2.3.7"]
+
+    def test_nothing_to_delete(
+        self, dns: DnsZone, messages: list[UpdateMessage]
+    ) -> None:
+        results = dns.apply_changes([DnsChange("delete", "bulk0", "A")])
+        assert not results[0].changed
+        assert dns.read_record("bulk0", "A", use_cache=False) is None
+
+    def test_stale_negative_cache(self, dns: DnsZone, zone: Zone) -> None:
+        assert dns.read_a_record("bulk0") is None
+        # Another process or tool adds a record behind the cache’s back.
+        DnsZone("127.0.0.1", 55553, zone).add_record("bulk0", "A", "1.2.3.4")
+        dns.apply_changes([DnsChange("delete", "bulk0", "A")])
+        assert dns.read_record("bulk0", "A", use_cache=False) is None
+
+    def test_split(
+        self,
+        dns: DnsZone,
+        messages: list[UpdateMessage],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(dns, "MAX_UPDATE_SIZE", 1024)
+        changes = [
+            DnsChange("replace", f"bulk{i}", "A", f"1.2.3.{i}") for i in range(50)
+        ]
+        dns.apply_changes(changes)
+        assert len(messages) > 1
+        assert all(len(message.to_wire()) <= 1024 for message in messages)
+        assert sum(len(message.update) for message in messages) == 100
+        for i in range(50):
+            assert dns.read_record(f"bulk{i}", "A", use_cache=False) == f"1.2.3.{i}"
+
+    def test_too_big(self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(dns, "MAX_UPDATE_SIZE", 300)
+        with pytest.raises(ParameterError, match="exceeds the maximum size"):
+            dns.apply_changes([DnsChange("replace", "bulk0", "TXT", "x" * 250)])
+
+    def test_missing_content(self, dns: DnsZone) -> None:
+        with pytest.raises(ParameterError, match="requires a content"):
+            dns.apply_changes([DnsChange("add", "bulk0", "A")])
+
+
+class TestCheck:
+    @pytest.fixture
+    def messages(self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch) -> list[Message]:
+        messages: list[Message] = []
+        query = dns._query
+
+        def count(message: Message) -> Message:
+            messages.append(message)
+            return query(message)
+
+        monkeypatch.setattr(dns, "_query", count)
+        return messages
+
+    def test_light(self, dns: DnsZone, messages: list[Message]) -> None:
+        assert "The light check passed" in dns.check("light")
+        assert len(messages) == 1
+        assert not isinstance(messages[0], UpdateMessage)
+        assert messages[0].had_tsig
+
+    def test_full(self, dns: DnsZone, messages: list[Message]) -> None:
+        assert "The update check passed" in dns.check("full")
+        assert any(isinstance(message, UpdateMessage) for message in messages)
+
+    def test_unknown_key(self) -> None:
+        dns = DnsZone(
+            "127.0.0.1",
+            55553,
+            Zone(
+                "unknown.dev.",
+                "aaZI/Ssod3/yqhknm85T3IPKScEU4Q/CbQ2J+QQW9IXeLwkLkxFprkYDoHqre4ECqTfgeu/34DCjHJO8peQc/g==",
+            ),
+        )
+        with pytest.raises(CheckError, match="could not be verified"):
+            dns.check("light")
+
+
+class TestTsig:
+    def test_key_is_shared(self, zone: Zone) -> None:
+        dns1 = DnsZone("127.0.0.1", 55553, zone)
+        dns2 = DnsZone("127.0.0.1", 55553, zone)
+        assert dns1._create_update_message().keyring is zone.key
+        assert dns2._create_update_message().keyring is zone.key
+
+    def test_algorithm(self) -> None:
+        dns = DnsZone(
+            "127.0.0.1",
+            55553,
+            Zone("example.com.", "tPyvZA==", tsig_algorithm="hmac-sha256"),
+        )
+        message = dns._create_update_message()
+        message.to_wire()
+        assert message.tsig is not None
+        assert message.tsig[0].algorithm == HMAC_SHA256
+        query = dns._build_check_query()
+        query.to_wire()
+        assert query.keyalgorithm == HMAC_SHA256
+
+
+class TestConditionalUpdates:
+    @pytest.fixture
+    def dns(self, zone: Zone) -> DnsZone:
+        return DnsZone("127.0.0.1", 55553, zone, conditional_updates=True)
+
+    @pytest.fixture
+    def messages(
+        self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch
+    ) -> list[UpdateMessage]:
+        dns.delete_records("test")
+        messages: list[UpdateMessage] = []
+        query = dns._query
+
+        def count(message: UpdateMessage) -> Message:
+            messages.append(message)
+            return query(message)
+
+        monkeypatch.setattr(dns, "_query", count)
+        return messages
+
+    def test_unchanged(self, dns: DnsZone, messages: list[UpdateMessage]) -> None:
+        dns.add_record("test", "A", "1.2.3.4")
+        messages.clear()
+        results = dns.update_records("test", {"A": "1.2.3.4", "AAAA": None})
+        assert len(messages) == 1
+        assert len(messages[0].prerequisite) == 2
+        assert [(r.old, r.new, r.changed) for r in results] == [
+            ("1.2.3.4", "1.2.3.4", False),
+            (None, None, False),
+        ]
+
+    def test_changed(self, dns: DnsZone, messages: list[UpdateMessage]) -> None:
+        dns.add_record("test", "A", "1.2.3.4")
+        dns.add_record("test", "AAAA", "1::2")
+        results = dns.update_records("test", {"A": "1.2.3.5", "AAAA": None})
+        assert [(r.old, r.new) for r in results] == [
+            ("1.2.3.4", "1.2.3.5"),
+            ("1::2", None),
+        ]
+        assert dns.read_a_record("test") == "1.2.3.5"
+        assert dns.read_aaaa_record("test") is None
+
+    def test_new_record(self, dns: DnsZone, messages: list[UpdateMessage]) -> None:
+        dns.delete_record("test", "TXT")
+        messages.clear()
+        message = dns.add_record("test", "TXT", "STRING")
+        assert message.old is None
+        assert message.new == "STRING"
+        assert len(messages) == 2
+        dns.delete_record("test", "TXT")
+
+    def test_rejected(self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            dns, "_commit", lambda message, *accepted: NXRRSET
+        )
+        monkeypatch.setattr(dns, "_read_rdatas", lambda fqdn, record_type: [])
+        with pytest.raises(DNSServerError, match="modified concurrently 3 times"):
+            dns.add_record("test", "A", "1.2.3.4")
+
+    def test_invalid_ip_address(self, dns: DnsZone) -> None:
+        with pytest.raises(SyntaxError, match="Text input is malformed."):
+            dns.add_record("test", "A", "invalid")
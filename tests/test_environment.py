@@ -1,4 +1,12 @@
+import threading
+from pathlib import Path
+
+import pytest
+import yaml
+
+from dyndns.config import CheckMode
 from dyndns.environment import ConfiguredEnvironment
+from tests._helper import config_file
 
 
 class TestClassConfiguredEnvironment:
@@ -26,3 +34,57 @@ class TestClassConfiguredEnvironment:
                 env.delete_dns_record("test.dyndns1.dev")
                 == "UNCHANGED: The deletion of the domain name 'test.dyndns1.dev.' was not executed because there were no A or AAAA records.\n"
             )
+
+    class TestMethodCheck:
+        def test_order(self, env: ConfiguredEnvironment) -> None:
+            output = env.check()
+            assert output.index("dyndns1.dev.") < output.index("dyndns2.dev.")
+
+        def test_parallel(
+            self, env: ConfiguredEnvironment, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            # Both zones wait for each other, so the check passes only if the
+            # zones are checked at the same time.
+            barrier = threading.Barrier(2, timeout=5)
+            modes: list[CheckMode] = []
+            for dns_zone in env.dns_zones:
+
+                def check(mode: CheckMode, name: str = dns_zone._zone.name) -> str:
+                    modes.append(mode)
+                    barrier.wait()
+                    return name
+
+                monkeypatch.setattr(dns_zone, "check", check)
+            assert env.check("full") == "dyndns1.dev.\ndyndns2.dev."
+            assert modes == ["full", "full"]
+
+        def test_concurrency_limit(
+            self, env: ConfiguredEnvironment, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            env.config.check.concurrency = 1
+            threads: set[int] = set()
+            for dns_zone in env.dns_zones:
+
+                def check(mode: CheckMode) -> str:
+                    threads.add(threading.get_ident())
+                    return mode
+
+                monkeypatch.setattr(dns_zone, "check", check)
+            assert env.check() == "light\nlight"
+            assert len(threads) == 1
+
+
+def test_notify_listener(tmp_path: Path) -> None:
+    with open(config_file) as file:
+        config = yaml.safe_load(file)
+    config["notify"] = {"enabled": True, "port": 0}
+    path = tmp_path / "dyndns.yml"
+    path.write_text(yaml.dump(config))
+    env = ConfiguredEnvironment(path)
+    assert env.notify_listener is not None
+    assert env.notify_listener.port > 0
+    env.notify_listener.close()
+
+
+def test_notify_listener_disabled(env: ConfiguredEnvironment) -> None:
+    assert env.notify_listener is None
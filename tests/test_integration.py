@@ -155,8 +155,26 @@ class TestMultiplePaths:
     def test_home(self, client: TestClient) -> None:
         assert client.get("/") == f"dyndns v{get_version('dyndns')}\n"
 
-    def test_check(self, client: TestClient) -> None:
+    def test_check_light(self, client: TestClient) -> None:
         content = client.get("/check")
         assert content
+        assert "The light check passed" in content
+        assert "zone 'dyndns1.dev.'" in content
+        assert "zone 'dyndns2.dev.'" in content
+
+    def test_check_invalid_mode(self, client: TestClient) -> None:
+        content = client.get("/check?mode=heavy")
+        assert content
+        assert "PARAMETER_ERROR" in content
+
+    def test_stats(self, client: TestClient) -> None:
+        client.get("/check")
+        content = client.get("/stats")
+        assert "dyndns1.dev. timeouts=0" in content
+        assert "check   count=1" in content
+
+    def test_check(self, client: TestClient) -> None:
+        content = client.get("/check?mode=full")
+        assert content
         assert "could be updated on the zone 'dyndns1.dev.'" in content
         assert "could be updated on the zone 'dyndns2.dev.'" in content
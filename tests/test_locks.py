@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import yaml
+from flask.testing import FlaskClient
+
+from dyndns.environment import AsyncConfiguredEnvironment, ConfiguredEnvironment
+from dyndns.locks import AsyncStripedLock, LockStats, StripedLock, format_lock_stats
+from tests._helper import config_file
+
+
+def hold_in_thread(lock: StripedLock, key: str, seconds: float) -> threading.Thread:
+    held = threading.Event()
+
+    def run() -> None:
+        with lock.hold(key):
+            held.set()
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    held.wait()
+    return thread
+
+
+class TestClassStripedLock:
+    def test_same_key_waits(self) -> None:
+        lock = StripedLock()
+        thread = hold_in_thread(lock, "test.dyndns1.dev", 0.1)
+        start = time.perf_counter()
+        with lock.hold("TEST.dyndns1.dev"):
+            waited = time.perf_counter() - start
+        thread.join()
+        assert waited >= 0.05
+        stats = lock.stats
+        assert stats.acquisitions == 2
+        assert stats.contended == 1
+        assert stats.max_wait >= 0.05
+
+    def test_other_stripe_does_not_wait(self) -> None:
+        lock = StripedLock(2)
+        assert lock._indexes(("a",)) != lock._indexes(("d",))
+        thread = hold_in_thread(lock, "a", 0.2)
+        with lock.hold("d"):
+            pass
+        assert lock.stats.contended == 0
+        thread.join()
+
+    def test_several_keys(self) -> None:
+        lock = StripedLock(1)
+        # Keys on the same stripe are acquired once.
+        with lock.hold("a", "b", "c"):
+            pass
+        assert lock.stats.acquisitions == 1
+        assert not lock._locks[0].locked()
+
+    def test_release_on_exception(self) -> None:
+        lock = StripedLock(1)
+        try:
+            with lock.hold("a"):
+                raise ValueError
+        except ValueError:
+            pass
+        assert not lock._locks[0].locked()
+
+
+class TestClassAsyncStripedLock:
+    def test_same_key_waits(self) -> None:
+        lock = AsyncStripedLock()
+        order: list[str] = []
+
+        async def update(name: str) -> None:
+            async with lock.hold("test.dyndns1.dev"):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        async def run() -> None:
+            await asyncio.gather(update("a"), update("b"))
+
+        asyncio.run(run())
+        assert order == ["a start", "a end", "b start", "b end"]
+        assert lock.stats.contended == 1
+        # A new event loop gets new locks.
+        asyncio.run(run())
+        assert lock.stats.acquisitions == 4
+
+
+def test_format_lock_stats() -> None:
+    assert format_lock_stats(LockStats(10, 2, 0.004, 0.003)) == (
+        "name locks acquisitions=10 contended=2 mean_wait=2ms max_wait=3ms\n"
+    )
+
+
+class TestEnvironment:
+    def test_update_holds_lock(self, env: ConfiguredEnvironment) -> None:
+        before = env.lock_stats.acquisitions
+        env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.4")
+        env.delete_dns_record("test.dyndns1.dev")
+        assert env.lock_stats.acquisitions == before + 2
+
+    def test_parallel_updates_of_one_name(self, env: ConfiguredEnvironment) -> None:
+        env.delete_dns_record("test.dyndns1.dev")
+        threads = [
+            threading.Thread(
+                target=env.update_dns_record,
+                kwargs={"fqdn": "test.dyndns1.dev", "ipv4": f"1.2.3.{i}"},
+            )
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rrset = env.get_dns_for_zone("dyndns1.dev").read_resource_record_set(
+            "test", "A"
+        )
+        assert rrset is not None
+        assert len(rrset) == 1
+
+    def test_write_behind(self, tmp_path: Path) -> None:
+        with open(config_file) as file:
+            config = yaml.safe_load(file)
+        config["lock_stripes"] = 1
+        config["write_behind"] = {"enabled": True, "window": 0.5}
+        path = tmp_path / "dyndns.yml"
+        path.write_text(yaml.dump(config))
+        env = ConfiguredEnvironment(path)
+        names = [f"stripe{i}.dyndns1.dev" for i in range(4)]
+        threads = [
+            threading.Thread(
+                target=env.update_dns_record,
+                kwargs={"fqdn": fqdn, "ipv4": f"1.2.3.{i}"},
+            )
+            for i, fqdn in enumerate(names)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # All names share one lock, but the updates wait for the window of
+        # the queue together.
+        assert time.monotonic() - start < 1.5
+        dns = env.get_dns_for_zone("dyndns1.dev")
+        assert dns._queue is not None
+        assert dns._queue.stats.batches == 1
+        for i, fqdn in enumerate(names):
+            assert dns.read_record(fqdn, "A", use_cache=False) == f"1.2.3.{i}"
+            env.delete_dns_record(fqdn)
+
+    def test_async(self) -> None:
+        env = AsyncConfiguredEnvironment(
+            Path(__file__).parent / "files" / "dyndnsX.dev.yml"
+        )
+
+        async def run() -> None:
+            await asyncio.gather(
+                *(
+                    env.update_dns_record(
+                        fqdn="test.dyndns1.dev", ipv4=f"1.2.3.{i}"
+                    )
+                    for i in range(4)
+                )
+            )
+
+        asyncio.run(run())
+        assert env.lock_stats.acquisitions >= 4
+
+    def test_stats(self, flask_client: FlaskClient) -> None:
+        body = flask_client.get("/stats").data.decode()
+        assert "name locks acquisitions=" in body
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from dns.exception import Timeout
+from dns.message import Message
+from dns.tsig import PeerBadKey
+
+from dyndns.dns import AsyncDnsZone, DnsZone
+from dyndns.metrics import DnsMetrics, Histogram, format_metrics
+from dyndns.zones import Zone
+
+
+class TestClassHistogram:
+    def test_observe(self) -> None:
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        stats = histogram.stats
+        assert stats.counts == [2, 1, 1]
+        assert stats.count == 4
+        assert stats.sum == pytest.approx(2.65)
+
+    def test_percentile(self) -> None:
+        histogram = Histogram((0.1, 1.0))
+        assert histogram.stats.percentile(0.5) is None
+        for value in (0.05, 0.05, 0.5, 2.0):
+            histogram.observe(value)
+        assert histogram.stats.percentile(0.5) == 0.1
+        assert histogram.stats.percentile(0.75) == 1.0
+        assert histogram.stats.percentile(0.99) == float("inf")
+
+
+class TestClassDnsMetrics:
+    def test_count_error(self) -> None:
+        metrics = DnsMetrics("example.com.")
+        metrics.count_error(Timeout())
+        metrics.count_error(PeerBadKey())
+        metrics.count_error(OSError())
+        stats = metrics.stats
+        assert stats.timeouts == 1
+        assert stats.bad_keys == 1
+        assert stats.errors == 3
+
+    def test_measure_raising(self) -> None:
+        metrics = DnsMetrics("example.com.")
+        with pytest.raises(ValueError):
+            with metrics.measure("read"):
+                raise ValueError()
+        assert metrics.stats.latency["read"].count == 1
+
+    def test_format(self) -> None:
+        metrics = DnsMetrics("example.com.")
+        metrics.observe("update", 0.002)
+        output = format_metrics([metrics.stats])
+        assert "example.com. timeouts=0" in output
+        assert "update  count=1 mean=2ms p50<=2.5ms" in output
+        assert "read    count=0 mean=- p50<=-" in output
+
+
+class TestDnsZone:
+    @pytest.fixture
+    def dns(self, zone: Zone) -> DnsZone:
+        return DnsZone("127.0.0.1", 55553, zone, metrics=DnsMetrics(zone.name))
+
+    def test_disabled(self, zone: Zone) -> None:
+        assert DnsZone("127.0.0.1", 55553, zone).metrics is None
+
+    def test_operations(self, dns: DnsZone) -> None:
+        dns.add_record("metrics", "A", "1.2.3.4")
+        dns.delete_records("metrics")
+        dns.check("light")
+        stats = dns.metrics
+        assert stats is not None
+        assert stats.latency["update"].count == 1
+        assert stats.latency["delete"].count == 1
+        assert stats.latency["check"].count == 1
+        # The old content is read before the update and the deletion.
+        assert stats.latency["read"].count >= 2
+        assert stats.bytes_sent > 0
+        assert stats.bytes_received > 0
+
+    def test_timeout(self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch) -> None:
+        pool = dns._pools[dns._nameservers.primary]
+        query = pool.query
+        failures = [Timeout()]
+
+        def flaky(
+            message: Message, timeout: float | None = None, metrics: object = None
+        ) -> Message:
+            if failures:
+                raise failures.pop()
+            return query(message, timeout, metrics)  # type: ignore
+
+        monkeypatch.setattr(pool, "query", flaky)
+        dns.add_record("metrics", "A", "1.2.3.4")
+        stats = dns.metrics
+        assert stats is not None
+        assert stats.timeouts == 1
+        assert stats.errors == 1
+
+
+def test_async_dns_zone(zone: Zone) -> None:
+    dns = AsyncDnsZone("127.0.0.1", 55553, zone, metrics=DnsMetrics(zone.name))
+    asyncio.run(dns.add_record("metrics", "A", "1.2.3.4"))
+    stats = dns.metrics
+    assert stats is not None
+    assert stats.latency["update"].count == 1
+    assert stats.bytes_sent > 0
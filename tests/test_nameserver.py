@@ -0,0 +1,162 @@
+import time
+from collections.abc import Generator
+
+import dns.exception
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.update
+import pytest
+from dns.query import tcp, udp
+
+from dyndns.notify import NotifyListener
+from tests._nameserver import ZONES, FakeNameserver
+from tests.test_notify import wait_for
+
+ZONE = "dyndns1.dev."
+
+
+@pytest.fixture
+def server() -> Generator[FakeNameserver, None, None]:
+    with FakeNameserver() as server:
+        yield server
+
+
+def update(server: FakeNameserver) -> dns.update.UpdateMessage:
+    return dns.update.UpdateMessage(ZONE, keyring=server.get_zone(ZONE).key)
+
+
+def add(server: FakeNameserver, address: str = "1.2.3.4") -> dns.message.Message:
+    message = update(server)
+    message.replace("test", 300, "A", address)
+    return tcp(message, server.address, port=server.port, timeout=2)
+
+
+def query(
+    server: FakeNameserver, name: str = f"test.{ZONE}", rdtype: str = "A"
+) -> dns.message.Message:
+    return udp(
+        dns.message.make_query(name, rdtype),
+        server.address,
+        port=server.port,
+        timeout=2,
+    )
+
+
+class TestUpdate:
+    def test_add(self, server: FakeNameserver) -> None:
+        assert add(server).rcode() == dns.rcode.NOERROR
+        response = query(server)
+        assert response.answer[0][0].to_text() == "1.2.3.4"
+        assert server.get_zone(ZONE).serial == 2
+
+    def test_unchanged(self, server: FakeNameserver) -> None:
+        add(server)
+        add(server)
+        assert server.get_zone(ZONE).serial == 2
+
+    def test_unsigned(self, server: FakeNameserver) -> None:
+        message = dns.update.UpdateMessage(ZONE)
+        message.add("test", 300, "A", "1.2.3.4")
+        response = tcp(message, server.address, port=server.port, timeout=2)
+        assert response.rcode() == dns.rcode.REFUSED
+        assert query(server).rcode() == dns.rcode.NXDOMAIN
+
+    def test_prerequisite(self, server: FakeNameserver) -> None:
+        message = update(server)
+        message.present("test", "A")
+        message.add("test", 300, "A", "1.2.3.4")
+        response = tcp(message, server.address, port=server.port, timeout=2)
+        assert response.rcode() == dns.rcode.NXRRSET
+
+    def test_unknown_key(self, server: FakeNameserver) -> None:
+        other = FakeNameserver({ZONE: ZONES["dyndns2.dev."]}).get_zone(ZONE)
+        message = dns.update.UpdateMessage(
+            ZONE, keyring={dns.name.from_text("other."): other.key}
+        )
+        message.add("test", 300, "A", "1.2.3.4")
+        with pytest.raises(dns.exception.DNSException):
+            tcp(message, server.address, port=server.port, timeout=2)
+
+
+class TestQuery:
+    def test_soa(self, server: FakeNameserver) -> None:
+        response = query(server, ZONE, "SOA")
+        assert response.answer[0][0].serial == 1
+
+    def test_nxdomain(self, server: FakeNameserver) -> None:
+        response = query(server)
+        assert response.rcode() == dns.rcode.NXDOMAIN
+        assert response.authority[0].rdtype == dns.rdatatype.SOA
+
+    def test_unknown_zone(self, server: FakeNameserver) -> None:
+        assert query(server, "example.com.").rcode() == dns.rcode.REFUSED
+
+
+class TestTransfer:
+    def transfer(
+        self, server: FakeNameserver, rdtype: str, serial: int | None = None
+    ) -> list[str]:
+        message = dns.message.make_query(ZONE, rdtype)
+        if serial is not None:
+            soa = server.get_zone(ZONE).soa(serial)
+            message.authority.append(soa)
+        message.use_tsig(server.get_zone(ZONE).key)
+        response = tcp(
+            message,
+            server.address,
+            port=server.port,
+            timeout=2,
+            one_rr_per_rrset=True,
+        )
+        return [rrset.to_text() for rrset in response.answer]
+
+    def test_axfr(self, server: FakeNameserver) -> None:
+        add(server)
+        answer = self.transfer(server, "AXFR")
+        assert len(answer) == 4
+        assert "test.dyndns1.dev. 300 IN A 1.2.3.4" in answer
+
+    def test_ixfr(self, server: FakeNameserver) -> None:
+        add(server)
+        add(server, "5.6.7.8")
+        answer = self.transfer(server, "IXFR", 2)
+        assert answer[2] == "test.dyndns1.dev. 300 IN A 1.2.3.4"
+        assert answer[4] == "test.dyndns1.dev. 300 IN A 5.6.7.8"
+
+    def test_ixfr_up_to_date(self, server: FakeNameserver) -> None:
+        assert len(self.transfer(server, "IXFR", 1)) == 1
+
+
+class TestInjection:
+    def test_latency(self, server: FakeNameserver) -> None:
+        server.latency = 0.1
+        start = time.perf_counter()
+        query(server)
+        assert time.perf_counter() - start >= 0.1
+
+    def test_loss(self, server: FakeNameserver) -> None:
+        server.loss = 1.0
+        with pytest.raises(dns.exception.Timeout):
+            udp(
+                dns.message.make_query(ZONE, "SOA"),
+                server.address,
+                port=server.port,
+                timeout=0.2,
+            )
+        assert server.queries == 1
+
+
+def test_also_notify() -> None:
+    serials: list[int | None] = []
+    listener = NotifyListener(port=0).start()
+    try:
+        with FakeNameserver(also_notify=[("127.0.0.1", listener.port)]) as server:
+            listener.register(
+                ZONE, ["127.0.0.1"], serials.append, server.get_zone(ZONE).key
+            )
+            add(server)
+            wait_for(lambda: serials == [2])
+    finally:
+        listener.close()
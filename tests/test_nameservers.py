@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from dyndns.dns import DnsZone
+from dyndns.exceptions import DNSServerError
+from dyndns.nameservers import (
+    Nameserver,
+    NameserverGroup,
+    get_nameserver,
+    get_nameserver_group,
+    get_nameserver_stats,
+)
+from dyndns.zones import Zone
+
+
+class TestClassNameserver:
+    def test_latency(self) -> None:
+        nameserver = Nameserver("192.0.2.1", 53)
+        assert nameserver.stats.latency is None
+        nameserver.record_success(0.1)
+        nameserver.record_success(0.2)
+        assert nameserver.stats.latency == pytest.approx(0.13)
+        assert nameserver.stats.queries == 2
+
+    def test_failure(self) -> None:
+        nameserver = Nameserver("192.0.2.1", 53)
+        nameserver.record_success(0.1)
+        nameserver.record_failure()
+        assert not nameserver.healthy
+        assert nameserver.stats.errors == 1
+        assert nameserver.stats.error_rate == pytest.approx(0.3)
+        assert nameserver.score > 0.1
+        nameserver.record_success(0.1)
+        assert nameserver.healthy
+
+    def test_backoff(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        nameserver = Nameserver("192.0.2.1", 53)
+        for _ in range(10):
+            nameserver.record_failure()
+        assert nameserver.down_until - time.monotonic() == pytest.approx(
+            Nameserver.MAX_BACKOFF, abs=1
+        )
+        monkeypatch.setattr(time, "monotonic", lambda: nameserver.down_until)
+        assert nameserver.healthy
+
+
+class TestClassNameserverGroup:
+    def test_fastest_first(self) -> None:
+        primary = Nameserver("192.0.2.1", 53)
+        standby = Nameserver("192.0.2.2", 53)
+        group = NameserverGroup([primary, standby])
+        assert group.ordered() == [primary, standby]
+        primary.record_success(0.5)
+        standby.record_success(0.1)
+        assert group.ordered() == [standby, primary]
+        assert group.primary is primary
+
+    def test_unhealthy_last(self) -> None:
+        primary = Nameserver("192.0.2.1", 53)
+        standby = Nameserver("192.0.2.2", 53)
+        group = NameserverGroup([primary, standby])
+        primary.record_success(0.01)
+        standby.record_success(0.5)
+        primary.record_failure()
+        assert group.ordered() == [standby, primary]
+
+    def test_shared(self) -> None:
+        group = get_nameserver_group(["192.0.2.3", "192.0.2.4"], 53)
+        assert group.nameservers[0] is get_nameserver("192.0.2.3", 53)
+        assert group.describe() == "192.0.2.3, 192.0.2.4"
+        assert len(get_nameserver_group("192.0.2.3", 53)) == 1
+
+
+class TestFailover:
+    def test_update(self, zone: Zone) -> None:
+        # Nothing listens on 127.0.0.2, so the connection is refused.
+        dns = DnsZone(["127.0.0.2", "127.0.0.1"], 55553, zone, conditional_updates=True)
+        dns.delete_records("test")
+        result = dns.add_record("test", "A", "1.2.3.4")
+        assert result.new == "1.2.3.4"
+        assert dns.read_record("test", "A", use_cache=False) == "1.2.3.4"
+        assert dns._nameservers.ordered()[0].address == "127.0.0.1"
+        stats = {stats.address: stats for stats in get_nameserver_stats()}
+        assert stats["127.0.0.2"].errors >= 1
+        assert not stats["127.0.0.2"].healthy
+
+    def test_all_fail(self, zone: Zone) -> None:
+        dns = DnsZone(["127.0.0.2", "127.0.0.3"], 55553, zone, conditional_updates=True)
+        with pytest.raises(DNSServerError, match="127.0.0"):
+            dns.add_record("test", "A", "1.2.3.4")
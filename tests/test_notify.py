@@ -0,0 +1,187 @@
+import time
+from collections.abc import Callable, Generator
+
+import dns.flags
+import dns.message
+import dns.opcode
+import dns.rcode
+import dns.rrset
+import dns.tsig
+import pytest
+from dns.query import udp
+
+from dyndns.cache import RecordCache
+from dyndns.dns import DnsZone
+from dyndns.notify import NotifyListener
+from dyndns.shadow import ZoneShadow
+from dyndns.zones import Zone
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def make_notify(
+    zone_name: str = "dyndns1.dev.", serial: int | None = 42
+) -> dns.message.Message:
+    message = dns.message.make_query(zone_name, "SOA")
+    message.set_opcode(dns.opcode.NOTIFY)
+    message.flags |= dns.flags.AA
+    if serial is not None:
+        message.answer.append(
+            dns.rrset.from_text(
+                zone_name,
+                300,
+                "IN",
+                "SOA",
+                f"ns.{zone_name} admin.{zone_name} {serial} 3600 600 86400 300",
+            )
+        )
+    return message
+
+
+class TestClassNotifyListener:
+    @pytest.fixture
+    def serials(self) -> list[int | None]:
+        return []
+
+    @pytest.fixture
+    def listener(self, zone: Zone, serials: list[int | None]) -> NotifyListener:
+        listener = NotifyListener(port=0)
+        listener.register(zone.name, ["127.0.0.1"], serials.append, zone.key)
+        return listener
+
+    def handle(
+        self, listener: NotifyListener, message: dns.message.Message, source: str
+    ) -> dns.message.Message | None:
+        wire, notify = listener.handle(message.to_wire(), source)
+        if notify is not None:
+            notify()
+        if wire is None:
+            return None
+        return dns.message.from_wire(
+            wire, keyring=message.keyring, request_mac=message.mac
+        )
+
+    def test_accepted(
+        self, listener: NotifyListener, serials: list[int | None]
+    ) -> None:
+        response = self.handle(listener, make_notify(), "127.0.0.1")
+        assert response is not None
+        assert response.rcode() == dns.rcode.NOERROR
+        assert response.opcode() == dns.opcode.NOTIFY
+        assert response.flags & dns.flags.AA
+        assert serials == [42]
+
+    def test_without_serial(
+        self, listener: NotifyListener, serials: list[int | None]
+    ) -> None:
+        self.handle(listener, make_notify(serial=None), "127.0.0.1")
+        assert serials == [None]
+
+    def test_unknown_source(
+        self, listener: NotifyListener, serials: list[int | None]
+    ) -> None:
+        response = self.handle(listener, make_notify(), "192.0.2.1")
+        assert response is not None
+        assert response.rcode() == dns.rcode.REFUSED
+        assert serials == []
+
+    def test_unknown_zone(
+        self, listener: NotifyListener, serials: list[int | None]
+    ) -> None:
+        response = self.handle(listener, make_notify("example.com."), "127.0.0.1")
+        assert response is not None
+        assert response.rcode() == dns.rcode.REFUSED
+
+    def test_signed(
+        self, listener: NotifyListener, zone: Zone, serials: list[int | None]
+    ) -> None:
+        message = make_notify()
+        message.use_tsig(zone.key)
+        response = self.handle(listener, message, "127.0.0.1")
+        assert response is not None
+        assert response.had_tsig
+        assert serials == [42]
+
+    def test_wrong_key(
+        self, listener: NotifyListener, serials: list[int | None]
+    ) -> None:
+        message = make_notify()
+        message.use_tsig(dns.tsig.Key("dyndns1.dev.", "tPyvZA=="))
+        assert self.handle(listener, message, "127.0.0.1") is None
+        assert serials == []
+
+    def test_query(self, listener: NotifyListener) -> None:
+        message = dns.message.make_query("dyndns1.dev.", "SOA")
+        assert self.handle(listener, message, "127.0.0.1") is None
+
+    def test_udp(
+        self, listener: NotifyListener, serials: list[int | None]
+    ) -> None:
+        listener.start()
+        try:
+            response = udp(
+                make_notify(), "127.0.0.1", port=listener.port, timeout=2
+            )
+            assert response.rcode() == dns.rcode.NOERROR
+            wait_for(lambda: serials == [42])
+        finally:
+            listener.close()
+
+
+class TestInvalidate:
+    @pytest.fixture
+    def writer(self, zone: Zone) -> DnsZone:
+        """Simulates changes made outside of dyndns."""
+        writer = DnsZone("127.0.0.1", 55553, zone)
+        writer.update_records("notify", {"A": "1.2.3.4", "TXT": "old"})
+        return writer
+
+    @pytest.fixture
+    def shadow(self, zone: Zone) -> ZoneShadow:
+        return ZoneShadow(zone.name, "127.0.0.1", 55553, zone.keyring)
+
+    @pytest.fixture
+    def dns(self, zone: Zone, shadow: ZoneShadow, writer: DnsZone) -> DnsZone:
+        shadow.load()
+        return DnsZone("127.0.0.1", 55553, zone, cache=RecordCache(), shadow=shadow)
+
+    @pytest.fixture
+    def listener(
+        self, zone: Zone, dns: DnsZone
+    ) -> Generator[NotifyListener, None, None]:
+        listener = NotifyListener(port=0)
+        listener.register(zone.name, ["127.0.0.1"], dns.invalidate)
+        listener.start()
+        yield listener
+        listener.close()
+
+    def test_invalidate(self, dns: DnsZone, writer: DnsZone) -> None:
+        assert dns.read_record("notify", "TXT") == "old"
+        writer.update_records("notify", {"A": "1.2.3.5", "TXT": "new"})
+        assert dns.read_record("notify", "TXT") == "old"
+        assert dns.read_a_record("notify") == "1.2.3.4"
+        dns.invalidate()
+        assert dns.read_record("notify", "TXT") == "new"
+        assert dns.read_a_record("notify") == "1.2.3.5"
+
+    def test_same_serial(
+        self, dns: DnsZone, shadow: ZoneShadow, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(shadow, "refresh", None)
+        dns.invalidate(shadow.serial)
+
+    def test_notify(
+        self, dns: DnsZone, writer: DnsZone, listener: NotifyListener
+    ) -> None:
+        assert dns.read_record("notify", "TXT") == "old"
+        writer.update_records("notify", {"A": "1.2.3.5", "TXT": "new"})
+        udp(make_notify(), "127.0.0.1", port=listener.port, timeout=2)
+        wait_for(lambda: dns.read_record("notify", "TXT") == "new")
+        wait_for(lambda: dns.read_a_record("notify") == "1.2.3.5")
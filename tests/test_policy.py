@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from dns.exception import Timeout
+from dns.message import Message
+from dns.resolver import Answer, LifetimeTimeout
+
+from dyndns.dns import AsyncDnsZone, DnsZone
+from dyndns.exceptions import DNSServerError
+from dyndns.policy import QueryPolicy
+from dyndns.zones import Zone
+
+
+class TestClassQueryPolicy:
+    def test_delays(self) -> None:
+        policy = QueryPolicy(retries=3, backoff=0.1, max_backoff=0.3)
+        delays = list(policy.delays())
+        assert len(delays) == 4
+        assert delays[0] == 0
+        for delay, bound in zip(delays[1:], (0.1, 0.2, 0.3)):
+            assert 0 <= delay <= bound
+
+    def test_no_retries(self) -> None:
+        assert list(QueryPolicy(retries=0).delays()) == [0]
+
+    def test_hedge_delay(self) -> None:
+        policy = QueryPolicy(read_timeout=2, hedge_min_delay=0.01)
+        assert policy.hedge_delay(None) == 1
+        assert policy.hedge_delay(0.05) == 0.05
+        assert policy.hedge_delay(0.001) == 0.01
+
+
+class FlakyPool:
+    """Fails the first queries and passes the rest to the real pool."""
+
+    def __init__(self, pool: Any, failures: int) -> None:
+        self.pool = pool
+        self.failures = failures
+
+    def query(
+        self, message: Message, timeout: float | None = None, metrics: Any = None
+    ) -> Message:
+        if self.failures > 0:
+            self.failures -= 1
+            raise Timeout()
+        return self.pool.query(message, timeout, metrics)
+
+
+@pytest.fixture
+def policy() -> QueryPolicy:
+    return QueryPolicy(retries=2, backoff=0.01, max_backoff=0.01)
+
+
+class TestRetries:
+    def test_update_retried(self, zone: Zone, policy: QueryPolicy) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, policy=policy)
+        server = dns._nameservers.primary
+        dns._pools[server] = FlakyPool(dns._pools[server], 2)  # type: ignore
+        assert dns.add_record("test", "A", "1.2.3.4").new == "1.2.3.4"
+        assert dns.query_stats.retries == 2
+
+    def test_update_gives_up(self, zone: Zone, policy: QueryPolicy) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, policy=policy)
+        server = dns._nameservers.primary
+        dns._pools[server] = FlakyPool(dns._pools[server], 3)  # type: ignore
+        with pytest.raises(DNSServerError, match="timed out"):
+            dns.add_record("test", "A", "1.2.3.4")
+
+    def test_read_retried(
+        self, zone: Zone, policy: QueryPolicy, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, policy=policy)
+        dns.add_record("test", "A", "1.2.3.4")
+        resolver = dns._resolvers[dns._nameservers.primary]
+        resolve = resolver.resolve
+        calls: list[int] = []
+
+        def flaky(*args: Any, **kwargs: Any) -> Answer:
+            calls.append(1)
+            if len(calls) == 1:
+                raise LifetimeTimeout(timeout=0.1, errors=[])
+            return resolve(*args, **kwargs)
+
+        monkeypatch.setattr(resolver, "resolve", flaky)
+        assert dns.read_record("test", "A", use_cache=False) == "1.2.3.4"
+        assert len(calls) == 2
+
+    def test_missing_record_not_retried(self, zone: Zone, policy: QueryPolicy) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, policy=policy)
+        dns.delete_records("test")
+        assert dns.read_record("test", "A", use_cache=False) is None
+        assert dns.query_stats.retries == 0
+
+
+def slow_first_read(dns: DnsZone | AsyncDnsZone, monkeypatch: pytest.MonkeyPatch) -> None:
+    resolver = dns._resolvers[dns._nameservers.primary]
+    resolve = resolver.resolve
+    calls: list[int] = []
+
+    if isinstance(dns, DnsZone):
+
+        def slow(*args: Any, **kwargs: Any) -> Answer:
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.5)
+            return resolve(*args, **kwargs)
+
+        monkeypatch.setattr(resolver, "resolve", slow)
+    else:
+
+        async def slow_async(*args: Any, **kwargs: Any) -> Answer:
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.sleep(0.5)
+            return await resolve(*args, **kwargs)
+
+        monkeypatch.setattr(resolver, "resolve", slow_async)
+
+
+class TestHedgedReads:
+    @pytest.fixture
+    def policy(self) -> QueryPolicy:
+        return QueryPolicy(hedge_reads=True, read_timeout=0.1, hedge_min_delay=0.01)
+
+    def test_hedge_wins(
+        self, zone: Zone, policy: QueryPolicy, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, policy=policy)
+        dns.add_record("test", "A", "1.2.3.4")
+        slow_first_read(dns, monkeypatch)
+        start = time.monotonic()
+        assert dns.read_record("test", "A", use_cache=False) == "1.2.3.4"
+        assert time.monotonic() - start < 0.4
+        assert dns.query_stats.hedged == 1
+        assert dns.query_stats.hedge_wins == 1
+
+    def test_fast_read_not_hedged(self, zone: Zone, policy: QueryPolicy) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, policy=policy)
+        dns.delete_records("test")
+        assert dns.read_record("test", "A", use_cache=False) is None
+        assert dns.query_stats.hedged == 0
+
+    def test_async(
+        self, zone: Zone, policy: QueryPolicy, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        dns = AsyncDnsZone("127.0.0.1", 55553, zone, policy=policy)
+        asyncio.run(dns.add_record("test", "A", "1.2.3.4"))
+        slow_first_read(dns, monkeypatch)
+        start = time.monotonic()
+        assert asyncio.run(dns.read_record("test", "A", use_cache=False)) == "1.2.3.4"
+        assert time.monotonic() - start < 0.4
+        assert dns.query_stats.hedge_wins == 1
@@ -0,0 +1,153 @@
+import socket
+import time
+
+import dns.edns
+import dns.message
+import pytest
+from flask.testing import FlaskClient
+
+from dyndns.environment import ConfiguredEnvironment
+from dyndns.pool import (
+    BaseConnectionPool,
+    ConnectionPool,
+    PoolStats,
+    format_pool_stats,
+    get_pool,
+    get_pool_stats,
+)
+
+
+def query(pool: ConnectionPool) -> dns.message.Message:
+    return pool.query(dns.message.make_query("dyndns1.dev.", "SOA"), timeout=5)
+
+
+@pytest.fixture
+def pool() -> ConnectionPool:
+    return ConnectionPool("127.0.0.1", 55553)
+
+
+class TestClassConnectionPool:
+    def test_reuse(self, pool: ConnectionPool) -> None:
+        query(pool)
+        query(pool)
+        query(pool)
+        assert pool.stats.created == 1
+        assert pool.stats.reused == 2
+        assert pool.stats.idle == 1
+        assert pool.stats.in_use == 0
+
+    def test_size_zero(self) -> None:
+        pool = ConnectionPool("127.0.0.1", 55553, size=0)
+        query(pool)
+        query(pool)
+        assert pool.stats.created == 2
+        assert pool.stats.reused == 0
+        assert pool.stats.discarded == 2
+        assert pool.stats.idle == 0
+
+    def test_idle_timeout(self) -> None:
+        pool = ConnectionPool("127.0.0.1", 55553, idle_timeout=0.01)
+        query(pool)
+        time.sleep(0.05)
+        query(pool)
+        assert pool.stats.created == 2
+        assert pool.stats.expired == 1
+
+    def test_closed_by_nameserver(self, pool: ConnectionPool) -> None:
+        query(pool)
+        pool._idle[0][0].shutdown(socket.SHUT_RDWR)
+        query(pool)
+        assert pool.stats.created == 2
+        assert pool.stats.expired == 1
+
+    def test_reconnect(
+        self, pool: ConnectionPool, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(ConnectionPool, "_is_alive", staticmethod(lambda _: True))
+        query(pool)
+        pool._idle[0][0].shutdown(socket.SHUT_RDWR)
+        response = query(pool)
+        assert response.answer
+        assert pool.stats.reconnects == 1
+        assert pool.stats.created == 2
+
+    class TestKeepalive:
+        def test_advertised(self, pool: ConnectionPool) -> None:
+            message = dns.message.make_query("dyndns1.dev.", "SOA")
+            pool.query(message, timeout=5)
+            assert [option.otype for option in message.options] == [
+                dns.edns.KEEPALIVE
+            ]
+            # The nameserver advertises 30 seconds.
+            assert pool.stats.keepalive == 30
+
+        def test_shorter_than_idle_timeout(
+            self, pool: ConnectionPool, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            monkeypatch.setattr(pool, "_advertised_keepalive", lambda _: 0.01)
+            query(pool)
+            time.sleep(0.05)
+            query(pool)
+            assert pool.stats.created == 2
+            assert pool.stats.expired == 1
+
+        def test_zero(
+            self, pool: ConnectionPool, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            monkeypatch.setattr(pool, "_advertised_keepalive", lambda _: 0)
+            query(pool)
+            assert pool.stats.idle == 0
+            assert pool.stats.discarded == 1
+
+        def test_disabled(self) -> None:
+            pool = ConnectionPool("127.0.0.1", 55553, keepalive=False)
+            message = dns.message.make_query("dyndns1.dev.", "SOA")
+            pool.query(message, timeout=5)
+            assert message.edns < 0
+            assert pool.stats.keepalive is None
+
+    def test_close(self, pool: ConnectionPool) -> None:
+        query(pool)
+        pool.close()
+        assert pool.stats.idle == 0
+
+    def test_forked(self, pool: ConnectionPool) -> None:
+        query(pool)
+        sock = pool._idle[0][0]
+        # As if the pool was inherited from a parent process.
+        pool._pid = -1
+        query(pool)
+        assert sock.fileno() == -1
+        assert pool.stats.created == 2
+        assert pool.stats.discarded == 1
+        assert pool.stats.in_use == 0
+
+
+def test_shared_by_zones(env: ConfiguredEnvironment) -> None:
+    dns1 = env.get_dns_for_zone("dyndns1.dev")
+    dns2 = env.get_dns_for_zone("dyndns2.dev")
+    assert list(dns1._pools.values()) == list(dns2._pools.values())
+    assert list(dns1._pools.values()) == [get_pool("127.0.0.1", 55553)]
+
+
+def test_get_pool_stats(env: ConfiguredEnvironment) -> None:
+    env.get_dns_for_zone("dyndns1.dev").delete_record("test", "A")
+    assert "127.0.0.1:55553" in get_pool_stats()
+
+
+def test_base_is_abstract() -> None:
+    with pytest.raises(TypeError, match="_close_foreign"):
+        BaseConnectionPool("127.0.0.1", 55553)  # type: ignore[abstract]
+
+
+def test_format_pool_stats() -> None:
+    assert format_pool_stats({"127.0.0.1:53": PoolStats(2, 5, 1, 0, 1, 1)}) == (
+        "connection pool 127.0.0.1:53 created=2 reused=5 reconnects=1 "
+        "expired=0 discarded=1 idle=1 in_use=0\n"
+    )
+
+
+def test_stats_endpoint(flask_client: FlaskClient) -> None:
+    flask_client.get("/update-by-path/12345678/test.dyndns1.dev/1.2.3.4")
+    body = flask_client.get("/stats").data.decode()
+    assert "connection pool 127.0.0.1:55553 created=" in body
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import threading
+from pathlib import Path
+
+import pytest
+from flask.testing import FlaskClient
+
+from dyndns.environment import ConfiguredEnvironment
+from dyndns.metrics import DnsMetrics, RequestMetrics
+from dyndns.prometheus import (
+    MetricsDirectory,
+    Samples,
+    dns_samples,
+    format_prometheus,
+    request_samples,
+)
+from dyndns.webapp import AsgiApp
+from tests.test_asgi import request
+
+
+class TestClassRequestMetrics:
+    def test_counters(self) -> None:
+        metrics = RequestMetrics()
+        metrics.observe_request("check", 200, 0.003)
+        metrics.observe_request("check", 200, 0.2)
+        metrics.count_error(ValueError())
+        metrics.count_update("unchanged")
+        stats = metrics.stats
+        assert stats.requests == {("check", 200): 2}
+        assert stats.latency["check"].count == 2
+        assert stats.latency["check"].sum == pytest.approx(0.203)
+        assert stats.errors == {"ValueError": 1}
+        assert stats.updates == {"unchanged": 1}
+
+    def test_threads(self) -> None:
+        metrics = RequestMetrics()
+
+        def run() -> None:
+            for _ in range(100):
+                metrics.observe_request("home", 200, 0.001)
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.stats.requests == {("home", 200): 800}
+        # The shards of finished threads are folded together.
+        del thread, threads
+        assert len(metrics._shards) == 0
+        assert metrics.stats.latency["home"].count == 800
+
+    def test_fork(self) -> None:
+        requests = RequestMetrics()
+        requests.observe_request("check", 200, 0.003)
+        dns = DnsMetrics("dyndns1.dev.")
+        dns.observe("read", 0.002)
+        pid = os.fork()
+        if pid == 0:
+            # The worker process doesn’t report the counts of its parent.
+            ok = requests.stats.requests == {} and dns.stats.latency["read"].count == 0
+            requests.observe_request("check", 200, 0.003)
+            ok = ok and requests.stats.requests == {("check", 200): 1}
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert requests.stats.requests == {("check", 200): 1}
+        assert dns.stats.latency["read"].count == 1
+
+
+class TestFormatPrometheus:
+    def test_request_samples(self) -> None:
+        metrics = RequestMetrics()
+        metrics.observe_request("update_by_path", 456, 0.004)
+        metrics.count_error(ValueError())
+        text = format_prometheus(request_samples(metrics.stats))
+        assert "# TYPE dyndns_requests_total counter\n" in text
+        assert (
+            'dyndns_requests_total{route="update_by_path",status="456"} 1\n' in text
+        )
+        assert (
+            'dyndns_request_duration_seconds_bucket{route="update_by_path",'
+            'le="0.0025"} 0\n'
+            'dyndns_request_duration_seconds_bucket{route="update_by_path",'
+            'le="0.005"} 1\n'
+        ) in text
+        assert (
+            'dyndns_request_duration_seconds_bucket{route="update_by_path",'
+            'le="+Inf"} 1\n'
+        ) in text
+        assert (
+            'dyndns_request_duration_seconds_sum{route="update_by_path"} 0.004\n'
+            in text
+        )
+        assert 'dyndns_errors_total{error="ValueError"} 1\n' in text
+
+    def test_dns_samples(self) -> None:
+        metrics = DnsMetrics("dyndns1.dev.")
+        metrics.observe("read", 0.002)
+        metrics.count_bytes(10, 20)
+        text = format_prometheus(dns_samples([metrics.stats]))
+        assert "# TYPE dyndns_dns_latency_seconds histogram\n" in text
+        assert (
+            'dyndns_dns_latency_seconds_count{zone="dyndns1.dev.",operation="read"} 1'
+        ) in text
+        assert 'dyndns_dns_received_bytes_total{zone="dyndns1.dev."} 20\n' in text
+
+    def test_escape(self) -> None:
+        text = format_prometheus({'dyndns_errors_total{error="a\\"b"}': 1})
+        assert text.endswith('dyndns_errors_total{error="a\\"b"} 1\n')
+
+
+class TestClassMetricsDirectory:
+    def test_aggregate(self, tmp_path: Path) -> None:
+        samples: Samples = {"dyndns_errors_total": 2}
+        directory = MetricsDirectory(tmp_path, lambda: samples)
+        (tmp_path / "dyndns-1.json").write_text(
+            '{"dyndns_errors_total": 3, "dyndns_updates_total": 1}'
+        )
+        (tmp_path / "dyndns-2.json").write_text("{")
+        assert directory.aggregate(samples) == {
+            "dyndns_errors_total": 5,
+            "dyndns_updates_total": 1,
+        }
+
+    def test_flush(self, tmp_path: Path) -> None:
+        samples: Samples = {"dyndns_errors_total": 2}
+        directory = MetricsDirectory(tmp_path, lambda: samples)
+        directory.flush()
+        samples["dyndns_errors_total"] = 4
+        # The own file is replaced by the current samples.
+        assert directory.aggregate(samples) == {"dyndns_errors_total": 4}
+        assert [path.name for path in tmp_path.iterdir()] == [directory.path.name]
+
+    def test_prune(self, tmp_path: Path) -> None:
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        (tmp_path / f"dyndns-{pid}.json").write_text('{"dyndns_errors_total": 3}')
+        (tmp_path / f"dyndns-{os.getppid()}.json").write_text("{}")
+        MetricsDirectory(tmp_path, lambda: {})
+        # Only the file of the process that no longer runs is removed.
+        assert [path.name for path in tmp_path.iterdir()] == [
+            f"dyndns-{os.getppid()}.json"
+        ]
+
+    def test_thread(self, tmp_path: Path) -> None:
+        directory = MetricsDirectory(tmp_path, lambda: {"a": 1}, 0.01).start()
+        assert directory.start() is directory
+        directory.stop()
+        assert directory.path.exists()
+
+
+class TestEndpoint:
+    def test_flask(self, env: ConfiguredEnvironment, flask_client: FlaskClient) -> None:
+        flask_client.get("/delete-by-path/12345678/test.dyndns1.dev")
+        flask_client.get("/update-by-path/12345678/test.dyndns1.dev/1.2.3.4")
+        flask_client.get("/update-by-path/12345678/test.dyndns1.dev/1.2.3.4")
+        flask_client.get("/update-by-path/wrong/test.dyndns1.dev/1.2.3.4")
+        response = flask_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+        text = response.data.decode()
+        assert 'dyndns_requests_total{route="update_by_path",status="200"} 2' in text
+        assert 'dyndns_errors_total{error="ParameterError"} 1' in text
+        assert 'dyndns_updates_total{result="unchanged"} 1' in text
+        assert 'dyndns_dns_latency_seconds_count{zone="dyndns1.dev.",operation=' in text
+
+    def test_directory(
+        self,
+        env: ConfiguredEnvironment,
+        flask_client: FlaskClient,
+        tmp_path: Path,
+    ) -> None:
+        env.metrics_directory = MetricsDirectory(tmp_path, env.metric_samples)
+        (tmp_path / "dyndns-1.json").write_text(
+            '{"dyndns_requests_total{route=\\"home\\",status=\\"200\\"}": 5}'
+        )
+        flask_client.get("/")
+        text = flask_client.get("/metrics").data.decode()
+        assert 'dyndns_requests_total{route="home",status="200"} 6' in text
+        env.metrics_directory.stop()
+
+    def test_asgi(self, asgi_app: AsgiApp) -> None:
+        async def run() -> str:
+            await request(asgi_app, "/")
+            await request(asgi_app, "/unknown")
+            return (await request(asgi_app, "/metrics"))[1]
+
+        text = asyncio.run(run())
+        assert 'dyndns_requests_total{route="home",status="200"} 1' in text
+        assert 'dyndns_requests_total{route="unknown",status=' in text
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+from flask.testing import FlaskClient
+
+from dyndns.config import RateLimitConfig, TokenBucketConfig
+from dyndns.environment import AsyncConfiguredEnvironment, ConfiguredEnvironment
+from dyndns.exceptions import RateLimitError
+from dyndns.ratelimit import MemoryBucketStore, RateLimiter, SqliteBucketStore
+from dyndns.webapp import create_asgi_app
+from tests.test_asgi import request
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def create_limiter(**kwargs: Any) -> tuple[RateLimiter, Clock]:
+    limiter = RateLimiter(RateLimitConfig(enabled=True, **kwargs))
+    clock = Clock()
+    limiter.store.clock = clock
+    return limiter, clock
+
+
+class TestClassRateLimiter:
+    def test_burst_and_refill(self) -> None:
+        limiter, clock = create_limiter(client=TokenBucketConfig(rate=0.5, burst=3))
+        for _ in range(3):
+            limiter.check("1.2.3.4")
+        with pytest.raises(RateLimitError) as e:
+            limiter.check("1.2.3.4")
+        assert e.value.retry_after == pytest.approx(2.0)
+        # Other clients have their own buckets.
+        limiter.check("1.2.3.5")
+        clock.now += 2
+        limiter.check("1.2.3.4")
+        assert limiter.stats.allowed == 5
+        assert limiter.stats.rejected == {"client": 1}
+
+    def test_empty_bucket_takes_no_token(self) -> None:
+        limiter, clock = create_limiter(
+            client=TokenBucketConfig(rate=1, burst=5),
+            fqdn=TokenBucketConfig(rate=1, burst=1),
+        )
+        limiter.check("1.2.3.4", "test.dyndns1.dev")
+        for _ in range(3):
+            with pytest.raises(RateLimitError, match="domain name"):
+                limiter.check("1.2.3.4", "TEST.dyndns1.dev.")
+        # The client bucket lost one token only.
+        limiter.check("1.2.3.4", "test2.dyndns1.dev")
+        limiter.check("1.2.3.4", "test3.dyndns1.dev")
+        limiter.check("1.2.3.4", "test4.dyndns1.dev")
+        limiter.check("1.2.3.4", "test5.dyndns1.dev")
+        with pytest.raises(RateLimitError, match="client"):
+            limiter.check("1.2.3.4", "test6.dyndns1.dev")
+
+    def test_secret_is_hashed(self) -> None:
+        limiter, _ = create_limiter(secret=TokenBucketConfig(rate=1, burst=1))
+        limiter.check(secret="12345678")
+        with pytest.raises(RateLimitError, match="secret"):
+            limiter.check(secret="12345678")
+        assert isinstance(limiter.store, MemoryBucketStore)
+        assert not any("12345678" in key for key in limiter.store._buckets)
+
+    def test_disabled_bucket(self) -> None:
+        limiter, _ = create_limiter(client=TokenBucketConfig(rate=0, burst=1))
+        for _ in range(5):
+            limiter.check("1.2.3.4")
+        assert len(limiter.store) == 0
+
+    def test_bounded_memory(self) -> None:
+        limiter, clock = create_limiter(
+            client=TokenBucketConfig(rate=1, burst=2), size=10
+        )
+        for i in range(20):
+            limiter.check(f"1.2.3.{i}")
+        assert len(limiter.store) == 10
+        # Idle buckets are dropped once they are full again.
+        clock.now += 120
+        limiter.check("1.2.4.1")
+        assert len(limiter.store) == 1
+
+
+class TestClassSqliteBucketStore:
+    def test_shared_between_limiters(self, tmp_path: Path) -> None:
+        config = RateLimitConfig(
+            enabled=True,
+            client=TokenBucketConfig(rate=1, burst=2),
+            store=tmp_path / "buckets.sqlite",
+        )
+        first = RateLimiter(config)
+        second = RateLimiter(config)
+        assert isinstance(first.store, SqliteBucketStore)
+        first.check("1.2.3.4")
+        second.check("1.2.3.4")
+        with pytest.raises(RateLimitError):
+            first.check("1.2.3.4")
+        assert len(second.store) == 1
+
+    def test_expire(self, tmp_path: Path) -> None:
+        store = SqliteBucketStore(tmp_path / "buckets.sqlite", size=5)
+        limit = TokenBucketConfig(rate=1, burst=1)
+        for i in range(10):
+            store.take([(f"client:{i}", limit)], 1.0)
+        store._expire(store._connect(), 0)
+        assert len(store) == 5
+
+    def test_fork(self, tmp_path: Path) -> None:
+        store = SqliteBucketStore(tmp_path / "buckets.sqlite")
+        limit = TokenBucketConfig(rate=0.01, burst=2)
+        store.take([("client:1.2.3.4", limit)], 1.0)
+        parent = store._connect()
+        pid = os.fork()
+        if pid == 0:
+            # The child process must not use the connection of the parent.
+            ok = store._connect() is not parent
+            ok = ok and store.take([("client:1.2.3.4", limit)], 1.0) == [0.0]
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert store._connect() is parent
+        # The token taken by the child process is shared.
+        assert store.take([("client:1.2.3.4", limit)], 1.0)[0] > 0
+
+
+@pytest.fixture
+def limited_env(env: ConfiguredEnvironment) -> ConfiguredEnvironment:
+    env.rate_limiter = RateLimiter(
+        RateLimitConfig(enabled=True, fqdn=TokenBucketConfig(rate=0.01, burst=1))
+    )
+    return env
+
+
+class TestWebapp:
+    def test_retry_after(
+        self, limited_env: ConfiguredEnvironment, flask_client: FlaskClient
+    ) -> None:
+        path = "/update-by-path/12345678/test.dyndns1.dev/1.2.3.4"
+        assert flask_client.get(path).status_code == 200
+        response = flask_client.get(path)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "100"
+        assert response.data.decode().startswith("RATE_LIMIT_ERROR: ")
+
+    def test_wrong_secret(
+        self, limited_env: ConfiguredEnvironment, flask_client: FlaskClient
+    ) -> None:
+        path = "/update-by-path/{}/test.dyndns1.dev/1.2.3.4"
+        for _ in range(2):
+            assert flask_client.get(path.format("wrong")).status_code == 456
+            response = flask_client.get(
+                "/update-by-query?secret=wrong&fqdn=test.dyndns1.dev&ipv4=1.2.3.4"
+            )
+            assert response.status_code == 456
+        assert flask_client.get(path.format("12345678")).status_code == 200
+
+    def test_before_validation(
+        self, limited_env: ConfiguredEnvironment, flask_client: FlaskClient
+    ) -> None:
+        assert limited_env.rate_limiter is not None
+        limited_env.rate_limiter.config.client = TokenBucketConfig(rate=0.01, burst=1)
+        flask_client.get("/update-by-query?unknown=1")
+        response = flask_client.get("/update-by-query?unknown=1")
+        assert response.status_code == 429
+
+    def test_batch(
+        self, limited_env: ConfiguredEnvironment, flask_client: FlaskClient
+    ) -> None:
+        entries = [
+            {"fqdn": "test1.dyndns1.dev", "ipv4": "1.2.3.4"},
+            {"fqdn": "test2.dyndns1.dev", "ipv4": "1.2.3.4"},
+        ]
+        flask_client.post("/update-batch/12345678", data=json.dumps(entries[:1]))
+        response = flask_client.post("/update-batch/12345678", data=json.dumps(entries))
+        assert response.json is not None
+        assert [result["status_code"] for result in response.json] == [429, 200]
+
+    def test_asgi(self) -> None:
+        env = AsyncConfiguredEnvironment(
+            Path(__file__).parent / "files" / "dyndnsX.dev.yml"
+        )
+        env.rate_limiter = RateLimiter(
+            RateLimitConfig(enabled=True, client=TokenBucketConfig(rate=0.5, burst=1))
+        )
+        app = create_asgi_app(env)
+
+        async def run() -> list[tuple[int, str]]:
+            return [await request(app, "/check") for _ in range(2)]
+
+        (first, _), (second, body) = asyncio.run(run())
+        assert first == 200
+        assert second == 429
+        assert "Retry in 2.0 seconds" in body
+
+    def test_asgi_wrong_secret(self) -> None:
+        env = AsyncConfiguredEnvironment(
+            Path(__file__).parent / "files" / "dyndnsX.dev.yml"
+        )
+        env.rate_limiter = RateLimiter(
+            RateLimitConfig(enabled=True, fqdn=TokenBucketConfig(rate=0.01, burst=1))
+        )
+        app = create_asgi_app(env)
+        path = "/delete-by-path/{}/test.dyndns1.dev"
+
+        async def run() -> list[int]:
+            return [
+                (await request(app, path.format(secret)))[0]
+                for secret in ("wrong", "wrong", "12345678", "12345678")
+            ]
+
+        assert asyncio.run(run()) == [456, 456, 200, 429]
@@ -0,0 +1,101 @@
+import dns.tsigkeyring
+import pytest
+
+from dyndns.dns import DnsZone
+from dyndns.shadow import ZoneShadow
+from dyndns.zones import Zone
+
+
+@pytest.fixture
+def shadow(zone: Zone) -> ZoneShadow:
+    return ZoneShadow(
+        zone.name,
+        "127.0.0.1",
+        55553,
+        dns.tsigkeyring.from_text({zone.name: zone.tsig_key}),
+    )
+
+
+@pytest.fixture
+def writer(zone: Zone) -> DnsZone:
+    """A zone without a copy that simulates changes made outside of
+    dyndns."""
+    writer = DnsZone("127.0.0.1", 55553, zone)
+    writer.update_records("shadow", {"A": "1.2.3.4", "AAAA": "1::4"})
+    return writer
+
+
+class TestClassZoneShadow:
+    def test_load(self, shadow: ZoneShadow, writer: DnsZone) -> None:
+        assert not shadow.loaded
+        shadow.load()
+        assert shadow.loaded
+        assert shadow.get("shadow.dyndns1.dev.", "A") == "1.2.3.4"
+        assert shadow.get("SHADOW.dyndns1.dev.", "AAAA") == "1::4"
+        assert shadow.get("unknown.dyndns1.dev.", "A") is None
+        assert len(shadow) >= 1
+
+    def test_refresh_unchanged(self, shadow: ZoneShadow, writer: DnsZone) -> None:
+        shadow.load()
+        assert shadow.refresh() is False
+
+    def test_refresh_incremental(self, shadow: ZoneShadow, writer: DnsZone) -> None:
+        shadow.load()
+        serial = shadow.serial
+        writer.update_records("shadow", {"A": "1.2.3.5", "AAAA": None})
+        writer.add_record("shadow2", "A", "5.6.7.8")
+        assert shadow.refresh() is True
+        assert shadow.serial != serial
+        assert shadow.get("shadow.dyndns1.dev.", "A") == "1.2.3.5"
+        assert shadow.get("shadow.dyndns1.dev.", "AAAA") is None
+        assert shadow.get("shadow2.dyndns1.dev.", "A") == "5.6.7.8"
+        writer.delete_records("shadow2")
+
+    def test_refresh_loads(self, shadow: ZoneShadow, writer: DnsZone) -> None:
+        assert shadow.refresh() is True
+        assert shadow.get("shadow.dyndns1.dev.", "A") == "1.2.3.4"
+
+    def test_invalidate(self, shadow: ZoneShadow, writer: DnsZone) -> None:
+        shadow.load()
+        shadow.invalidate()
+        assert not shadow.loaded
+        assert shadow.get("shadow.dyndns1.dev.", "A") is None
+
+    def test_set(self, shadow: ZoneShadow) -> None:
+        shadow.set("a.dyndns1.dev.", "AAAA", "1:0::1")
+        assert shadow.get("a.dyndns1.dev.", "AAAA") == "1::1"
+        shadow.set("a.dyndns1.dev.", "AAAA", None)
+        assert shadow.get("a.dyndns1.dev.", "AAAA") is None
+
+    def test_add(self, shadow: ZoneShadow) -> None:
+        shadow.add("a.dyndns1.dev.", "A", "1.2.3.4")
+        shadow.add("a.dyndns1.dev.", "A", "1.2.3.5")
+        shadow.add("a.dyndns1.dev.", "A", "1.2.3.4")
+        assert shadow.get("a.dyndns1.dev.", "A") == "1.2.3.4"
+        shadow.set("a.dyndns1.dev.", "A", None)
+        assert shadow.get("a.dyndns1.dev.", "A") is None
+
+    def test_covers(self) -> None:
+        assert ZoneShadow.covers("A")
+        assert not ZoneShadow.covers("TXT")
+
+
+class TestShadowedDnsZone:
+    @pytest.fixture
+    def dns(self, zone: Zone, shadow: ZoneShadow, writer: DnsZone) -> DnsZone:
+        shadow.load()
+        return DnsZone("127.0.0.1", 55553, zone, shadow=shadow)
+
+    def test_reads_from_memory(
+        self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(dns, "read_resource_record_set", None)
+        assert dns.read_a_record("shadow") == "1.2.3.4"
+        assert dns.is_aaaa_record("shadow")
+        assert not dns.is_a_record("unknown")
+
+    def test_writes_update_the_copy(self, dns: DnsZone, shadow: ZoneShadow) -> None:
+        results = dns.update_records("shadow", {"A": "1.2.3.6", "AAAA": None})
+        assert results[0].old == "1.2.3.4"
+        assert shadow.get("shadow.dyndns1.dev.", "A") == "1.2.3.6"
+        assert shadow.get("shadow.dyndns1.dev.", "AAAA") is None
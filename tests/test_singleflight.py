@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from dyndns.config import RecordType
+from dyndns.dns import DnsChangeMessage, DnsZone
+from dyndns.environment import AsyncConfiguredEnvironment, ConfiguredEnvironment
+from dyndns.singleflight import AsyncSingleFlight, SingleFlight
+
+
+class TestClassSingleFlight:
+    def test_shared(self) -> None:
+        flight: SingleFlight[int] = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls: list[int] = []
+
+        def work() -> int:
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 42
+
+        with ThreadPoolExecutor(4) as executor:
+            leader = executor.submit(flight.do, "key", work)
+            started.wait(5)
+            followers = [executor.submit(flight.do, "key", work) for _ in range(3)]
+            while flight.stats.shared < 3:
+                time.sleep(0.001)
+            release.set()
+            assert leader.result() == 42
+            assert [future.result() for future in followers] == [42, 42, 42]
+        assert len(calls) == 1
+        assert flight.stats.calls == 1
+
+    def test_exception(self) -> None:
+        flight: SingleFlight[int] = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail() -> int:
+            started.set()
+            release.wait(5)
+            raise ValueError("failed")
+
+        with ThreadPoolExecutor(2) as executor:
+            leader = executor.submit(flight.do, "key", fail)
+            started.wait(5)
+            follower = executor.submit(flight.do, "key", fail)
+            while flight.stats.shared < 1:
+                time.sleep(0.001)
+            release.set()
+            for future in (leader, follower):
+                with pytest.raises(ValueError):
+                    future.result()
+
+    def test_sequential(self) -> None:
+        flight: SingleFlight[int] = SingleFlight()
+        assert flight.do("key", lambda: 1) == 1
+        assert flight.do("key", lambda: 2) == 2
+        assert flight.stats.shared == 0
+
+    def test_different_keys(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        assert flight.do("a", lambda: flight.do("b", lambda: "b")) == "b"
+        assert flight.stats.calls == 2
+
+
+class TestClassAsyncSingleFlight:
+    def test_shared(self) -> None:
+        flight: AsyncSingleFlight[int] = AsyncSingleFlight()
+        calls: list[int] = []
+
+        async def work() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def run() -> list[int]:
+            return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+        assert asyncio.run(run()) == [42] * 5
+        assert len(calls) == 1
+        assert flight.stats.shared == 4
+
+    def test_exception(self) -> None:
+        flight: AsyncSingleFlight[int] = AsyncSingleFlight()
+
+        async def fail() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        async def run() -> list[int | BaseException]:
+            return await asyncio.gather(
+                *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+            )
+
+        assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+    def test_cancelled_waiter(self) -> None:
+        flight: AsyncSingleFlight[int] = AsyncSingleFlight()
+
+        async def work() -> int:
+            await asyncio.sleep(0.02)
+            return 42
+
+        async def run() -> int:
+            leader = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            return await leader
+
+        assert asyncio.run(run()) == 42
+
+
+class TestEnvironment:
+    def test_identical_updates(
+        self, env: ConfiguredEnvironment, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        dns: DnsZone = env.get_dns_for_zone("dyndns1.dev")
+        update_records = dns.update_records
+        calls: list[str] = []
+
+        def slow_update_records(
+            name: str, records: dict[RecordType, str | None], ttl: int = 300
+        ) -> list[DnsChangeMessage]:
+            calls.append(name)
+            time.sleep(0.2)
+            return update_records(name, records, ttl)
+
+        monkeypatch.setattr(dns, "update_records", slow_update_records)
+        with ThreadPoolExecutor(5) as executor:
+            results = list(
+                executor.map(
+                    lambda _: env.update_dns_record(
+                        fqdn="test.dyndns1.dev", ipv4="1.2.3.7"
+                    ),
+                    range(5),
+                )
+            )
+        assert len(calls) == 1
+        assert len(set(results)) == 1
+        assert env.single_flight_stats.shared == 4
+
+    def test_async_identical_updates(self) -> None:
+        env = AsyncConfiguredEnvironment(
+            Path(__file__).parent / "files" / "dyndnsX.dev.yml"
+        )
+
+        async def run() -> list[str]:
+            return await asyncio.gather(
+                *(
+                    env.update_dns_record(fqdn="test.dyndns1.dev", ipv4="1.2.3.8")
+                    for _ in range(5)
+                )
+            )
+
+        assert len(set(asyncio.run(run()))) == 1
+        assert env.single_flight_stats.calls == 1
+        assert env.single_flight_stats.shared == 4
@@ -0,0 +1,21 @@
+import dns.tsig
+
+from dyndns.tsig import benchmark_signing, create_key
+
+
+def test_create_key() -> None:
+    key = create_key("example.com.", "tPyvZA==", "hmac-sha384")
+    assert key.algorithm == dns.tsig.HMAC_SHA384
+    assert key.secret == b"\xb4\xfc\xafd"
+
+
+def test_benchmark_signing() -> None:
+    results = benchmark_signing(count=10)
+    assert [result.algorithm for result in results] == [
+        "hmac-sha256",
+        "hmac-sha384",
+        "hmac-sha512",
+    ]
+    for result in results:
+        assert result.signed > 0
+        assert result.unsigned > 0
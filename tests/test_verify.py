@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+import pytest
+
+from dyndns.config import RecordType
+from dyndns.dns import AsyncDnsZone, DnsChange, DnsZone
+from dyndns.verify import Verifier
+from dyndns.zones import Zone
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+class TestClassVerifier:
+    def test_compare(self) -> None:
+        verifier = Verifier("sync")
+        assert verifier.compare("a.example.com.", "A", "1.2.3.4", "1.2.3.4")
+        assert not verifier.compare("a.example.com.", "A", "1.2.3.4", None)
+        assert verifier.stats.verified == 2
+        assert verifier.stats.mismatches == 1
+
+    def test_submit(self) -> None:
+        verifier = Verifier("async", delay=0)
+        reads: list[tuple[str, RecordType]] = []
+
+        def read(fqdn: str, record_type: RecordType) -> str | None:
+            reads.append((fqdn, record_type))
+            return "1.2.3.5"
+
+        verifier.attach(read)
+        verifier.submit("a.example.com.", "A", "1.2.3.4")
+        wait_for(lambda: verifier.stats.verified == 1)
+        assert reads == [("a.example.com.", "A")]
+        assert verifier.stats.mismatches == 1
+        verifier.close()
+
+    def test_sample_rate(self) -> None:
+        verifier = Verifier("async", sample_rate=0)
+        verifier.submit("a.example.com.", "A", "1.2.3.4")
+        assert verifier._worker is None
+
+    def test_max_pending(self) -> None:
+        verifier = Verifier("async", delay=60, max_pending=2)
+        verifier.attach(lambda fqdn, record_type: None)
+        for _ in range(3):
+            verifier.submit("a.example.com.", "A", "1.2.3.4")
+        assert verifier.stats.dropped == 1
+        verifier.close()
+
+    def test_read_error(self) -> None:
+        verifier = Verifier("async", delay=0)
+
+        def read(fqdn: str, record_type: RecordType) -> str | None:
+            raise OSError("unreachable")
+
+        verifier.attach(read)
+        verifier.submit("a.example.com.", "A", "1.2.3.4")
+        wait_for(lambda: verifier.stats.errors == 1)
+        verifier.close()
+
+
+class TestVerificationModes:
+    def reads(self, dns: DnsZone, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+        reads: list[str] = []
+        resolve = dns._resolve
+
+        def count(fqdn: str, record_type: RecordType, skip: int = 0) -> object:
+            reads.append(fqdn)
+            return resolve(fqdn, record_type, skip)
+
+        monkeypatch.setattr(dns, "_resolve", count)
+        return reads
+
+    def test_trust(self, zone: Zone, monkeypatch: pytest.MonkeyPatch) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, verifier=Verifier("trust"))
+        dns.add_record("verify", "A", "1.2.3.4")
+        reads = self.reads(dns, monkeypatch)
+        dns.add_record("verify", "A", "1.2.3.5")
+        # Only the old content is read.
+        assert len(reads) == 1
+        assert dns.verifier_stats.verified == 0
+
+    def test_sync(self, zone: Zone, monkeypatch: pytest.MonkeyPatch) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, verifier=Verifier("sync"))
+        dns.add_record("verify", "A", "1.2.3.4")
+        reads = self.reads(dns, monkeypatch)
+        result = dns.add_record("verify", "A", "1.2.3.5")
+        assert len(reads) == 2
+        assert result.new == "1.2.3.5"
+        assert dns.verifier_stats.verified == 2
+        assert dns.verifier_stats.mismatches == 0
+
+    def test_sync_mismatch(self, zone: Zone, monkeypatch: pytest.MonkeyPatch) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, verifier=Verifier("sync"))
+        dns.add_record("verify", "A", "1.2.3.4")
+        monkeypatch.setattr(
+            dns, "read_record", lambda name, record_type, use_cache=True: "9.9.9.9"
+        )
+        result = dns.add_record("verify", "A", "1.2.3.5")
+        # The content served by the nameserver is reported.
+        assert result.new == "9.9.9.9"
+        assert dns.verifier_stats.mismatches == 1
+
+    def test_async(self, zone: Zone) -> None:
+        verifier = Verifier("async", delay=0)
+        dns = DnsZone("127.0.0.1", 55553, zone, verifier=verifier)
+        dns.add_record("verify", "A", "1.2.3.4")
+        wait_for(lambda: dns.verifier_stats.verified == 1)
+        assert dns.verifier_stats.mismatches == 0
+        verifier.close()
+
+    def test_apply_changes(self, zone: Zone) -> None:
+        dns = DnsZone("127.0.0.1", 55553, zone, verifier=Verifier("sync"))
+        dns.apply_changes(
+            [
+                DnsChange("replace", "verify", "A", "1.2.3.4"),
+                DnsChange("replace", "verify2", "A", "1.2.3.5"),
+                DnsChange("add", "verify2", "A", "1.2.3.6"),
+            ]
+        )
+        # Record sets with several records are not verified.
+        assert dns.verifier_stats.verified == 1
+
+    def test_async_zone(self, zone: Zone) -> None:
+        dns = AsyncDnsZone(
+            "127.0.0.1", 55553, zone, verifier=Verifier("async", delay=0)
+        )
+
+        async def run() -> None:
+            await dns.add_record("verify", "A", "1.2.3.4")
+            await asyncio.gather(*dns._verifications)
+
+        asyncio.run(run())
+        assert dns.verifier_stats.verified == 1
@@ -0,0 +1,169 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from dns.message import Message
+
+from dyndns.dns import Batch, DnsChangeMessage, DnsZone, format_content
+from dyndns.exceptions import DNSServerError
+from dyndns.writebehind import UpdateQueue
+from dyndns.zones import Zone
+
+
+class Recorder:
+    """Commits batches without a nameserver."""
+
+    batches: list[Batch]
+
+    served: dict[tuple[str, str], str | None]
+    """Content the nameserver serves instead of the written content."""
+
+    def __init__(self) -> None:
+        self.batches = []
+        self.served = {}
+
+    def __call__(self, batch: Batch) -> dict[str, list[DnsChangeMessage]]:
+        self.batches.append(batch)
+        return {
+            fqdn: [
+                DnsChangeMessage(
+                    fqdn,
+                    None,
+                    self.served.get(
+                        (fqdn, record_type),
+                        None
+                        if content is None
+                        else format_content(record_type, content),
+                    ),
+                    record_type,
+                )
+                for record_type, content in records.items()
+            ]
+            for fqdn, (records, _) in batch.items()
+        }
+
+
+@pytest.fixture
+def recorder() -> Recorder:
+    return Recorder()
+
+
+@pytest.fixture
+def queue(recorder: Recorder) -> UpdateQueue:
+    queue = UpdateQueue(window=0.05, max_changes=100)
+    queue.attach(recorder)
+    return queue
+
+
+class TestClassUpdateQueue:
+    def test_merge(self, queue: UpdateQueue, recorder: Recorder) -> None:
+        first = queue.submit("a.example.com.", {"A": "1.1.1.1"})
+        second = queue.submit("a.example.com.", {"A": "1.1.1.2", "AAAA": "1::1"})
+        third = queue.submit("b.example.com.", {"A": "2.2.2.2"})
+        assert third.result(1)[0].new == "2.2.2.2"
+        assert len(recorder.batches) == 1
+        assert recorder.batches[0]["a.example.com."][0] == {
+            "A": "1.1.1.2",
+            "AAAA": "1::1",
+        }
+        assert first.result()[0].old is None
+        assert first.result()[0].new == "1.1.1.1"
+        # The second caller sees the content of the first caller as old
+        # content.
+        assert second.result()[0].old == "1.1.1.1"
+        assert second.result()[0].new == "1.1.1.2"
+        stats = queue.stats
+        assert stats.submitted == 3
+        assert stats.batches == 1
+        assert stats.coalesced == 1
+
+    def test_format(self, queue: UpdateQueue) -> None:
+        result = queue.submit("a.example.com.", {"AAAA": "1:0::1"}).result(1)
+        assert result[0].new == "1::1"
+
+    def test_mismatch(
+        self,
+        queue: UpdateQueue,
+        recorder: Recorder,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        recorder.served[("a.example.com.", "A")] = "9.9.9.9"
+        first = queue.submit("a.example.com.", {"A": "1.1.1.1"})
+        second = queue.submit("a.example.com.", {"A": "1.1.1.2"})
+        assert second.result(1)[0].new == "9.9.9.9"
+        # Only the last write of a batch is served by the nameserver.
+        assert first.result()[0].new == "1.1.1.1"
+        assert queue.stats.mismatches == 1
+        assert "the nameserver serves '9.9.9.9'" in caplog.text
+
+    def test_invalid_content(self, queue: UpdateQueue) -> None:
+        with pytest.raises(Exception):
+            queue.submit("a.example.com.", {"A": "invalid"})
+        assert queue.stats.submitted == 0
+
+    def test_max_changes(self, recorder: Recorder) -> None:
+        queue = UpdateQueue(window=10, max_changes=2)
+        queue.attach(recorder)
+        queue.submit("a.example.com.", {"A": "1.1.1.1"})
+        queue.submit("b.example.com.", {"A": "1.1.1.1"}).result(1)
+        assert len(recorder.batches) == 1
+
+    def test_failure(self) -> None:
+        def fail(batch: Batch) -> dict[str, list[DnsChangeMessage]]:
+            raise DNSServerError("failed")
+
+        queue = UpdateQueue(window=0.01)
+        queue.attach(fail)
+        future = queue.submit("a.example.com.", {"A": "1.1.1.1"})
+        with pytest.raises(DNSServerError):
+            future.result(1)
+        assert queue.stats.failed == 1
+
+    def test_close(self, queue: UpdateQueue, recorder: Recorder) -> None:
+        future = queue.submit("a.example.com.", {"A": "1.1.1.1"})
+        queue.close()
+        assert future.done()
+        with pytest.raises(RuntimeError):
+            queue.submit("a.example.com.", {"A": "1.1.1.1"})
+
+
+class TestWriteBehindDnsZone:
+    @pytest.fixture
+    def dns(self, zone: Zone) -> DnsZone:
+        return DnsZone("127.0.0.1", 55553, zone, queue=UpdateQueue(window=0.1))
+
+    def test_burst(
+        self, dns: DnsZone, zone: Zone, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        writer = DnsZone("127.0.0.1", 55553, zone)
+        names = [f"burst{i}" for i in range(20)]
+        for name in names:
+            writer.delete_records(name)
+        messages: list[Message] = []
+        lock = threading.Lock()
+        query = dns._query
+
+        def count(message: Message) -> Message:
+            with lock:
+                messages.append(message)
+            return query(message)
+
+        monkeypatch.setattr(dns, "_query", count)
+        start = time.monotonic()
+        with ThreadPoolExecutor(len(names)) as executor:
+            results = list(
+                executor.map(
+                    lambda i: dns.add_record(names[i], "A", f"1.2.3.{i}"),
+                    range(len(names)),
+                )
+            )
+        assert time.monotonic() - start < 1
+        assert len(messages) == 1
+        assert [result.new for result in results] == [
+            f"1.2.3.{i}" for i in range(len(names))
+        ]
+        for i, name in enumerate(names):
+            assert writer.read_a_record(name) == f"1.2.3.{i}"
+        for name in names:
+            writer.delete_records(name)
@@ -1,3 +1,4 @@
+import dns.tsig
 import pytest
 
 from dyndns.config import ZoneConfig
@@ -15,6 +16,15 @@ class TestClassZone:
         assert zone.name == "example.com."
         assert zone.tsig_key == "tPyvZA=="
 
+    def test_key(self, zone: Zone) -> None:
+        assert zone.key.algorithm == dns.tsig.HMAC_SHA512
+        assert zone.key.secret == b"\xb4\xfc\xafd"
+        assert zone.keyring == {zone.key.name: zone.key}
+
+    def test_tsig_algorithm(self) -> None:
+        zone = Zone("example.com", "tPyvZA==", tsig_algorithm="hmac-sha256")
+        assert zone.key.algorithm == dns.tsig.HMAC_SHA256
+
     class TestMethodGetRecordName:
         def test_specify_fqdn(self, zone: Zone) -> None:
             assert zone.get_record_name("www.example.com") == "www."